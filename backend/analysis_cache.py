@@ -0,0 +1,171 @@
+"""Content-addressed cache for vision analysis results"""
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """In-process LRU with a maximum size and a per-entry time-to-live"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class AnalysisCache:
+    """Two-tier analysis cache: in-process LRU in front of a MongoDB collection.
+
+    Keys are built by the caller from the image digest and the analysis
+    version, so a prompt or model change never serves stale results.
+
+    MongoDB never holds up or fails a request: lookups give up after
+    read_timeout seconds, writes run in the background, and failures are
+    logged and treated as misses. After failure_threshold failures in a
+    row the tier is skipped for retry_after seconds, so an outage costs
+    a few timeouts rather than one per request.
+    """
+
+    def __init__(
+        self,
+        collection,
+        memory_size: int,
+        memory_ttl: float,
+        persistent_ttl: int,
+        on_lookup: Optional[Callable[[str], None]] = None,
+        *,
+        read_timeout: float = 0.25,
+        failure_threshold: int = 3,
+        retry_after: float = 30.0,
+        max_pending_writes: int = 256,
+    ):
+        self.collection = collection
+        self.memory = LRUCache(memory_size, memory_ttl)
+        self.persistent_ttl = persistent_ttl
+        self.persistent_enabled = collection is not None
+        self.stats: Dict[str, int] = {"memory_hit": 0, "persistent_hit": 0, "miss": 0}
+        self.on_lookup = on_lookup
+        self.read_timeout = read_timeout
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self.max_pending_writes = max_pending_writes
+        self._failures = 0
+        self._skip_until = 0.0
+        self._writes: Set[asyncio.Task] = set()
+
+    def _record(self, result: str) -> None:
+        self.stats[result] += 1
+        if self.on_lookup is not None:
+            self.on_lookup(result)
+
+    async def ensure_indexes(self) -> None:
+        """Create the unique key index and the TTL index; disable the tier if Mongo is unreachable"""
+        if not self.persistent_enabled:
+            return
+        try:
+            await self.collection.create_index("key", unique=True)
+            await self.collection.create_index("createdAt", expireAfterSeconds=self.persistent_ttl)
+        except Exception as e:
+            logger.warning(f"Analysis cache: persistent tier disabled ({e})")
+            self.persistent_enabled = False
+
+    @property
+    def persistent_available(self) -> bool:
+        return self.persistent_enabled and time.monotonic() >= self._skip_until
+
+    def _succeeded(self) -> None:
+        self._failures = 0
+
+    def _failed(self, action: str, e: Exception) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._failures = 0
+            self._skip_until = time.monotonic() + self.retry_after
+            logger.error(
+                f"Analysis cache {action} failed ({e!r}); "
+                f"skipping the persistent tier for {self.retry_after:g}s"
+            )
+        else:
+            logger.error(f"Analysis cache {action} failed: {e!r}")
+
+    async def get(self, key: str) -> Optional[dict]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._record("memory_hit")
+            return copy.deepcopy(value)
+
+        if self.persistent_available:
+            try:
+                doc = await asyncio.wait_for(
+                    self.collection.find_one({"key": key}, {"_id": 0, "analysis": 1}), self.read_timeout
+                )
+            except Exception as e:
+                self._failed("lookup", e)
+                doc = None
+            else:
+                self._succeeded()
+            if doc is not None:
+                self._record("persistent_hit")
+                self.memory.set(key, doc["analysis"])
+                return copy.deepcopy(doc["analysis"])
+
+        self._record("miss")
+        return None
+
+    async def set(self, key: str, analysis: dict) -> None:
+        """Store in memory now and in MongoDB in the background (dropped if too many writes are pending)"""
+        stored = copy.deepcopy(analysis)
+        self.memory.set(key, stored)
+        if not self.persistent_available or len(self._writes) >= self.max_pending_writes:
+            return
+        task = asyncio.ensure_future(self._write(key, stored))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, key: str, analysis: dict) -> None:
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {"analysis": analysis, "createdAt": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except Exception as e:
+            self._failed("write", e)
+        else:
+            self._succeeded()
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Wait for the background writes still pending, up to timeout seconds"""
+        if self._writes:
+            await asyncio.wait(set(self._writes), timeout=timeout)
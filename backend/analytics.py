@@ -0,0 +1,191 @@
+"""Per-site, per-day rollups of the inspection history for dashboards.
+
+Each rollup document holds the counters for one (site, UTC day):
+
+    {"_id": {"site": "north", "day": "2026-10-17"}, "site": "north", "day": "2026-10-17",
+     "inspections": 12, "scoreSum": 804, "violations": 31,
+     "risk": {"High": 3, "Medium": 5, "Low": 4}, "categories": {"PPE": 20, ...}}
+
+Records without a site roll up under site None, and every record is also
+counted under ALL_SITES, so a dashboard reads one document per day
+whatever the number of sites or inspections. Rollups are kept current by
+apply() as history batches are written; rebuild() recomputes them from the
+inspections collection with aggregation pipelines.
+
+Categories are field names in the rollup, so any category outside
+taxonomy.CATEGORIES (free text from the model, possibly holding "." or
+"$") is counted under OTHER_CATEGORY.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from taxonomy import CATEGORIES
+
+ALL_SITES = "*"
+RISK_LEVELS = ("High", "Medium", "Low")
+OTHER_CATEGORY = "Other"
+
+
+def rollup_category(category: Any) -> str:
+    """The category's rollup key: one of CATEGORIES or OTHER_CATEGORY, safe in a Mongo field path"""
+    return category if category in CATEGORIES else OTHER_CATEGORY
+
+
+def day_key(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+
+def rollup_deltas(records: Iterable[dict]) -> Dict[tuple, dict]:
+    """Sum a batch of inspection records into $inc documents keyed by (site, day)"""
+    deltas: Dict[tuple, dict] = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        day = day_key(record["inspectedAt"])
+        for site in (record.get("site"), ALL_SITES):
+            delta = deltas[(site, day)]
+            delta["inspections"] += 1
+            delta["scoreSum"] += record["safetyScore"]
+            delta["violations"] += record["violationCount"]
+            delta[f"risk.{record['riskLevel']}"] += 1
+            for violation in record.get("violations") or []:
+                delta[f"categories.{rollup_category(violation.get('category'))}"] += 1
+    return deltas
+
+
+def rollup_pipeline(site_expr: Any, into: str) -> List[dict]:
+    """Counters per (site, day) from the inspections collection, merged into the rollups"""
+    return [
+        {"$group": {
+            "_id": {"site": site_expr, "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$inspectedAt"}}},
+            "inspections": {"$sum": 1},
+            "scoreSum": {"$sum": "$safetyScore"},
+            "violations": {"$sum": "$violationCount"},
+            **{
+                f"risk{level}": {"$sum": {"$cond": [{"$eq": ["$riskLevel", level]}, 1, 0]}}
+                for level in RISK_LEVELS
+            },
+        }},
+        {"$project": {
+            "site": "$_id.site",
+            "day": "$_id.day",
+            "inspections": 1,
+            "scoreSum": 1,
+            "violations": 1,
+            "risk": {level: f"$risk{level}" for level in RISK_LEVELS},
+            "categories": {"$literal": {}},
+        }},
+        {"$merge": {"into": into, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def category_pipeline(site_expr: Any, into: str) -> List[dict]:
+    """Violation counts per (site, day, category), merged into the rollups built above"""
+    return [
+        {"$unwind": "$violations"},
+        {"$group": {
+            "_id": {
+                "site": site_expr,
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$inspectedAt"}},
+                "category": {"$cond": [
+                    {"$in": ["$violations.category", list(CATEGORIES)]}, "$violations.category", OTHER_CATEGORY,
+                ]},
+            },
+            "count": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": {"site": "$_id.site", "day": "$_id.day"},
+            "categories": {"$push": {"k": "$_id.category", "v": "$count"}},
+        }},
+        {"$project": {"categories": {"$arrayToObject": "$categories"}}},
+        {"$merge": {
+            "into": into,
+            "whenMatched": [{"$set": {"categories": "$$new.categories"}}],
+            "whenNotMatched": "discard",
+        }},
+    ]
+
+
+def rebuild_pipelines(into: str) -> List[List[dict]]:
+    """Totals first, then categories; each once for the record's own site and once for ALL_SITES"""
+    return [
+        pipeline(site_expr, into)
+        for pipeline in (rollup_pipeline, category_pipeline)
+        for site_expr in ("$site", {"$literal": ALL_SITES})
+    ]
+
+
+def merge_rollups(docs: Iterable[dict]) -> dict:
+    """Add rollup documents into one summary"""
+    total = {"inspections": 0, "scoreSum": 0, "violations": 0,
+             "risk": dict.fromkeys(RISK_LEVELS, 0), "categories": defaultdict(int)}
+    for doc in docs:
+        total["inspections"] += doc.get("inspections", 0)
+        total["scoreSum"] += doc.get("scoreSum", 0)
+        total["violations"] += doc.get("violations", 0)
+        for level, count in (doc.get("risk") or {}).items():
+            total["risk"][level] = total["risk"].get(level, 0) + count
+        for category, count in (doc.get("categories") or {}).items():
+            total["categories"][category] += count
+    inspections = total["inspections"]
+    return {
+        "inspections": inspections,
+        "averageSafetyScore": round(total["scoreSum"] / inspections, 1) if inspections else None,
+        "violations": total["violations"],
+        "riskCounts": dict(total["risk"]),
+        "categoryCounts": dict(sorted(total["categories"].items(), key=lambda item: -item[1])),
+    }
+
+
+class InspectionRollups:
+    """Rollup documents in one collection, maintained from history writes"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("site", 1), ("day", 1)])
+
+    async def apply(self, records: List[dict]) -> None:
+        """Fold newly written inspection records into the rollups with upserted $inc"""
+        updates = [
+            UpdateOne(
+                {"_id": {"site": site, "day": day}},
+                {"$inc": dict(delta), "$setOnInsert": {"site": site, "day": day}},
+                upsert=True,
+            )
+            for (site, day), delta in rollup_deltas(records).items()
+        ]
+        if updates:
+            await self.collection.bulk_write(updates, ordered=False)
+
+    async def rebuild(self, inspections) -> None:
+        """Recompute the rollups from the inspections collection (backfill).
+
+        Existing rollups are replaced in place, so dashboards keep answering
+        while this runs. Records written during a rebuild may be counted
+        twice or not at all; run it while history writes are quiet.
+        """
+        for pipeline in rebuild_pipelines(self.collection.name):
+            await inspections.aggregate(pipeline).to_list(None)
+
+    async def days(self, site: Optional[str], since: date, until: date) -> List[dict]:
+        """Rollups of one site (or ALL_SITES) for each day in [since, until], oldest first"""
+        return await self.collection.find(
+            {"site": site, "day": {"$gte": since.isoformat(), "$lte": until.isoformat()}},
+            {"_id": 0},
+        ).sort("day", 1).to_list(None)
+
+    async def sites(self, since: date, until: date) -> Dict[Optional[str], dict]:
+        """Summary per site over [since, until]"""
+        docs = await self.collection.find(
+            {"site": {"$ne": ALL_SITES}, "day": {"$gte": since.isoformat(), "$lte": until.isoformat()}},
+            {"_id": 0},
+        ).to_list(None)
+        by_site: Dict[Optional[str], List[dict]] = defaultdict(list)
+        for doc in docs:
+            by_site[doc["site"]].append(doc)
+        return {site: merge_rollups(site_docs) for site, site_docs in by_site.items()}
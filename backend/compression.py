@@ -0,0 +1,127 @@
+"""Content-Encoding negotiation and on-the-fly compression of API responses.
+
+CompressionMiddleware compresses single-message response bodies of
+compressible types once they reach a minimum size, with brotli when the
+client accepts it and the brotli package is installed, else gzip.
+Streamed responses (NDJSON, SSE, PDF reports, files) and responses that
+already carry a Content-Encoding (the precompressed static build) are
+passed through untouched.
+"""
+import gzip
+from typing import List
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+from tracing import stage
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/javascript", "application/json", "application/manifest+json",
+    "application/x-ndjson", "application/xml", "image/svg+xml", "image/x-icon",
+    "image/vnd.microsoft.icon",
+)
+# Bodies above this are compressed in a worker thread rather than on the event loop
+THREAD_MIN_BYTES = 256 * 1024
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """Encodings from Accept-Encoding, best first, without those refused with q=0"""
+    ranked = []
+    for position, part in enumerate(header.split(",")):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if name and quality > 0:
+            ranked.append((-quality, position, name.strip().lower()))
+    return [name for _, _, name in sorted(ranked)]
+
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing whole-body responses of at least minimum_size bytes"""
+
+    def __init__(self, app, *, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    def negotiate(self, scope) -> str:
+        for encoding in accepted_encodings(Headers(scope=scope).get("accept-encoding", "")):
+            if encoding in self.encodings:
+                return encoding
+        return "identity"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(scope)
+        if encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the body is complete
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            headers = MutableHeaders(scope=start)
+            body = message.get("body", b"")
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            with stage("compress"):
+                if len(body) >= THREAD_MIN_BYTES:
+                    compressed = await anyio.to_thread.run_sync(
+                        compress, body, encoding, self.gzip_level, self.brotli_quality
+                    )
+                else:
+                    compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers.add_vary_header("Accept-Encoding")
+            if len(compressed) < len(body):
+                headers["content-encoding"] = encoding
+                headers["content-length"] = str(len(compressed))
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["etag"] = f"W/{etag}"
+                message = {**message, "body": compressed}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
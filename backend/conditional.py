@@ -0,0 +1,18 @@
+"""Conditional request helpers shared by the static build and the previews"""
+from typing import Optional
+
+
+def opaque_tag(etag: str) -> str:
+    """An entity tag without its weakness prefix, for weak comparison"""
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = opaque_tag(etag)
+    return any(opaque_tag(candidate) == wanted for candidate in if_none_match.split(","))
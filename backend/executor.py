@@ -0,0 +1,62 @@
+"""Bounded-concurrency execution helpers for batch analysis"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def iter_bounded(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int,
+    item_timeout: Optional[float] = None,
+) -> AsyncIterator[Tuple[int, Any]]:
+    """Run worker over items with at most `concurrency` in flight.
+
+    Yields (index, result) pairs in completion order. A failed or timed-out
+    item yields its exception instead of a result, so one bad item never
+    aborts the rest. Closing the iterator early cancels the remaining work.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(index: int, item: T) -> Tuple[int, Any]:
+        async with semaphore:
+            try:
+                return index, await asyncio.wait_for(worker(item), timeout=item_timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.ensure_future(run_one(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def run_bounded(
+    items: Sequence[T],
+    worker: Callable[[T], Awaitable[R]],
+    *,
+    concurrency: int,
+    item_timeout: Optional[float] = None,
+) -> List[Any]:
+    """Run worker over items concurrently and return results in input order.
+
+    Failed items are returned as their exception, like asyncio.gather with
+    return_exceptions=True.
+    """
+    results: List[Any] = [None] * len(items)
+    async for index, result in iter_bounded(
+        items, worker, concurrency=concurrency, item_timeout=item_timeout
+    ):
+        results[index] = result
+    return results
@@ -0,0 +1,34 @@
+"""orjson serialization for API responses.
+
+Endpoints that return large lists of results hand their models straight
+to FastJSONResponse, which skips FastAPI's response_model round trip
+(dump, re-validate, serialize, json.dumps) and writes the models with
+orjson in one pass. response_model is kept on those routes for the
+OpenAPI schema. Encoding time is recorded as the "json" stage.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from tracing import stage
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes for plain data or pydantic models (nested anywhere)"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        with stage("json"):
+            return dumps(content)
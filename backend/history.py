@@ -0,0 +1,251 @@
+"""Inspection history: write-behind persistence of analyses and a paginated listing"""
+import asyncio
+import base64
+import binascii
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Returned by listings unless fields= asks for more; heavy fields are opt-in
+LIST_FIELDS = (
+    "photoId", "fileName", "site", "inspectedAt", "riskLevel", "safetyScore",
+    "violationCount", "analysisTier",
+)
+SELECTABLE_FIELDS = LIST_FIELDS + (
+    "source", "jobId", "violationTypes", "violations", "summary", "processingTime",
+    "analysisModel", "imageSha256", "imageStats", "createdAt",
+)
+
+# Equality fields first, then the sort key, so every listing filter is an index walk
+INDEXES = (
+    [("photoId", 1)],
+    [("inspectedAt", -1), ("photoId", -1)],
+    [("site", 1), ("inspectedAt", -1), ("photoId", -1)],
+    [("riskLevel", 1), ("inspectedAt", -1), ("photoId", -1)],
+    [("site", 1), ("riskLevel", 1), ("inspectedAt", -1), ("photoId", -1)],
+)
+
+
+class WriteBehindBuffer:
+    """Batch inserts off the request path: flush with insert_many by size or time.
+
+    add() never awaits. A background task flushes when max_batch records
+    are pending or every flush_interval seconds. Failed batches are kept
+    and retried on the next flush; once max_pending records are waiting,
+    new records are dropped (and counted) rather than growing without
+    bound while the database is unreachable. on_written, if given, is
+    awaited with the records of each batch that were actually inserted.
+    """
+
+    def __init__(
+        self,
+        collection,
+        *,
+        max_batch: int,
+        flush_interval: float,
+        max_pending: int,
+        on_written: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.on_written = on_written
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[dict] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.stats: Dict[str, int] = {"written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, doc: dict) -> None:
+        if len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            if self.stats["dropped"] % 1000 == 1:
+                logger.warning(f"Write-behind buffer full; dropped {self.stats['dropped']} records so far")
+            return
+        self._pending.append(doc)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop the flusher and write out everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out flushing write-behind buffer; {len(self._pending)} records lost")
+        if self._pending:
+            logger.error(f"{len(self._pending)} buffered records could not be written")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                except BulkWriteError as e:
+                    # Individual bad records (e.g. duplicates from a retried flush) are skipped
+                    failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                    written = [doc for index, doc in enumerate(batch) if index not in failed]
+                    logger.warning(f"History insert skipped {len(failed)} records")
+                except Exception as e:
+                    self.stats["failed_flushes"] += 1
+                    self._pending[:0] = batch
+                    logger.error(f"History flush failed, {len(self._pending)} records pending: {e}")
+                    return
+                else:
+                    written = batch
+                self.stats["written"] += len(written)
+                if self.on_written is not None and written:
+                    try:
+                        await self.on_written(written)
+                    except Exception as e:
+                        logger.error(f"Post-write hook failed for {len(written)} records: {e}")
+
+
+def build_query(
+    site: Optional[str] = None,
+    risk_level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> dict:
+    query: dict = {}
+    if site is not None:
+        query["site"] = site
+    if risk_level is not None:
+        query["riskLevel"] = risk_level
+    if since is not None or until is not None:
+        query["inspectedAt"] = {}
+        if since is not None:
+            query["inspectedAt"]["$gte"] = since
+        if until is not None:
+            query["inspectedAt"]["$lt"] = until
+    return query
+
+
+def encode_cursor(doc: dict) -> str:
+    inspected_at = doc["inspectedAt"].astimezone(timezone.utc).isoformat()
+    return base64.urlsafe_b64encode(f"{inspected_at}|{doc['photoId']}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        inspected_at, photo_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(inspected_at), photo_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+class InspectionHistory:
+    """Every analysis result, minus the image, in an inspections collection.
+
+    With rollups (see analytics.py), each written batch is also folded
+    into the dashboard counters.
+    """
+
+    def __init__(self, collection, *, max_batch: int, flush_interval: float, max_pending: int, rollups=None):
+        self.collection = collection
+        self.rollups = rollups
+        self.buffer = WriteBehindBuffer(
+            collection,
+            max_batch=max_batch,
+            flush_interval=flush_interval,
+            max_pending=max_pending,
+            on_written=rollups.apply if rollups is not None else None,
+        )
+        self.enabled = collection is not None
+
+    async def ensure_indexes(self) -> None:
+        """Create the listing indexes; disable history if Mongo is unreachable"""
+        if not self.enabled:
+            return
+        try:
+            for keys in INDEXES:
+                await self.collection.create_index(keys, unique=keys == [("photoId", 1)])
+            if self.rollups is not None:
+                await self.rollups.ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Inspection history disabled ({e})")
+            self.enabled = False
+
+    def start(self) -> None:
+        if self.enabled:
+            self.buffer.start()
+
+    async def stop(self) -> None:
+        if self.enabled:
+            await self.buffer.stop()
+
+    def record(self, doc: dict) -> None:
+        if self.enabled:
+            doc.setdefault("createdAt", datetime.now(timezone.utc))
+            self.buffer.add(doc)
+
+    async def list(
+        self,
+        *,
+        site: Optional[str] = None,
+        risk_level: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        fields: Sequence[str] = LIST_FIELDS,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Newest first; returns one page and the cursor for the next (None at the end)"""
+        query = build_query(site, risk_level, since, until)
+        if cursor:
+            inspected_at, photo_id = decode_cursor(cursor)
+            query = {"$and": [query, {"$or": [
+                {"inspectedAt": {"$lt": inspected_at}},
+                {"inspectedAt": inspected_at, "photoId": {"$lt": photo_id}},
+            ]}]}
+
+        # The sort keys are always fetched so the next cursor can be built
+        projection = {"_id": 0, "inspectedAt": 1, "photoId": 1, **{f: 1 for f in fields}}
+        started = time.perf_counter()
+        docs = await self.collection.find(query, projection).sort(
+            [("inspectedAt", -1), ("photoId", -1)]
+        ).limit(limit).to_list(limit)
+        logger.debug(f"History listing of {len(docs)} took {time.perf_counter() - started:.3f}s")
+
+        next_cursor = encode_cursor(docs[-1]) if len(docs) == limit else None
+        for doc in docs:
+            for key in ("inspectedAt", "photoId"):
+                if key not in fields:
+                    doc.pop(key, None)
+        return docs, next_cursor
+
+    def find(self, query: dict, projection: dict, limit: int, batch_size: int = 100):
+        """Async cursor over matching records, newest first, fetched batch_size at a time"""
+        return self.collection.find(query, {"_id": 0, **projection}, batch_size=batch_size).sort(
+            [("inspectedAt", -1), ("photoId", -1)]
+        ).limit(limit)
+
+    async def get(self, photo_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"photoId": photo_id}, {"_id": 0})
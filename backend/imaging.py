@@ -0,0 +1,78 @@
+"""Image decoding and normalization ahead of the vision call"""
+import io
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from prescreen import QualityMeasures, measure
+
+
+class ImageDecodeError(ValueError):
+    """Raised when uploaded bytes are not a decodable image"""
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    bytes_in: int
+    bytes_out: int
+    quality: Optional[QualityMeasures] = None  # see prescreen.py
+
+
+def to_rgb(img: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to RGB"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    if img.mode != "RGB":
+        return img.convert("RGB")
+    return img
+
+
+def normalize_image(image_bytes: bytes, max_edge: int, quality: int, measure_quality: bool = False) -> PreparedImage:
+    """Decode once, apply EXIF orientation, downscale and re-encode as JPEG.
+
+    CPU-bound; call from a worker pool. An already-compliant JPEG is passed
+    through unchanged when re-encoding would not make it smaller. With
+    measure_quality, the pre-screen measures are taken from the same
+    decoded pixels.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        source_format = img.format
+        source_size = img.size
+        # Let the JPEG decoder skip straight to a reduced scale when possible
+        if source_format == "JPEG":
+            img.draft("RGB", (max_edge, max_edge))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError(f"Unsupported or corrupt image: {e}") from e
+
+    orientation = img.getexif().get(0x0112, 1)
+    img = to_rgb(ImageOps.exif_transpose(img))
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    data = out.getvalue()
+
+    untouched = source_format == "JPEG" and orientation == 1 and max(source_size) <= max_edge
+    if untouched and len(image_bytes) <= len(data):
+        data = image_bytes
+
+    return PreparedImage(
+        data=data,
+        mime_type="image/jpeg",
+        width=img.width,
+        height=img.height,
+        bytes_in=len(image_bytes),
+        bytes_out=len(data),
+        quality=measure(img) if measure_quality else None,
+    )
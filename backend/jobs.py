@@ -0,0 +1,310 @@
+"""Durable asynchronous inspection jobs drained by a worker pool.
+
+Each submitted job is split into one item per image. Workers claim items
+with a time-limited lease, so items held by a crashed or restarted process
+are picked up again once their lease expires. A failed attempt puts the
+item back with a notBefore time, so retries back off exponentially. Job and item state lives in
+a JobStore: MongoDB for durability, or in memory for local runs and tests.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+ITEM_PUBLIC_FIELDS = ("index", "fileName", "status", "attempts", "result", "error")
+
+
+class PermanentJobError(Exception):
+    """An item failure that retrying cannot fix (e.g. an undecodable image)"""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_job(job_id: str, images: List[Tuple[str, bytes]], site: Optional[str] = None) -> Tuple[dict, List[dict]]:
+    now = utcnow()
+    job = {
+        "jobId": job_id,
+        "site": site,
+        "status": "queued",
+        "total": len(images),
+        "completed": 0,
+        "failed": 0,
+        "createdAt": now,
+        "updatedAt": now,
+        "finishedAt": None,
+    }
+    items = [
+        {
+            "jobId": job_id,
+            "index": index,
+            "fileName": file_name,
+            "site": site,
+            "image": image_bytes,
+            "status": "pending",
+            "attempts": 0,
+            "leaseUntil": None,
+            "notBefore": None,
+            "result": None,
+            "error": None,
+            "createdAt": now,
+        }
+        for index, (file_name, image_bytes) in enumerate(images)
+    ]
+    return job, items
+
+
+class MongoJobStore:
+    def __init__(self, db):
+        self.jobs = db["jobs"]
+        self.items = db["job_items"]
+
+    async def ensure_indexes(self) -> None:
+        await self.jobs.create_index("jobId", unique=True)
+        await self.items.create_index([("jobId", 1), ("index", 1)], unique=True)
+        await self.items.create_index([("status", 1), ("leaseUntil", 1), ("createdAt", 1)])
+
+    async def create_job(self, job: dict, items: List[dict]) -> None:
+        await self.jobs.insert_one(dict(job))
+        if items:
+            await self.items.insert_many([dict(item) for item in items], ordered=False)
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self.jobs.find_one({"jobId": job_id}, {"_id": 0})
+
+    async def list_items(self, job_id: str, after_index: int, limit: int) -> List[dict]:
+        projection = {"_id": 0, **{field: 1 for field in ITEM_PUBLIC_FIELDS}}
+        cursor = self.items.find(
+            {"jobId": job_id, "index": {"$gt": after_index}}, projection
+        ).sort("index", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def claim_item(self, lease: timedelta) -> Optional[dict]:
+        now = utcnow()
+        return await self.items.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "notBefore": None},
+                {"status": "pending", "notBefore": {"$lte": now}},
+                {"status": "running", "leaseUntil": {"$lt": now}},
+            ]},
+            {"$set": {"status": "running", "leaseUntil": now + lease}, "$inc": {"attempts": 1}},
+            sort=[("createdAt", 1), ("index", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def release_item(
+        self, item: dict, error: Optional[str], refund_attempt: bool = False, delay: float = 0
+    ) -> None:
+        await self.items.update_one(
+            {"jobId": item["jobId"], "index": item["index"], "status": "running",
+             "attempts": item["attempts"]},
+            {"$set": {"status": "pending", "leaseUntil": None, "error": error,
+                      "notBefore": utcnow() + timedelta(seconds=delay) if delay > 0 else None},
+             "$inc": {"attempts": -1 if refund_attempt else 0}},
+        )
+
+    async def finish_item(self, item: dict, status: str, result: Optional[dict], error: Optional[str]) -> Optional[dict]:
+        # Only the current lease holder may record an outcome, so counters never double count
+        update = await self.items.update_one(
+            {"jobId": item["jobId"], "index": item["index"], "status": "running",
+             "attempts": item["attempts"]},
+            {"$set": {"status": status, "result": result, "error": error, "leaseUntil": None},
+             "$unset": {"image": ""}},
+        )
+        if update.modified_count != 1:
+            return None
+        counter = "completed" if status == "done" else "failed"
+        job = await self.jobs.find_one_and_update(
+            {"jobId": item["jobId"]},
+            {"$inc": {counter: 1}, "$set": {"status": "running", "updatedAt": utcnow()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job and job["completed"] + job["failed"] >= job["total"]:
+            await self.jobs.update_one(
+                {"jobId": item["jobId"]},
+                {"$set": {"status": "completed", "finishedAt": utcnow()}},
+            )
+        return job
+
+
+class MemoryJobStore:
+    """Process-local JobStore with the same semantics as MongoJobStore"""
+
+    def __init__(self):
+        self.jobs: Dict[str, dict] = {}
+        self.items: Dict[str, List[dict]] = {}
+
+    async def ensure_indexes(self) -> None:
+        return None
+
+    async def create_job(self, job: dict, items: List[dict]) -> None:
+        self.jobs[job["jobId"]] = dict(job)
+        self.items[job["jobId"]] = [dict(item) for item in items]
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def list_items(self, job_id: str, after_index: int, limit: int) -> List[dict]:
+        items = self.items.get(job_id, [])
+        page = [item for item in items if item["index"] > after_index][:limit]
+        return [{field: item[field] for field in ITEM_PUBLIC_FIELDS} for item in page]
+
+    async def claim_item(self, lease: timedelta) -> Optional[dict]:
+        now = utcnow()
+        candidates = [
+            item
+            for job_items in self.items.values()
+            for item in job_items
+            if (item["status"] == "pending" and (item.get("notBefore") is None or item["notBefore"] <= now))
+            or (item["status"] == "running" and item["leaseUntil"] < now)
+        ]
+        if not candidates:
+            return None
+        item = min(candidates, key=lambda i: (i["createdAt"], i["index"]))
+        item["status"] = "running"
+        item["leaseUntil"] = now + lease
+        item["attempts"] += 1
+        return dict(item)
+
+    def _owned(self, item: dict) -> Optional[dict]:
+        stored = self.items[item["jobId"]][item["index"]]
+        if stored["status"] == "running" and stored["attempts"] == item["attempts"]:
+            return stored
+        return None
+
+    async def release_item(
+        self, item: dict, error: Optional[str], refund_attempt: bool = False, delay: float = 0
+    ) -> None:
+        stored = self._owned(item)
+        if stored is not None:
+            not_before = utcnow() + timedelta(seconds=delay) if delay > 0 else None
+            stored.update(status="pending", leaseUntil=None, error=error, notBefore=not_before)
+            if refund_attempt:
+                stored["attempts"] -= 1
+
+    async def finish_item(self, item: dict, status: str, result: Optional[dict], error: Optional[str]) -> Optional[dict]:
+        stored = self._owned(item)
+        if stored is None:
+            return None
+        stored.update(status=status, result=result, error=error, leaseUntil=None)
+        stored.pop("image", None)
+        job = self.jobs[item["jobId"]]
+        job["completed" if status == "done" else "failed"] += 1
+        job["status"] = "running"
+        job["updatedAt"] = utcnow()
+        if job["completed"] + job["failed"] >= job["total"]:
+            job["status"] = "completed"
+            job["finishedAt"] = utcnow()
+        return dict(job)
+
+
+class JobRunner:
+    """Pool of asyncio workers draining job items from a JobStore"""
+
+    def __init__(
+        self,
+        store,
+        analyze: Callable[[dict], Awaitable[dict]],
+        *,
+        workers: int,
+        max_attempts: int,
+        item_timeout: float,
+        poll_interval: float,
+        retry_backoff: float = 5.0,
+        retry_backoff_max: float = 300.0,
+    ):
+        self.store = store
+        self.analyze = analyze
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.item_timeout = item_timeout
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        # A lease comfortably outlives one attempt, so live items are never stolen
+        self.lease = timedelta(seconds=item_timeout * 2 + 30)
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def submit(self, images: List[Tuple[str, bytes]], site: Optional[str] = None) -> dict:
+        job, items = new_job(str(uuid.uuid4()), images, site)
+        await self.store.create_job(job, items)
+        self._wakeup.set()
+        return job
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                item = await self.store.claim_item(self.lease)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {n}: claim failed: {e}")
+                item = None
+
+            if item is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Most likely the store failing to record the outcome; the lease hands the item on
+                logger.error(f"Job worker {n}: job {item['jobId']} item {item['index']} not recorded: {e}")
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds before retrying an item that has failed attempts times, doubling each time"""
+        return min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+
+    async def _process(self, item: dict) -> None:
+        label = f"job {item['jobId']} item {item['index']}"
+        if item["attempts"] > self.max_attempts:
+            await self.store.finish_item(item, "failed", None, "Retry limit exceeded")
+            return
+        try:
+            result = await asyncio.wait_for(
+                self.analyze(item), timeout=self.item_timeout
+            )
+        except asyncio.CancelledError:
+            # Shutting down: hand the item back without charging an attempt
+            await asyncio.shield(self.store.release_item(item, None, refund_attempt=True))
+            raise
+        except PermanentJobError as e:
+            logger.error(f"{label} failed: {e}")
+            await self.store.finish_item(item, "failed", None, str(e))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if item["attempts"] < self.max_attempts:
+                delay = self.retry_delay(item["attempts"])
+                logger.warning(f"{label} attempt {item['attempts']} failed, retrying in {delay:g}s: {error}")
+                await self.store.release_item(item, error, delay=delay)
+            else:
+                logger.error(f"{label} failed after {item['attempts']} attempts: {error}")
+                await self.store.finish_item(item, "failed", None, error)
+        else:
+            await self.store.finish_item(item, "done", result, None)
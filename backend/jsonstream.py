@@ -0,0 +1,104 @@
+"""Incremental parsing of the model's analysis JSON as it streams in"""
+import json
+from typing import Any, List, Optional
+
+
+class AnalysisStreamParser:
+    """Scan a streamed analysis answer and surface each violation as soon as it closes.
+
+    Text before the first "{" and after the matching "}" is ignored, which
+    covers markdown code fences and any prose around the JSON object. Only
+    structure is tracked while streaming (string state, nesting depth and
+    the current key of the top-level object); each completed element of the
+    top-level "violations" array is decoded on its own, and the whole object
+    is decoded once by finish().
+    """
+
+    def __init__(self, array_key: str = "violations"):
+        self.array_key = array_key
+        self.buffer = ""
+        self._position = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._in_array = False
+        self._element_start: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    def feed(self, text: str) -> List[Any]:
+        """Add streamed text; returns the array elements completed by it"""
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        while self._position < len(buffer) and self._end is None:
+            index = self._position
+            char = buffer[index]
+            self._position += 1
+
+            if self._start is None:
+                if char == "{":
+                    self._start = index
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect_key:
+                        self._key = json.loads(buffer[self._string_start:index + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._key == self.array_key:
+                    self._in_array = True
+                elif self._in_array and self._depth == 2:
+                    self._element_start = index
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and self._element_start is not None:
+                    try:
+                        completed.append(json.loads(buffer[self._element_start:index + 1]))
+                    except json.JSONDecodeError:
+                        pass  # finish() reports the malformed document
+                    self._element_start = None
+                elif self._in_array and self._depth == 1:
+                    self._in_array = False
+                elif self._depth == 0:
+                    self._end = index
+            elif char == ":" and self._depth == 1:
+                self._expect_key = False
+            elif char == "," and self._depth == 1:
+                self._expect_key = True
+        return completed
+
+    def finish(self) -> Any:
+        """Decode the complete top-level object; raises json.JSONDecodeError if there isn't one"""
+        if self._start is None:
+            raise json.JSONDecodeError("No JSON object in response", self.buffer, 0)
+        if self._end is None:
+            raise json.JSONDecodeError("Response ended inside the JSON object", self.buffer, len(self.buffer))
+        return json.loads(self.buffer[self._start:self._end + 1])
+
+
+def extract_json_object(text: str) -> Any:
+    """Decode the first top-level JSON object in text, ignoring fences or prose around it"""
+    parser = AnalysisStreamParser()
+    parser.feed(text)
+    return parser.finish()
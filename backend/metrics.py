@@ -0,0 +1,93 @@
+"""Prometheus metrics for the analysis pipeline"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Covers both sub-millisecond stages (decode, scoring) and slow vision calls
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "safety_vision_stage_seconds",
+    "Time spent in each analysis stage",
+    ["stage"],  # decode, preprocess, vision, parse, score
+    buckets=STAGE_BUCKETS,
+)
+VISION_ERRORS = Counter(
+    "safety_vision_vision_errors_total",
+    "Failed vision calls (including attempts that were retried), by exception type",
+    ["type"],
+)
+PARSE_FAILURES = Counter(
+    "safety_vision_parse_failures_total",
+    "Vision responses that could not be parsed as analysis JSON",
+)
+CACHE_LOOKUPS = Counter(
+    "safety_vision_cache_lookups_total",
+    "Analysis cache lookups by outcome",
+    ["result"],  # memory_hit, persistent_hit, miss
+)
+CASCADE_DECISIONS = Counter(
+    "safety_vision_cascade_decisions_total",
+    "Screening model outcomes: screened (result kept), escalated_<reason> or bypassed_<path>",
+    ["decision"],  # screened, escalated_critical, ..., bypassed_tiled (per tile), bypassed_packed (per image)
+)
+PACKED_IMAGES = Counter(
+    "safety_vision_packed_images_total",
+    "Batch images sent in multi-image vision calls, by outcome",
+    ["outcome"],  # packed, fallback
+)
+TILES = Counter(
+    "safety_vision_tiles_total",
+    "Tiles of tiled analyses sent to the vision model, by outcome",
+    ["outcome"],  # analyzed, failed
+)
+PRESCREEN_OUTCOMES = Counter(
+    "safety_vision_prescreen_total",
+    "Local pre-screen verdicts on images about to be analyzed",
+    ["outcome"],  # passed, poor_lighting, retake_too_dark, retake_overexposed, retake_featureless, retake_blurred
+)
+PRESCREEN_SAVED_CALLS = Counter(
+    "safety_vision_prescreen_saved_calls_total",
+    "Vision calls not made because the pre-screen asked for a retake",
+)
+ANALYSES_IN_FLIGHT = Gauge(
+    "safety_vision_analyses_in_flight",
+    "Vision analyses currently running",
+    multiprocess_mode="livesum",
+)
+TOKENS = Counter(
+    "safety_vision_tokens_total",
+    "Vision model tokens reported in response usage",
+    ["kind"],  # prompt, completion
+)
+JOB_STORE_KIND = Gauge(
+    "safety_vision_job_store",
+    "Background job store in use (1 for the active kind)",
+    ["store"],  # mongo, memory
+    multiprocess_mode="livemax",
+)
+VISION_CONCURRENCY_LIMIT = Gauge(
+    "safety_vision_vision_concurrency_limit",
+    "Current adaptive concurrency limit for vision calls",
+    multiprocess_mode="livemax",
+)
+
+
+def render_latest() -> tuple:
+    """Metrics in Prometheus text format, aggregated across workers in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
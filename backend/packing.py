@@ -0,0 +1,98 @@
+"""Multi-image packing: several photos per vision call, split back into per-image analyses"""
+import logging
+from typing import Any, List, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RISK_LEVELS = ("High", "Medium", "Low")
+
+PACKED_PROMPT_SUFFIX = """
+
+MULTIPLE IMAGES: You will receive {count} images, labelled "Image 1" to "Image {count}".
+Analyze each image independently, exactly as you would analyze it on its own; never
+carry violations over from one image to another.
+
+Respond with ONE JSON object holding exactly {count} results, one per image in order,
+each in the format above plus an "image" field with the image number:
+{
+    "results": [
+        {"image": 1, "violations": [...], "riskLevel": "High|Medium|Low", "safetyScore": 0-100, "summary": "..."},
+        ...
+    ]
+}"""
+
+
+class PackedResponseMismatch(ValueError):
+    """The model's results don't line up one-to-one with the images sent"""
+
+
+def packed_prompt(base_prompt: str, count: int) -> str:
+    return base_prompt + PACKED_PROMPT_SUFFIX.replace("{count}", str(count))
+
+
+def chunked(items: Sequence[T], size: int) -> List[List[T]]:
+    return [list(items[start:start + size]) for start in range(0, len(items), size)]
+
+
+def _valid_violation(violation: Any) -> bool:
+    if not isinstance(violation, dict):
+        return False
+    if not all(isinstance(violation.get(field), str) for field in ("type", "location", "category")):
+        return False
+    confidence = violation.get("confidence")
+    if not isinstance(confidence, (int, float)) or isinstance(confidence, bool):
+        return False
+    violation["confidence"] = int(round(confidence))
+    return True
+
+
+def validate_analysis(entry: Any) -> Optional[dict]:
+    """Return the entry if it has the single-image analysis shape, else None"""
+    if not isinstance(entry, dict):
+        return None
+    violations = entry.get("violations")
+    score = entry.get("safetyScore")
+    if not isinstance(violations, list) or not all(_valid_violation(v) for v in violations):
+        return None
+    if not isinstance(score, (int, float)) or isinstance(score, bool) or not 0 <= score <= 100:
+        return None
+    if entry.get("riskLevel") not in RISK_LEVELS:
+        return None
+    if not isinstance(entry.get("summary", ""), str):
+        return None
+    return entry
+
+
+def split_packed_results(data: Any, count: int) -> List[Optional[dict]]:
+    """Split a packed answer into per-image analyses, in image order.
+
+    Raises PackedResponseMismatch when the results can't be matched to the
+    images (wrong count, missing or duplicate image numbers), in which case
+    the whole group should be retried one image at a time. A result that is
+    matched but malformed comes back as None so only that image is retried.
+    """
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(results, list) or len(results) != count:
+        found = len(results) if isinstance(results, list) else "no"
+        raise PackedResponseMismatch(f"expected {count} results, got {found}")
+
+    numbers = [entry.get("image") if isinstance(entry, dict) else None for entry in results]
+    if all(number is None for number in numbers):
+        # Unnumbered results are taken in order
+        ordered = results
+    else:
+        if sorted(n for n in numbers if isinstance(n, int)) != list(range(1, count + 1)):
+            raise PackedResponseMismatch(f"image numbers {numbers} don't match 1..{count}")
+        ordered = [None] * count
+        for number, entry in zip(numbers, results):
+            ordered[number - 1] = entry
+
+    analyses = []
+    for number, entry in enumerate(ordered, start=1):
+        analysis = validate_analysis(entry)
+        if analysis is None:
+            logger.warning(f"Packed result for image {number} is malformed")
+        analyses.append(analysis)
+    return analyses
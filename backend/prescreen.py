@@ -0,0 +1,114 @@
+"""Local pre-screening of decoded images before the vision call.
+
+Blurred frames, black pocket shots and blown-out exposures can't be
+inspected, yet each one costs a full vision round trip. The image is
+measured with NumPy on a small grayscale copy (so thresholds don't depend
+on resolution):
+
+- sharpness: variance of the 4-neighbour Laplacian; low means blurred
+- brightness and contrast: mean and standard deviation of the luminance
+- dark and bright fractions: share of the histogram in the bottom and
+  top 16 levels
+
+Unusable images get a retake verdict instead of an analysis, and dim but
+usable ones a measured poor-lighting finding.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+MEASURE_EDGE = 512
+CLIP_LEVELS = 16
+
+RETAKE_SUMMARIES = {
+    "too_dark": "Retake: the photo is too dark to inspect",
+    "overexposed": "Retake: the photo is overexposed",
+    "featureless": "Retake: nothing recognisable in the photo (covered lens?)",
+    "blurred": "Retake: the photo is too blurred to inspect",
+}
+
+
+@dataclass(frozen=True)
+class QualityMeasures:
+    sharpness: float
+    brightness: float
+    contrast: float
+    dark_fraction: float
+    bright_fraction: float
+
+    def as_dict(self) -> dict:
+        return {
+            "sharpness": round(self.sharpness, 1),
+            "brightness": round(self.brightness, 1),
+            "contrast": round(self.contrast, 1),
+            "darkFraction": round(self.dark_fraction, 3),
+            "brightFraction": round(self.bright_fraction, 3),
+        }
+
+
+@dataclass(frozen=True)
+class PrescreenThresholds:
+    min_sharpness: float
+    min_brightness: float
+    max_brightness: float
+    min_contrast: float
+    low_light_brightness: float
+    low_light_dark_fraction: float
+
+
+def measure(img: Image.Image) -> QualityMeasures:
+    """Quality measures of an oriented image; CPU-bound, call from a worker pool"""
+    factor = max(img.size) // MEASURE_EDGE
+    if factor > 1:
+        img = img.reduce(factor)  # cheap box filter first, so large images aren't converted whole
+    gray = img.convert("L")
+    if max(gray.size) > MEASURE_EDGE:
+        gray.thumbnail((MEASURE_EDGE, MEASURE_EDGE), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+
+    if min(pixels.shape) >= 3:
+        laplacian = (
+            pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+            - 4 * pixels[1:-1, 1:-1]
+        )
+        sharpness = float(laplacian.var())
+    else:
+        sharpness = 0.0
+
+    histogram = np.bincount(np.asarray(gray, dtype=np.uint8).ravel(), minlength=256) / pixels.size
+    return QualityMeasures(
+        sharpness=sharpness,
+        brightness=float(pixels.mean()),
+        contrast=float(pixels.std()),
+        dark_fraction=float(histogram[:CLIP_LEVELS].sum()),
+        bright_fraction=float(histogram[-CLIP_LEVELS:].sum()),
+    )
+
+
+def retake_reason(measures: QualityMeasures, thresholds: PrescreenThresholds) -> Optional[str]:
+    """Why the image can't be inspected (too_dark, overexposed, featureless, blurred), or None"""
+    if measures.brightness < thresholds.min_brightness:
+        return "too_dark"
+    if measures.brightness > thresholds.max_brightness:
+        return "overexposed"
+    if measures.contrast < thresholds.min_contrast:
+        return "featureless"
+    if measures.sharpness < thresholds.min_sharpness:
+        return "blurred"
+    return None
+
+
+def is_poorly_lit(measures: QualityMeasures, thresholds: PrescreenThresholds) -> bool:
+    return (
+        measures.brightness < thresholds.low_light_brightness
+        or measures.dark_fraction >= thresholds.low_light_dark_fraction
+    )
+
+
+def lighting_confidence(measures: QualityMeasures, thresholds: PrescreenThresholds) -> int:
+    """How sure the measurement is that the scene is poorly lit, 50-99"""
+    by_brightness = 1 - measures.brightness / thresholds.low_light_brightness
+    by_dark = measures.dark_fraction / thresholds.low_light_dark_fraction - 1
+    return int(min(99, max(50, 50 + 100 * max(by_brightness, by_dark))))
@@ -0,0 +1,215 @@
+"""Content-addressed photo previews on disk and their HTTP delivery.
+
+Previews are made once per image digest and stored under a sharded tree,
+
+    PREVIEW_DIR/ab/cd/abcd...ef-thumb-320.jpg
+
+so no directory grows past a few hundred entries. The variant name
+carries its edge length, so changing a size changes the URL and cached
+copies never go stale: responses are immutable with the digest and
+variant as a strong ETag.
+
+The tree is bounded by prune(), which removes the oldest previews once
+it grows past a size limit; an evicted preview is made again the next
+time its image is analyzed.
+"""
+import logging
+import os
+import re
+import stat
+import tempfile
+import time
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from conditional import etag_matches
+from imaging import normalize_image
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Temporary files older than this are left over from an interrupted write
+STALE_TMP_SECONDS = 3600
+
+
+class PreviewStore:
+    """Downscaled JPEG variants of each image, keyed by SHA-256 digest"""
+
+    def __init__(self, root: Path, variants: Dict[str, int], quality: int):
+        self.root = Path(root)
+        self.quality = quality
+        # Largest first, so each variant is made from the one before it
+        self.variants = {
+            f"{name}-{edge}": edge for name, edge in sorted(variants.items(), key=lambda item: -item[1])
+        }
+        self.names = {name: f"{name}-{edge}" for name, edge in variants.items()}
+
+    def path(self, digest: str, variant: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / f"{digest}-{variant}.jpg"
+
+    def has_all(self, digest: str) -> bool:
+        return all(self.path(digest, variant).is_file() for variant in self.variants)
+
+    def urls(self, digest: str) -> Dict[str, str]:
+        """Public URL of each variant by its short name (thumb, medium)"""
+        return {name: f"/api/previews/{digest}/{variant}.jpg" for name, variant in self.names.items()}
+
+    def generate(self, image_bytes: bytes, digest: str) -> None:
+        """Write every missing variant; CPU-bound, call from a worker pool"""
+        data = image_bytes
+        for variant, edge in self.variants.items():
+            data = normalize_image(data, edge, self.quality).data
+            path = self.path(digest, variant)
+            if path.is_file():
+                continue
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+                tmp.write(data)
+            os.replace(tmp.name, path)
+
+    def resolve(self, digest: str, variant_file: str) -> Optional[Tuple[Path, str]]:
+        """Path and variant for a request like (digest, "thumb-320.jpg"), if valid and present"""
+        variant, _, extension = variant_file.rpartition(".")
+        if extension != "jpg" or variant not in self.variants or not DIGEST_PATTERN.match(digest):
+            return None
+        path = self.path(digest, variant)
+        return (path, variant) if path.is_file() else None
+
+    def prune(self, max_bytes: int) -> Tuple[int, int]:
+        """Delete the oldest previews until the tree is within max_bytes; blocking, call from a thread.
+
+        Returns the number of files and bytes removed.
+        """
+        now = time.time()
+        files: List[Tuple[float, int, Path]] = []
+        total = removed = freed = 0
+        for path in self.root.glob("*/*/*"):
+            try:
+                info = path.stat()
+            except FileNotFoundError:
+                continue
+            if path.suffix == ".tmp":
+                if now - info.st_mtime > STALE_TMP_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+            total += info.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def read(self, digest: str, name: str) -> Optional[bytes]:
+        path = self.path(digest, self.names[name])
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end inclusive) of a single "bytes=" range.
+
+    Returns None when the header should be ignored (other units, several
+    ranges) and raises ValueError when the range can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end or start < 0:
+        raise ValueError(header)
+    return start, min(end, size - 1)
+
+
+class ImmutableFileResponse(FileResponse):
+    """FileResponse with a strong ETag, conditional GETs and single byte ranges.
+
+    Whole files go out through the server's http.response.pathsend
+    extension when it has one, and any range through
+    http.response.zerocopysend, so the kernel copies the file; otherwise
+    the file is read in chunks.
+    """
+
+    def __init__(self, path: Path, etag: str, media_type: str = "image/jpeg"):
+        super().__init__(path, media_type=media_type, headers={
+            "etag": f'"{etag}"',
+            "cache-control": IMMUTABLE,
+            "accept-ranges": "bytes",
+        })
+        self.etag = f'"{etag}"'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+        headers = dict((k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"])
+        size = stat_result.st_size
+        self.headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+
+        if etag_matches(headers.get("if-none-match"), self.etag):
+            response = Response(status_code=304, headers={
+                "etag": self.etag, "cache-control": IMMUTABLE,
+            })
+            await response(scope, receive, send)
+            return
+
+        byte_range = None
+        range_header = headers.get("range")
+        if range_header and headers.get("if-range", self.etag) == self.etag:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+                await response(scope, receive, send)
+                return
+
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        self.headers["content-length"] = str(length)
+        if byte_range is not None:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or not length:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif byte_range is None and "http.response.pathsend" in extensions:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend", "file": file.fileno(),
+                    "offset": start, "count": length, "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(start)
+                remaining = length
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining and chunk)})
+                    if not chunk:
+                        break
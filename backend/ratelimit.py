@@ -0,0 +1,211 @@
+"""Client-side rate limiting, adaptive concurrency and retries for vision calls"""
+import asyncio
+import email.utils
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute.
+
+    A non-positive rate disables the bucket. Waiters are served in FIFO
+    order. The balance may go negative after adjust() so that underestimated
+    requests are paid back before new ones start.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> None:
+        if not self.enabled:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Credit (positive) or debit (negative) tokens after the real cost is known"""
+        if not self.enabled:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit tuned by AIMD: +1 per window of successes, halved on throttling"""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, cooldown: float = 2.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self) -> None:
+        # One burst of 429s should only halve the limit once
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._last_decrease = now
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read the provider's Retry-After hint from an API error, if any"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            value = headers["retry-after"]
+            try:
+                return float(value)
+            except ValueError:
+                retry_at = email.utils.parsedate_to_datetime(value)
+                return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def classify_error(exc: Exception) -> Optional[str]:
+    """Return "throttle" or "transient" for retryable errors, None otherwise"""
+    if isinstance(exc, openai.RateLimitError):
+        # An exhausted quota will not recover by waiting
+        if getattr(exc, "code", None) == "insufficient_quota":
+            return None
+        return "throttle"
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return "transient"
+    return None
+
+
+class VisionGovernor:
+    """Gate every vision call through RPM/TPM buckets and an adaptive concurrency limit.
+
+    Retryable failures are retried with full-jitter exponential backoff,
+    or after the provider's Retry-After when given. A throttle pauses all
+    new calls, not just the one that was rejected.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        initial_concurrency: int,
+        max_concurrency: int,
+        max_retries: int,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, 1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._paused_until = 0.0
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0}
+
+    def backoff(self, attempt: int, exc: Exception) -> float:
+        hinted = retry_after_seconds(exc)
+        if hinted is not None:
+            return min(hinted, self.backoff_max) + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        attempt = 0
+        while True:
+            await self._wait_for_pause()
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            self.stats["calls"] += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == "throttle":
+                    self.stats["throttled"] += 1
+                    self.concurrency.on_throttle()
+                if kind is None or attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                delay = self.backoff(attempt, e)
+                if kind == "throttle":
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self.stats["retries"] += 1
+                logger.warning(
+                    f"Vision call {kind} ({type(e).__name__}); retry {attempt + 1}/{self.max_retries} "
+                    f"in {delay:.1f}s, concurrency limit {int(self.concurrency.limit)}"
+                )
+                attempt += 1
+            else:
+                self.concurrency.on_success()
+                usage = getattr(result, "usage", None)
+                actual = getattr(usage, "total_tokens", None)
+                if actual is not None:
+                    self.tokens.adjust(estimated_tokens - actual)
+                return result
+            finally:
+                await self.concurrency.release()
+            await asyncio.sleep(delay)
+
+
+def estimate_image_tokens(width: int, height: int, detail: str) -> int:
+    """Vision input tokens for one image, following OpenAI's tiling rules"""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
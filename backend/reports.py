@@ -0,0 +1,518 @@
+"""Streaming PDF inspection reports.
+
+The PDF is written object by object: each page's thumbnail, content
+stream and page dictionary are emitted as soon as the page is laid out,
+and only the byte offsets are kept until the page tree, catalog and
+cross-reference table close the file. Memory therefore depends on one
+page, not on the number of photos. Layout mirrors the browser reports in
+frontend/src/utils/pdfGenerator.js (A4, millimetre coordinates from the
+top-left corner, Helvetica).
+"""
+import io
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from analytics import RISK_LEVELS, merge_rollups
+from imaging import PreparedImage, normalize_image, to_rgb
+from prescreen import RETAKE_SUMMARIES
+
+MM = 72 / 25.4
+PAGE_WIDTH = 210
+PAGE_HEIGHT = 297
+MARGIN = 20
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+FOOTER_Y = PAGE_HEIGHT - 15
+
+PRIMARY = (15, 23, 42)
+ACCENT = (249, 115, 22)
+TEXT = (30, 41, 59)
+MUTED = (100, 116, 139)
+PANEL = (248, 250, 252)
+BORDER = (226, 232, 240)
+WHITE = (255, 255, 255)
+RED = (239, 68, 68)
+AMBER = (245, 158, 11)
+GREEN = (34, 197, 94)
+
+RECOMMENDATIONS = (
+    ("PPE", "PPE Compliance",
+     "Immediately ensure all personnel wear proper PPE including hard hats, safety vests, gloves, and eye protection."),
+    ("Equipment", "Equipment Safety",
+     "Review equipment placement and safety guards. Secure all machinery and cover exposed parts."),
+    ("Environmental", "Environmental Hazards",
+     "Address spills, exposed wiring, and fire hazards immediately. Ensure proper containment."),
+    ("Housekeeping", "Housekeeping",
+     "Schedule cleanup to remove debris and organize work areas. Establish regular housekeeping protocols."),
+)
+
+# Violations table: (heading, width in mm)
+VIOLATION_COLUMNS = (("#", 10), ("Violation", 60), ("Category", 32), ("Location", 40), ("Confidence", 28))
+
+# Glyph widths (1/1000 em) of the standard Helvetica fonts for ASCII 32-126
+_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+
+
+def text_width(text: str, size: float, bold: bool = False) -> float:
+    """Width of text in mm at a font size in points"""
+    widths = _HELVETICA_BOLD if bold else _HELVETICA
+    units = sum(widths[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text)
+    return units * size / 1000 / MM
+
+
+def fit_text(text: str, width: float, size: float, bold: bool = False) -> str:
+    """Truncate text with an ellipsis so it fits in width mm"""
+    if text_width(text, size, bold) <= width:
+        return text
+    while text and text_width(text + "...", size, bold) > width:
+        text = text[:-1]
+    return text + "..."
+
+
+def wrap_text(text: str, width: float, size: float, bold: bool = False) -> List[str]:
+    """Break text into lines no wider than width mm"""
+    lines: List[str] = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and text_width(candidate, size, bold) > width:
+            lines.append(line)
+            candidate = word
+        line = candidate
+    if line:
+        lines.append(line)
+    return [fit_text(line, width, size, bold) for line in lines]
+
+
+def risk_color(risk_level: str) -> Tuple[int, int, int]:
+    return RED if risk_level == "High" else AMBER if risk_level == "Medium" else GREEN
+
+
+def score_color(score: float) -> Tuple[int, int, int]:
+    return GREEN if score >= 70 else AMBER if score >= 40 else RED
+
+
+def confidence_color(confidence: int) -> Tuple[int, int, int]:
+    return RED if confidence >= 80 else AMBER if confidence >= 60 else GREEN
+
+
+def pdf_string(text: str) -> str:
+    data = text.encode("cp1252", errors="replace").decode("latin-1")
+    return "(" + data.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def _rgb(color: Tuple[int, int, int]) -> str:
+    return " ".join(f"{c / 255:.3f}" for c in color)
+
+
+def report_thumbnail(image_bytes: bytes, max_edge: int, quality: int) -> PreparedImage:
+    """Downscaled RGB JPEG for a photo page; CPU-bound, call from a worker pool"""
+    thumbnail = normalize_image(image_bytes, max_edge, quality)
+    # A small JPEG may be passed through as-is; the page embeds it as DeviceRGB
+    img = Image.open(io.BytesIO(thumbnail.data))
+    if img.mode != "RGB":
+        out = io.BytesIO()
+        to_rgb(img).save(out, format="JPEG", quality=quality)
+        thumbnail.data = out.getvalue()
+    return thumbnail
+
+
+@dataclass
+class ReportEntry:
+    """One photo, from a submitted response or a history record.
+
+    Retakes (retakeReason set) were refused by the pre-screen and carry no
+    risk level or score.
+    """
+    fileName: str
+    inspectedAt: str
+    riskLevel: Optional[str]
+    safetyScore: Optional[int]
+    violations: List[dict]
+    processingTime: Optional[float] = None
+    site: Optional[str] = None
+    summary: str = ""
+    imageSha256: Optional[str] = None
+    retakeReason: Optional[str] = None
+
+    @classmethod
+    def from_response(cls, response: dict) -> "ReportEntry":
+        results = response["analysisResults"]
+        return cls(
+            fileName=response["fileName"],
+            inspectedAt=response["uploadTime"],
+            riskLevel=results["riskLevel"],
+            safetyScore=results["safetyScore"],
+            violations=results["violations"],
+            processingTime=response.get("processingTime"),
+            summary=RETAKE_SUMMARIES.get(response.get("retakeReason"), ""),
+            imageSha256=response.get("imageSha256"),
+            retakeReason=response.get("retakeReason"),
+        )
+
+    @classmethod
+    def from_record(cls, record: dict) -> "ReportEntry":
+        return cls(
+            fileName=record["fileName"],
+            inspectedAt=record["inspectedAt"].isoformat(),
+            riskLevel=record["riskLevel"],
+            safetyScore=record["safetyScore"],
+            violations=record.get("violations") or [],
+            processingTime=record.get("processingTime"),
+            site=record.get("site"),
+            summary=record.get("summary") or "",
+            imageSha256=record.get("imageSha256"),
+        )
+
+
+@dataclass
+class ReportTally:
+    """Executive-summary counters, shaped like an analytics rollup"""
+    counters: dict = field(default_factory=lambda: {
+        "inspections": 0, "scoreSum": 0, "violations": 0,
+        "risk": dict.fromkeys(RISK_LEVELS, 0), "categories": {},
+    })
+    retakes: int = 0
+
+    def add(self, entry: ReportEntry) -> None:
+        if entry.retakeReason is not None:
+            self.retakes += 1
+            return
+        self.counters["inspections"] += 1
+        self.counters["scoreSum"] += entry.safetyScore
+        self.counters["violations"] += len(entry.violations)
+        self.counters["risk"][entry.riskLevel] = self.counters["risk"].get(entry.riskLevel, 0) + 1
+        for violation in entry.violations:
+            category = violation.get("category", "")
+            self.counters["categories"][category] = self.counters["categories"].get(category, 0) + 1
+
+    def summary(self) -> dict:
+        return {**merge_rollups([self.counters]), "retakes": self.retakes}
+
+
+class PdfStream:
+    """Sequential PDF object writer; take() hands over the bytes written so far"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+        self._offsets: Dict[int, int] = {}
+        self._next_number = 1
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self._chunks.append(data)
+        self._offset += len(data)
+
+    def reserve(self) -> int:
+        number = self._next_number
+        self._next_number += 1
+        return number
+
+    def write_object(self, body: str, number: Optional[int] = None) -> int:
+        return self.write_raw(body.encode("latin-1"), number)
+
+    def write_raw(self, body: bytes, number: Optional[int] = None) -> int:
+        number = number or self.reserve()
+        self._offsets[number] = self._offset
+        self._write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        return number
+
+    def write_stream(self, dictionary: str, data: bytes, number: Optional[int] = None) -> int:
+        header = f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode("latin-1")
+        return self.write_raw(header + data + b"\nendstream", number)
+
+    def close(self, root: int, info: int) -> None:
+        xref_offset = self._offset
+        lines = [f"xref\n0 {self._next_number}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[n]:010d} 00000 n \n" for n in range(1, self._next_number)]
+        lines.append(f"trailer\n<< /Size {self._next_number} /Root {root} 0 R /Info {info} 0 R >>\n")
+        lines.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode("latin-1"))
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class Page:
+    """Drawing operations for one A4 page, in mm from the top-left corner"""
+
+    def __init__(self):
+        self.ops: List[str] = []
+        self.images: List[PreparedImage] = []
+
+    def rect(self, x: float, y: float, w: float, h: float, fill=None, stroke=None) -> None:
+        box = f"{x * MM:.2f} {(PAGE_HEIGHT - y - h) * MM:.2f} {w * MM:.2f} {h * MM:.2f} re"
+        if fill is not None:
+            self.ops.append(f"{_rgb(fill)} rg {box} f")
+        if stroke is not None:
+            self.ops.append(f"{_rgb(stroke)} RG 0.5 w {box} S")
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, color, width: float = 0.2) -> None:
+        self.ops.append(
+            f"{_rgb(color)} RG {width * MM:.2f} w {x1 * MM:.2f} {(PAGE_HEIGHT - y1) * MM:.2f} m "
+            f"{x2 * MM:.2f} {(PAGE_HEIGHT - y2) * MM:.2f} l S"
+        )
+
+    def text(self, x: float, y: float, text: str, size: float, bold: bool = False, color=TEXT) -> None:
+        """Draw text with its baseline at y"""
+        self.ops.append(
+            f"BT /{'F2' if bold else 'F1'} {size} Tf {_rgb(color)} rg "
+            f"{x * MM:.2f} {(PAGE_HEIGHT - y) * MM:.2f} Td {pdf_string(text)} Tj ET"
+        )
+
+    def image(self, image: PreparedImage, x: float, y: float, w: float, h: float) -> None:
+        self.images.append(image)
+        self.ops.append(
+            f"q {w * MM:.2f} 0 0 {h * MM:.2f} {x * MM:.2f} {(PAGE_HEIGHT - y - h) * MM:.2f} cm "
+            f"/Im{len(self.images)} Do Q"
+        )
+
+
+class PdfReport:
+    """Cover page with the executive summary, then one or more pages per photo"""
+
+    def __init__(self, title: str, generated_at: datetime):
+        self.title = title
+        self.generated = generated_at.strftime("%Y-%m-%d %H:%M UTC")
+        self.pdf = PdfStream()
+        self.pages_ref = self.pdf.reserve()
+        self.page_refs: List[int] = []
+        self.fonts = {
+            name: self.pdf.write_object(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>"
+            )
+            for name, font in (("F1", "Helvetica"), ("F2", "Helvetica-Bold"))
+        }
+
+    def _emit(self, page: Page) -> None:
+        self._footer(page)
+        images = {
+            f"Im{n}": self.pdf.write_stream(
+                f"/Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                "/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode",
+                image.data,
+            )
+            for n, image in enumerate(page.images, start=1)
+        }
+        content = self.pdf.write_stream("/Filter /FlateDecode", zlib.compress("\n".join(page.ops).encode("latin-1")))
+        fonts = " ".join(f"/{name} {ref} 0 R" for name, ref in self.fonts.items())
+        xobjects = " ".join(f"/{name} {ref} 0 R" for name, ref in images.items())
+        self.page_refs.append(self.pdf.write_object(
+            f"<< /Type /Page /Parent {self.pages_ref} 0 R "
+            f"/MediaBox [0 0 {PAGE_WIDTH * MM:.2f} {PAGE_HEIGHT * MM:.2f}] "
+            f"/Resources << /Font << {fonts} >> /XObject << {xobjects} >> >> /Contents {content} 0 R >>"
+        ))
+
+    def _footer(self, page: Page) -> None:
+        page.line(MARGIN, FOOTER_Y - 5, PAGE_WIDTH - MARGIN, FOOTER_Y - 5, MUTED)
+        page.text(MARGIN, FOOTER_Y, "AI Safety Vision - AI-Powered Inspection Tool", 8, color=MUTED)
+        page.text(PAGE_WIDTH / 2 - 5, FOOTER_Y, f"Page {len(self.page_refs) + 1}", 8, color=MUTED)
+        page.text(PAGE_WIDTH - MARGIN - 25, FOOTER_Y, "Confidential", 8, color=MUTED)
+
+    def cover(self, summary: dict, subtitle: str = "") -> bytes:
+        page = Page()
+        page.rect(0, 0, PAGE_WIDTH, 40, fill=PRIMARY)
+        page.text(MARGIN, 25, fit_text(self.title, CONTENT_WIDTH, 22, bold=True), 22, bold=True, color=WHITE)
+        page.text(
+            MARGIN, 35,
+            f"Generated: {self.generated} | {summary['inspections']} Photos Analyzed{subtitle}",
+            10, color=WHITE,
+        )
+
+        y = 55
+        page.text(MARGIN, y, "EXECUTIVE SUMMARY", 14, bold=True)
+        y += 10
+        average = summary["averageSafetyScore"]
+        rows = [
+            ("Total Photos Analyzed", str(summary["inspections"])),
+            ("High Risk Items", str(summary["riskCounts"].get("High", 0))),
+            ("Medium Risk Items", str(summary["riskCounts"].get("Medium", 0))),
+            ("Low Risk Items", str(summary["riskCounts"].get("Low", 0))),
+            ("Total Violations Found", str(summary["violations"])),
+            ("Average Safety Score", f"{average:g}%" if average is not None else "-"),
+        ]
+        if summary.get("retakes"):
+            rows.insert(1, ("Retakes Required (not scored)", str(summary["retakes"])))
+        for label, value in rows:
+            page.text(MARGIN + 2, y, label, 10, bold=True)
+            page.text(MARGIN + 80 - text_width(value, 10), y, value, 10)
+            y += 7
+
+        if summary["categoryCounts"]:
+            y += 8
+            page.text(MARGIN, y, "VIOLATIONS BY CATEGORY", 14, bold=True)
+            y += 10
+            # Most frequent first; the model occasionally invents categories
+            for category, count in list(summary["categoryCounts"].items())[:6]:
+                page.text(MARGIN + 2, y, fit_text(category or "Uncategorized", 60, 10), 10, bold=True)
+                page.text(MARGIN + 80 - text_width(str(count), 10), y, str(count), 10)
+                y += 7
+
+        y += 8
+        page.text(MARGIN, y, "RECOMMENDED ACTIONS", 14, bold=True)
+        y += 6
+        actions = [(title, action) for category, title, action in RECOMMENDATIONS
+                   if summary["categoryCounts"].get(category)]
+        if actions:
+            page.rect(MARGIN, y, CONTENT_WIDTH, 8, fill=ACCENT)
+            page.text(MARGIN + 3, y + 5.5, "Category", 9, bold=True, color=WHITE)
+            page.text(MARGIN + 45, y + 5.5, "Action Required", 9, bold=True, color=WHITE)
+            y += 8
+            for row, (title, action) in enumerate(actions):
+                lines = wrap_text(action, CONTENT_WIDTH - 48, 9)
+                height = 4 + 5 * len(lines)
+                if row % 2:
+                    page.rect(MARGIN, y, CONTENT_WIDTH, height, fill=PANEL)
+                page.text(MARGIN + 3, y + 6, title, 9, bold=True)
+                for n, line in enumerate(lines):
+                    page.text(MARGIN + 45, y + 6 + 5 * n, line, 9)
+                y += height
+        else:
+            page.rect(MARGIN, y, CONTENT_WIDTH, 20, fill=GREEN)
+            page.text(MARGIN + 10, y + 13, "All areas compliant. Continue regular safety monitoring.", 10, color=WHITE)
+
+        self._emit(page)
+        return self.pdf.take()
+
+    def _photo_header(self, page: Page, index: int, entry: ReportEntry, continued: bool = False) -> None:
+        color = MUTED if entry.retakeReason else risk_color(entry.riskLevel)
+        page.rect(0, 0, PAGE_WIDTH, 25, fill=PRIMARY)
+        page.rect(0, 0, 3, 25, fill=color)
+        title = f"{index}. {entry.fileName}" + (" (continued)" if continued else "")
+        page.text(MARGIN, 12, fit_text(title, CONTENT_WIDTH - 50, 14, bold=True), 14, bold=True, color=WHITE)
+        details = [f"Analyzed: {entry.inspectedAt[:19].replace('T', ' ')}"]
+        if entry.site:
+            details.append(f"Site: {entry.site}")
+        if entry.processingTime is not None:
+            details.append(f"Processing Time: {entry.processingTime:.2f}s")
+        page.text(MARGIN, 20, fit_text(" | ".join(details), CONTENT_WIDTH - 50, 9), 9, color=WHITE)
+        page.rect(PAGE_WIDTH - MARGIN - 45, 6, 45, 13, fill=color)
+        badge = "RETAKE REQUIRED" if entry.retakeReason else f"{entry.riskLevel.upper()} | {entry.safetyScore}%"
+        page.text(PAGE_WIDTH - MARGIN - 43, 14.5, badge, 9, bold=True, color=WHITE)
+
+    def _table_header(self, page: Page, y: float) -> float:
+        page.rect(MARGIN, y, CONTENT_WIDTH, 8, fill=PRIMARY)
+        x = MARGIN
+        for heading, width in VIOLATION_COLUMNS:
+            page.text(x + 2, y + 5.5, heading, 9, bold=True, color=WHITE)
+            x += width
+        return y + 8
+
+    def photo(self, index: int, entry: ReportEntry, thumbnail: Optional[PreparedImage]) -> bytes:
+        """Pages for one photo: thumbnail, risk and score, summary and the violations table.
+
+        A retake gets the thumbnail and the retake reason only.
+        """
+        page = Page()
+        self._photo_header(page, index, entry)
+
+        y = 33
+        box_height = 95
+        page.rect(MARGIN, y, CONTENT_WIDTH, box_height, fill=PANEL, stroke=BORDER)
+        if thumbnail is not None:
+            scale = min(CONTENT_WIDTH / thumbnail.width, box_height / thumbnail.height)
+            w, h = thumbnail.width * scale, thumbnail.height * scale
+            page.image(thumbnail, MARGIN + (CONTENT_WIDTH - w) / 2, y + (box_height - h) / 2, w, h)
+        else:
+            label = "Photo not available"
+            page.text(PAGE_WIDTH / 2 - text_width(label, 10) / 2, y + box_height / 2, label, 10, color=MUTED)
+        y += box_height + 8
+
+        if entry.retakeReason:
+            reason = entry.retakeReason.replace("_", " ").upper()
+            page.rect(MARGIN, y, CONTENT_WIDTH, 22, fill=MUTED)
+            page.text(MARGIN + 5, y + 8, "NOT INSPECTED", 9, bold=True, color=WHITE)
+            page.text(MARGIN + 5, y + 18, f"RETAKE REQUIRED: {reason}", 14, bold=True, color=WHITE)
+            y += 30
+            for line in wrap_text(entry.summary, CONTENT_WIDTH, 9)[:4]:
+                page.text(MARGIN, y, line, 9, color=MUTED)
+                y += 5
+            self._emit(page)
+            return self.pdf.take()
+
+        box_width = (CONTENT_WIDTH - 10) / 2
+        for x, label, value, color in (
+            (MARGIN, "RISK LEVEL", entry.riskLevel.upper(), risk_color(entry.riskLevel)),
+            (MARGIN + box_width + 10, "SAFETY SCORE", f"{entry.safetyScore}%", score_color(entry.safetyScore)),
+        ):
+            page.rect(x, y, box_width, 22, fill=color)
+            page.text(x + 5, y + 8, label, 9, bold=True, color=WHITE)
+            page.text(x + 5, y + 18, value, 14, bold=True, color=WHITE)
+        y += 30
+
+        for line in wrap_text(entry.summary, CONTENT_WIDTH, 9)[:4]:
+            page.text(MARGIN, y, line, 9, color=MUTED)
+            y += 5
+        y += 5
+
+        page.text(MARGIN, y, f"VIOLATIONS FOUND ({len(entry.violations)})", 12, bold=True)
+        y += 5
+        if not entry.violations:
+            page.rect(MARGIN, y, CONTENT_WIDTH, 18, fill=GREEN)
+            page.text(MARGIN + 10, y + 11.5, "NO VIOLATIONS DETECTED", 11, bold=True, color=WHITE)
+        else:
+            y = self._table_header(page, y)
+            for row, violation in enumerate(entry.violations):
+                if y + 8 > FOOTER_Y - 8:
+                    self._emit(page)
+                    page = Page()
+                    self._photo_header(page, index, entry, continued=True)
+                    y = self._table_header(page, 33)
+                if row % 2:
+                    page.rect(MARGIN, y, CONTENT_WIDTH, 8, fill=PANEL)
+                confidence = int(violation.get("confidence", 0))
+                cells = (
+                    (str(row + 1), TEXT),
+                    (str(violation.get("type", "")), TEXT),
+                    (str(violation.get("category", "")), TEXT),
+                    (str(violation.get("location", "")), TEXT),
+                    (f"{confidence}%", confidence_color(confidence)),
+                )
+                x = MARGIN
+                for (value, color), (_, width) in zip(cells, VIOLATION_COLUMNS):
+                    page.text(x + 2, y + 5.5, fit_text(value, width - 4, 9), 9, color=color)
+                    x += width
+                y += 8
+
+        self._emit(page)
+        return self.pdf.take()
+
+    def finish(self) -> bytes:
+        kids = " ".join(f"{ref} 0 R" for ref in self.page_refs)
+        self.pdf.write_object(
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_refs)} >>", self.pages_ref
+        )
+        root = self.pdf.write_object(f"<< /Type /Catalog /Pages {self.pages_ref} 0 R >>")
+        info = self.pdf.write_object(
+            f"<< /Title {pdf_string(self.title)} /Producer (AI Safety Vision) >>"
+        )
+        self.pdf.close(root, info)
+        return self.pdf.take()
+
+
+def report_filename(prefix: str, generated_at: datetime, parts: Sequence[str] = ()) -> str:
+    safe = "_".join(
+        "".join(c if c.isalnum() else "_" for c in part) for part in (prefix, *parts) if part
+    )
+    return f"{safe}_{generated_at.strftime('%Y-%m-%d')}.pdf"
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Re-score stored analyses under the current deduction table, without vision calls.
+
+Reads the violations of every stored result, scores them in bulk with
+the vectorized taxonomy scorer and writes back the safety scores and risk
+levels that changed.
+
+    cd backend && python rescore.py --taxonomy new_deductions.json --dry-run
+    cd backend && python rescore.py --taxonomy new_deductions.json
+"""
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from taxonomy import Taxonomy, load_taxonomy
+
+load_dotenv(Path(__file__).parent / '.env')
+logger = logging.getLogger("rescore")
+
+# collection -> (filter, path to the analysis fields inside each document; "" for top level).
+# Retakes carry no score to revise: the image was never inspected.
+TARGETS = {
+    "job_items": ({"status": "done", "result": {"$ne": None}, "result.retakeReason": None}, "result.analysisResults"),
+    "analysis_cache": ({}, "analysis"),
+    "inspections": ({}, ""),
+}
+
+
+def field(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+def get_path(doc: dict, path: str):
+    for part in filter(None, path.split(".")):
+        doc = doc.get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def batches(collection, query: dict, path: str, size: int) -> Iterator[List[dict]]:
+    projection = {field(path, name): 1 for name in ("violations", "safetyScore", "riskLevel")}
+    batch = []
+    for doc in collection.find(query, projection, batch_size=size):
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rescore_collection(collection, query: dict, path: str, taxonomy: Taxonomy,
+                       batch_size: int, dry_run: bool) -> Tuple[int, int]:
+    scanned = changed = 0
+    for docs in batches(collection, query, path, batch_size):
+        analyses = [get_path(doc, path) or {} for doc in docs]
+        result = taxonomy.score_many([analysis.get("violations") or [] for analysis in analyses])
+        updates = []
+        for doc, analysis, score, risk in zip(docs, analyses, result.scores.tolist(), result.risk_levels.tolist()):
+            if analysis.get("safetyScore") != score or analysis.get("riskLevel") != risk:
+                updates.append(UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {field(path, "safetyScore"): score, field(path, "riskLevel"): risk}},
+                ))
+        scanned += len(docs)
+        changed += len(updates)
+        if updates and not dry_run:
+            collection.bulk_write(updates, ordered=False)
+    return scanned, changed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--taxonomy", default=os.environ.get("TAXONOMY_FILE"),
+                        help="JSON deduction overrides (default: TAXONOMY_FILE)")
+    parser.add_argument("--collections", nargs="+", choices=sorted(TARGETS), default=sorted(TARGETS))
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    taxonomy = load_taxonomy(args.taxonomy)
+    db = MongoClient(os.environ['MONGO_URL'])[os.environ.get('DB_NAME', 'safety_vision')]
+    logger.info(f"Re-scoring with taxonomy {taxonomy.fingerprint}{' (dry run)' if args.dry_run else ''}")
+    for name in args.collections:
+        query, path = TARGETS[name]
+        started = time.perf_counter()
+        scanned, changed = rescore_collection(db[name], query, path, taxonomy, args.batch_size, args.dry_run)
+        logger.info(f"{name}: {scanned} analyses scanned, {changed} changed in {time.perf_counter() - started:.1f}s")
+        if name == "inspections" and changed and not args.dry_run:
+            logger.info("Analytics rollups are now stale; rebuild them with POST /api/analytics/rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,291 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
 import uuid
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 import base64
-from openai import OpenAI
+import binascii
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+import openai
+from executor import iter_bounded, run_bounded
+from analysis_cache import AnalysisCache
+from singleflight import SingleFlight
+from imaging import ImageDecodeError, PreparedImage, normalize_image
+from jobs import JobRunner, MemoryJobStore, MongoJobStore, PermanentJobError
+from history import LIST_FIELDS, SELECTABLE_FIELDS, InspectionHistory, build_query
+from analytics import ALL_SITES, InspectionRollups, merge_rollups
+from reports import PdfReport, ReportEntry, ReportTally, report_filename, report_thumbnail
+from previews import ImmutableFileResponse, PreviewStore
+from staticassets import StaticManifest
+from compression import CompressionMiddleware
+from fastjson import FastJSONResponse, dumps
+from ratelimit import VisionGovernor, estimate_image_tokens, retry_after_seconds
+from vision_backends import (
+    OpenAIVisionBackend, StubVisionBackend, VisionBackend, VisionCompletion, VisionStreamInterrupted
+)
+from taxonomy import confidence_value, load_taxonomy
+from jsonstream import AnalysisStreamParser, extract_json_object
+from packing import PackedResponseMismatch, chunked, packed_prompt, split_packed_results
+from tiling import image_size, make_tiles, merge_violations, should_tile, to_image
+from prescreen import (
+    RETAKE_SUMMARIES, PrescreenThresholds, QualityMeasures, is_poorly_lit, lighting_confidence, retake_reason
+)
+from metrics import (
+    ANALYSES_IN_FLIGHT, CACHE_LOOKUPS, CASCADE_DECISIONS, JOB_STORE_KIND, PACKED_IMAGES, PARSE_FAILURES,
+    PRESCREEN_OUTCOMES, PRESCREEN_SAVED_CALLS, TILES, TOKENS, VISION_CONCURRENCY_LIMIT, VISION_ERRORS, render_latest
+)
+from uploads import UploadTooLarge, parse_upload_form
+from tracing import RequestIdFilter, SamplingProfiler, TracedRoute, TracingMiddleware, span, stage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_TIMEOUT_MS', '5000')),
+    tz_aware=True
+)
 db = client[os.environ.get('DB_NAME', 'safety_vision')]
 
+# Vision backend: openai, or stub for offline load tests
+VISION_BACKEND = os.environ.get('VISION_BACKEND', 'openai')
+if VISION_BACKEND not in ('openai', 'stub'):
+    raise RuntimeError(f"VISION_BACKEND must be openai or stub, got {VISION_BACKEND!r}")
+
+# Vision API connection pool (shared by all requests in this process)
+VISION_MODEL = os.environ.get('VISION_MODEL', 'gpt-4o')
+VISION_MAX_TOKENS = 1500
+VISION_TIMEOUT = float(os.environ.get('VISION_TIMEOUT', '60'))
+VISION_MAX_CONNECTIONS = int(os.environ.get('VISION_MAX_CONNECTIONS', '100'))
+VISION_MAX_KEEPALIVE = int(os.environ.get('VISION_MAX_KEEPALIVE', '20'))
+VISION_KEEPALIVE_EXPIRY = float(os.environ.get('VISION_KEEPALIVE_EXPIRY', '30'))
+VISION_HTTP2 = os.environ.get('VISION_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+VISION_DETAIL = os.environ.get('VISION_DETAIL', 'auto')  # auto, low or high
+if VISION_DETAIL not in ('auto', 'low', 'high'):
+    raise RuntimeError(f"VISION_DETAIL must be auto, low or high, got {VISION_DETAIL!r}")
+
+# Violation taxonomy and deduction table; TAXONOMY_FILE overrides deductions
+# (see taxonomy.load_taxonomy). Cached analyses are re-scored on read, so a
+# changed deduction never needs new vision calls.
+taxonomy = load_taxonomy(os.environ.get('TAXONOMY_FILE'))
+
+# Model cascade: when VISION_SCREEN_MODEL is set, a cheap model screens each image
+# first and only escalates to VISION_MODEL when it finds more than
+# VISION_SCREEN_MAX_VIOLATIONS violations, any critical violation, or is less than
+# VISION_SCREEN_MIN_CONFIDENCE sure of its answer. Tiled analyses and packed batch
+# calls always go to VISION_MODEL: tiles exist for detail a low-detail screen
+# would lose, and screening images one by one would undo the packing. Those calls
+# are counted as bypassed_tiled / bypassed_packed cascade decisions.
+VISION_SCREEN_MODEL = os.environ.get('VISION_SCREEN_MODEL', '')  # e.g. gpt-4o-mini
+VISION_SCREEN_MAX_TOKENS = int(os.environ.get('VISION_SCREEN_MAX_TOKENS', '600'))
+VISION_SCREEN_DETAIL = os.environ.get('VISION_SCREEN_DETAIL', 'low')
+if VISION_SCREEN_DETAIL not in ('auto', 'low', 'high'):
+    raise RuntimeError(f"VISION_SCREEN_DETAIL must be auto, low or high, got {VISION_SCREEN_DETAIL!r}")
+VISION_SCREEN_MAX_VIOLATIONS = int(os.environ.get('VISION_SCREEN_MAX_VIOLATIONS', '0'))
+VISION_SCREEN_MIN_CONFIDENCE = int(os.environ.get('VISION_SCREEN_MIN_CONFIDENCE', '85'))
+
+# Offline stub behaviour (VISION_BACKEND=stub)
+VISION_STUB_LATENCY = float(os.environ.get('VISION_STUB_LATENCY', '1.5'))
+VISION_STUB_JITTER = float(os.environ.get('VISION_STUB_JITTER', '0.5'))
+VISION_STUB_ERROR_RATE = float(os.environ.get('VISION_STUB_ERROR_RATE', '0'))
+VISION_STUB_THROTTLE_RATE = float(os.environ.get('VISION_STUB_THROTTLE_RATE', '0'))
+VISION_STUB_SEED = os.environ.get('VISION_STUB_SEED')
+
+vision_backend: Optional[VisionBackend] = None
+
+# Vision rate limiting: 0 disables a bucket; concurrency adapts between 1 and the max
+VISION_RPM_LIMIT = float(os.environ.get('VISION_RPM_LIMIT', '0'))
+VISION_TPM_LIMIT = float(os.environ.get('VISION_TPM_LIMIT', '0'))
+VISION_INITIAL_CONCURRENCY = int(os.environ.get('VISION_INITIAL_CONCURRENCY', '8'))
+VISION_MAX_CONCURRENCY = int(os.environ.get('VISION_MAX_CONCURRENCY', '64'))
+VISION_MAX_RETRIES = int(os.environ.get('VISION_MAX_RETRIES', '4'))
+
+vision_governor = VisionGovernor(
+    requests_per_minute=VISION_RPM_LIMIT,
+    tokens_per_minute=VISION_TPM_LIMIT,
+    initial_concurrency=VISION_INITIAL_CONCURRENCY,
+    max_concurrency=VISION_MAX_CONCURRENCY,
+    max_retries=VISION_MAX_RETRIES,
+)
+
+# Image preprocessing (decode, orient, downscale, re-encode) runs in a worker pool
+IMAGE_MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', '2048'))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '85'))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', str(os.cpu_count() or 4)))
+
+image_executor: Optional[ThreadPoolExecutor] = None
+
+# Local pre-screen of the decoded pixels (see prescreen.py): images darker than
+# PRESCREEN_MIN_BRIGHTNESS, brighter than PRESCREEN_MAX_BRIGHTNESS, with less
+# contrast than PRESCREEN_MIN_CONTRAST or sharpness (Laplacian variance at 512px)
+# below PRESCREEN_MIN_SHARPNESS get a retake result without a vision call. Usable
+# images darker than PRESCREEN_LOW_LIGHT_BRIGHTNESS, or with at least
+# PRESCREEN_LOW_LIGHT_DARK_FRACTION near-black pixels, get a measured Poor Lighting
+# violation if the model didn't report one.
+PRESCREEN_ENABLED = os.environ.get('PRESCREEN_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+prescreen_thresholds = PrescreenThresholds(
+    min_sharpness=float(os.environ.get('PRESCREEN_MIN_SHARPNESS', '20')),
+    min_brightness=float(os.environ.get('PRESCREEN_MIN_BRIGHTNESS', '15')),
+    max_brightness=float(os.environ.get('PRESCREEN_MAX_BRIGHTNESS', '245')),
+    min_contrast=float(os.environ.get('PRESCREEN_MIN_CONTRAST', '5')),
+    low_light_brightness=float(os.environ.get('PRESCREEN_LOW_LIGHT_BRIGHTNESS', '60')),
+    low_light_dark_fraction=float(os.environ.get('PRESCREEN_LOW_LIGHT_DARK_FRACTION', '0.4')),
+)
+
+# Batch execution
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+BATCH_ITEM_TIMEOUT = float(os.environ.get('BATCH_ITEM_TIMEOUT', '90'))
+STREAM_HEARTBEAT_INTERVAL = float(os.environ.get('STREAM_HEARTBEAT_INTERVAL', '10'))
+
+# Multi-image packing for /api/analyze-batch: up to this many images share one
+# vision call (0 or 1 disables packing)
+BATCH_PACK_SIZE = int(os.environ.get('BATCH_PACK_SIZE', '0'))
+if not 0 <= BATCH_PACK_SIZE <= 8:
+    raise RuntimeError(f"BATCH_PACK_SIZE must be between 0 and 8, got {BATCH_PACK_SIZE}")
+
+# Tiled analysis, opt-in per request (tiled=true): images whose long edge is at
+# least TILE_MIN_EDGE, or panoramas at least TILE_MIN_ASPECT times wider than tall,
+# are cut into up to TILE_MAX_TILES tiles of TILE_EDGE overlapping by TILE_OVERLAP,
+# analyzed concurrently; violations found in several tiles are merged when their
+# boxes overlap by TILE_MERGE_OVERLAP. Other images get the regular single call.
+TILE_EDGE = int(os.environ.get('TILE_EDGE', '1024'))
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', '0.2'))
+TILE_MAX_TILES = int(os.environ.get('TILE_MAX_TILES', '8'))
+TILE_MIN_EDGE = int(os.environ.get('TILE_MIN_EDGE', '2500'))
+TILE_MIN_ASPECT = float(os.environ.get('TILE_MIN_ASPECT', '2.0'))
+TILE_MERGE_OVERLAP = float(os.environ.get('TILE_MERGE_OVERLAP', '0.5'))
+TILE_DETAIL = os.environ.get('TILE_DETAIL', 'high')
+if TILE_DETAIL not in ('auto', 'low', 'high'):
+    raise RuntimeError(f"TILE_DETAIL must be auto, low or high, got {TILE_DETAIL!r}")
+if not 0 <= TILE_OVERLAP < 0.5:
+    raise RuntimeError(f"TILE_OVERLAP must be at least 0 and below 0.5, got {TILE_OVERLAP}")
+
+# Multipart upload limits (files are spooled to temporary storage while parsing)
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get('UPLOAD_MAX_FILE_BYTES', str(25 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.environ.get('UPLOAD_MAX_REQUEST_BYTES', str(500 * 1024 * 1024)))
+UPLOAD_MAX_FILES = int(os.environ.get('UPLOAD_MAX_FILES', '500'))
+
+# Background inspection jobs
+# JOB_STORE=memory keeps jobs in the process (lost on restart). With mongo, startup
+# retries an unreachable database JOB_STORE_CONNECT_ATTEMPTS times, doubling the
+# wait from one second, then refuses to start rather than silently losing jobs.
+JOB_STORE = os.environ.get('JOB_STORE', 'mongo')
+if JOB_STORE not in ('mongo', 'memory'):
+    raise RuntimeError(f"JOB_STORE must be mongo or memory, got {JOB_STORE!r}")
+JOB_STORE_CONNECT_ATTEMPTS = int(os.environ.get('JOB_STORE_CONNECT_ATTEMPTS', '5'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+JOB_RETRY_BACKOFF = float(os.environ.get('JOB_RETRY_BACKOFF', '5'))  # seconds, doubled per failed attempt
+JOB_RETRY_BACKOFF_MAX = float(os.environ.get('JOB_RETRY_BACKOFF_MAX', '300'))
+JOB_MAX_ITEM_BYTES = int(os.environ.get('JOB_MAX_ITEM_BYTES', str(15 * 1024 * 1024)))  # under Mongo's 16 MB
+
+job_runner: Optional[JobRunner] = None
+
+# Analysis result cache
+ANALYSIS_CACHE_ENABLED = os.environ.get('ANALYSIS_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', '1024'))
+ANALYSIS_CACHE_MEMORY_TTL = float(os.environ.get('ANALYSIS_CACHE_MEMORY_TTL', '3600'))
+ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', str(30 * 24 * 3600)))
+# A MongoDB lookup gives up after this long; after ANALYSIS_CACHE_FAILURES failures in a
+# row the MongoDB tier is skipped for ANALYSIS_CACHE_RETRY_AFTER seconds
+ANALYSIS_CACHE_READ_TIMEOUT = float(os.environ.get('ANALYSIS_CACHE_READ_TIMEOUT', '0.25'))
+ANALYSIS_CACHE_FAILURES = int(os.environ.get('ANALYSIS_CACHE_FAILURES', '3'))
+ANALYSIS_CACHE_RETRY_AFTER = float(os.environ.get('ANALYSIS_CACHE_RETRY_AFTER', '30'))
+
+analysis_cache = AnalysisCache(
+    db["analysis_cache"],
+    memory_size=ANALYSIS_CACHE_SIZE,
+    memory_ttl=ANALYSIS_CACHE_MEMORY_TTL,
+    persistent_ttl=ANALYSIS_CACHE_TTL,
+    on_lookup=lambda result: CACHE_LOOKUPS.labels(result).inc(),
+    read_timeout=ANALYSIS_CACHE_READ_TIMEOUT,
+    failure_threshold=ANALYSIS_CACHE_FAILURES,
+    retry_after=ANALYSIS_CACHE_RETRY_AFTER,
+)
+
+# Inspection history: every analysis (minus the image) is buffered in memory
+# and written with insert_many every HISTORY_FLUSH_SIZE records or
+# HISTORY_FLUSH_INTERVAL seconds, whichever comes first
+HISTORY_ENABLED = os.environ.get('HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+HISTORY_FLUSH_SIZE = int(os.environ.get('HISTORY_FLUSH_SIZE', '500'))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', '2'))
+HISTORY_MAX_PENDING = int(os.environ.get('HISTORY_MAX_PENDING', '10000'))
+
+# Dashboard statistics come from per-site, per-day rollups kept current as
+# history is written; queries may span at most ANALYTICS_MAX_DAYS days
+ANALYTICS_MAX_DAYS = int(os.environ.get('ANALYTICS_MAX_DAYS', '366'))
+
+inspection_history = InspectionHistory(
+    db["inspections"] if HISTORY_ENABLED else None,
+    max_batch=HISTORY_FLUSH_SIZE,
+    flush_interval=HISTORY_FLUSH_INTERVAL,
+    max_pending=HISTORY_MAX_PENDING,
+    rollups=InspectionRollups(db["inspection_rollups"]),
+)
+rollup_rebuild: Optional[asyncio.Task] = None
+
+# PDF reports are streamed page by page with photos downscaled on the fly
+REPORT_THUMBNAIL_EDGE = int(os.environ.get('REPORT_THUMBNAIL_EDGE', '800'))
+REPORT_THUMBNAIL_QUALITY = int(os.environ.get('REPORT_THUMBNAIL_QUALITY', '70'))
+REPORT_MAX_PHOTOS = int(os.environ.get('REPORT_MAX_PHOTOS', '2000'))
+
+# Photo previews, made once per image digest and served as immutable files
+PREVIEWS_ENABLED = os.environ.get('PREVIEWS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+PREVIEW_DIR = Path(os.environ.get('PREVIEW_DIR', ROOT_DIR / 'previews'))
+PREVIEW_THUMB_EDGE = int(os.environ.get('PREVIEW_THUMB_EDGE', '320'))
+PREVIEW_MEDIUM_EDGE = int(os.environ.get('PREVIEW_MEDIUM_EDGE', '1280'))
+PREVIEW_QUALITY = int(os.environ.get('PREVIEW_QUALITY', '80'))
+# The oldest previews are deleted once PREVIEW_DIR grows past PREVIEW_MAX_BYTES (0: no limit),
+# checked every PREVIEW_PRUNE_INTERVAL seconds
+PREVIEW_MAX_BYTES = int(os.environ.get('PREVIEW_MAX_BYTES', str(5 * 1024 ** 3)))
+PREVIEW_PRUNE_INTERVAL = float(os.environ.get('PREVIEW_PRUNE_INTERVAL', '3600'))
+
+preview_store = PreviewStore(
+    PREVIEW_DIR,
+    {"thumb": PREVIEW_THUMB_EDGE, "medium": PREVIEW_MEDIUM_EDGE},
+    PREVIEW_QUALITY,
+)
+inflight_previews = SingleFlight()
+preview_pruner: Optional[asyncio.Task] = None
+
+# Concurrent requests for the same image share one vision call
+inflight_analyses = SingleFlight()
+
+# JSON responses are written with orjson and compressed (br or gzip, as the
+# client accepts) once they reach RESPONSE_COMPRESSION_MIN_BYTES
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '6'))
+RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '4'))
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=TracedRoute)
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 )
+for handler in logging.getLogger().handlers:
+    handler.addFilter(RequestIdFilter())
 logger = logging.getLogger(__name__)
 
 # Models
@@ -41,15 +294,32 @@ class Violation(BaseModel):
     location: str
     confidence: int
     category: str  # PPE, Equipment, Environmental, Housekeeping
+    box: Optional[List[float]] = None  # left, top, right, bottom as fractions of the image (tiled analyses)
 
 class AnalysisResults(BaseModel):
     violations: List[Violation]
-    riskLevel: str  # High, Medium, Low
-    safetyScore: int  # 0-100
+    riskLevel: Optional[str]  # High, Medium, Low; None when the image was not inspected (retakes)
+    safetyScore: Optional[int]  # 0-100; None when the image was not inspected
 
 class PhotoAnalysisRequest(BaseModel):
     image_base64: str
     file_name: str
+    site: Optional[str] = None
+    tiled: Optional[bool] = None  # analyze large images tile by tile (see TILE_EDGE)
+
+class ImageStats(BaseModel):
+    bytesIn: int
+    bytesOut: int
+    width: int
+    height: int
+    mimeType: str
+
+class ImageQuality(BaseModel):
+    sharpness: float
+    brightness: float
+    contrast: float
+    darkFraction: float
+    brightFraction: float
 
 class PhotoAnalysisResponse(BaseModel):
     photoId: str
@@ -57,9 +327,74 @@ class PhotoAnalysisResponse(BaseModel):
     uploadTime: str
     analysisResults: AnalysisResults
     processingTime: float
+    imageStats: Optional[ImageStats] = None  # absent when answered from cache
+    analysisTier: Optional[str] = None  # screen or full: which model decided the result
+    analysisModel: Optional[str] = None
+    imageSha256: Optional[str] = None
+    thumbnailUrl: Optional[str] = None  # previews of the analyzed image (see previews.py)
+    previewUrl: Optional[str] = None
+    imageQuality: Optional[ImageQuality] = None  # pre-screen measures (absent when answered from cache)
+    retakeReason: Optional[str] = None  # set when the pre-screen rejected the image; no analysis was made
 
 class BatchAnalysisRequest(BaseModel):
     images: List[PhotoAnalysisRequest]
+    site: Optional[str] = None  # defaults for images that don't set their own
+    tiled: bool = False
+
+    def model_post_init(self, __context) -> None:
+        for image_req in self.images:
+            image_req.site = image_req.site or self.site
+            if image_req.tiled is None:
+                image_req.tiled = self.tiled
+
+class JobStatusResponse(BaseModel):
+    jobId: str
+    status: str  # queued, running, completed
+    total: int
+    completed: int
+    failed: int
+    createdAt: datetime
+    updatedAt: datetime
+    finishedAt: Optional[datetime] = None
+    site: Optional[str] = None
+
+class JobItemResult(BaseModel):
+    index: int
+    fileName: str
+    status: str  # pending, running, done, failed
+    attempts: int
+    result: Optional[PhotoAnalysisResponse] = None
+    error: Optional[str] = None
+
+class JobResultsPage(BaseModel):
+    jobId: str
+    items: List[JobItemResult]
+    nextCursor: Optional[str] = None
+
+class InspectionPage(BaseModel):
+    items: List[Dict[str, Any]]
+    nextCursor: Optional[str] = None
+
+class AnalyticsSummary(BaseModel):
+    inspections: int
+    averageSafetyScore: Optional[float] = None
+    violations: int
+    riskCounts: Dict[str, int]
+    categoryCounts: Dict[str, int]
+
+class DailyAnalytics(AnalyticsSummary):
+    day: str
+
+class SiteAnalytics(AnalyticsSummary):
+    site: Optional[str] = None
+
+class AnalyticsReport(BaseModel):
+    site: Optional[str] = None  # absent for all sites
+    since: date
+    until: date
+    summary: AnalyticsSummary
+    days: List[DailyAnalytics] = []
+    sites: List[SiteAnalytics] = []
 
 # Safety Analysis Prompt
 SAFETY_ANALYSIS_PROMPT = """You are an expert industrial safety inspector analyzing site photos. Be STRICT in your safety scoring.
@@ -141,121 +476,707 @@ If the image is not a worksite/industrial setting or has no violations, return:
 
 Analyze the image thoroughly and be STRICT with scoring."""
 
-async def analyze_image_with_vision(image_base64: str) -> dict:
-    """Analyze image using GPT-4o Vision"""
-    import time
-    import json
-    start_time = time.time()
-    
+VISION_SYSTEM_PROMPT = "You are an expert industrial safety inspector. Always respond with valid JSON."
+
+TILE_ANALYSIS_PROMPT = SAFETY_ANALYSIS_PROMPT + """
+
+This image is one tile cut at full resolution from a larger photo. Report only the
+violations visible in this tile, and give each violation a "box": [left, top, right, bottom]
+with its bounding box as fractions (0-1) of this tile's width and height."""
+
+SCREEN_ANALYSIS_PROMPT = SAFETY_ANALYSIS_PROMPT + """
+
+Also include a top-level "confidence" field (0-100): how sure you are that you found
+every violation in the image. Use a low value if the image is blurry, dark, cluttered,
+partially visible or hard to judge."""
+
+# Changes whenever the prompt or model changes, so cached results are never stale
+ANALYSIS_VERSION = hashlib.sha256(
+    f"{VISION_BACKEND}|{VISION_MODEL}|{VISION_MAX_TOKENS}|{VISION_DETAIL}|{IMAGE_MAX_EDGE}|{IMAGE_JPEG_QUALITY}|"
+    f"{VISION_SYSTEM_PROMPT}|{SAFETY_ANALYSIS_PROMPT}|{packed_prompt(SAFETY_ANALYSIS_PROMPT, 2)}|"
+    f"{VISION_SCREEN_MODEL}|{VISION_SCREEN_MAX_TOKENS}|{VISION_SCREEN_DETAIL}|{VISION_SCREEN_MAX_VIOLATIONS}|"
+    f"{VISION_SCREEN_MIN_CONFIDENCE}|{SCREEN_ANALYSIS_PROMPT}|"
+    f"{PRESCREEN_ENABLED and prescreen_thresholds}".encode()
+).hexdigest()[:16]
+TILED_ANALYSIS_VERSION = hashlib.sha256(
+    f"{ANALYSIS_VERSION}|{TILE_ANALYSIS_PROMPT}|{TILE_EDGE}|{TILE_OVERLAP}|{TILE_MAX_TILES}|"
+    f"{TILE_MERGE_OVERLAP}|{TILE_DETAIL}".encode()
+).hexdigest()[:16]
+
+def create_vision_backend() -> VisionBackend:
+    if VISION_BACKEND == 'stub':
+        return StubVisionBackend(
+            latency=VISION_STUB_LATENCY,
+            jitter=VISION_STUB_JITTER,
+            error_rate=VISION_STUB_ERROR_RATE,
+            throttle_rate=VISION_STUB_THROTTLE_RATE,
+            seed=int(VISION_STUB_SEED) if VISION_STUB_SEED else None,
+        )
     api_key = os.environ.get('OPENAI_API_KEY')
     if not api_key:
         raise HTTPException(status_code=500, detail="OPENAI_API_KEY not configured")
+    return OpenAIVisionBackend(
+        api_key,
+        timeout=VISION_TIMEOUT,
+        max_connections=VISION_MAX_CONNECTIONS,
+        max_keepalive=VISION_MAX_KEEPALIVE,
+        keepalive_expiry=VISION_KEEPALIVE_EXPIRY,
+        http2=VISION_HTTP2,
+    )
+
+def get_vision_backend() -> VisionBackend:
+    """Return the process-wide vision backend, creating it on first use"""
+    global vision_backend
+    if vision_backend is None:
+        vision_backend = create_vision_backend()
+    return vision_backend
+
+def get_image_executor() -> ThreadPoolExecutor:
+    """Return the image preprocessing pool, creating it on first use"""
+    global image_executor
+    if image_executor is None:
+        image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+    return image_executor
+
+async def prepare_image(image_bytes: bytes) -> PreparedImage:
+    """Normalize an uploaded image off the event loop"""
+    loop = asyncio.get_running_loop()
+    try:
+        with stage("preprocess"):
+            return await loop.run_in_executor(
+                get_image_executor(), normalize_image, image_bytes, IMAGE_MAX_EDGE, IMAGE_JPEG_QUALITY,
+                PRESCREEN_ENABLED
+            )
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def estimate_vision_tokens(
+    image_size: Optional[Tuple[int, int]],
+    detail: str = VISION_DETAIL,
+    max_tokens: int = VISION_MAX_TOKENS
+) -> int:
+    """Upper-bound token cost of one analysis call, for the TPM bucket"""
+    width, height = image_size or (IMAGE_MAX_EDGE, IMAGE_MAX_EDGE)
+    prompt_tokens = (len(SAFETY_ANALYSIS_PROMPT) + len(VISION_SYSTEM_PROMPT)) // 4
+    return prompt_tokens + estimate_image_tokens(width, height, detail) + max_tokens
+
+def image_stats(prepared: PreparedImage) -> dict:
+    return {
+        "bytesIn": prepared.bytes_in,
+        "bytesOut": prepared.bytes_out,
+        "width": prepared.width,
+        "height": prepared.height,
+        "mimeType": prepared.mime_type,
+    }
+
+async def call_vision(
+    prompt: str,
+    images: List[Tuple[str, str]],
+    max_tokens: int,
+    estimated_tokens: int,
+    model: str = VISION_MODEL,
+    detail: str = VISION_DETAIL,
+    on_text: Optional[Callable[[str], None]] = None
+) -> VisionCompletion:
+    """Send the prompt and (base64, mime type) images to the vision backend through the governor.
+    
+    With on_text, the completion is streamed and on_text receives each piece
+    of text as it arrives. Only a stream that failed before its first piece
+    is retried, so on_text never sees text twice.
+    """
+    backend = get_vision_backend()
+    request = dict(
+        model=model,
+        system_prompt=VISION_SYSTEM_PROMPT,
+        prompt=prompt,
+        images=images,
+        detail=detail,
+        max_tokens=max_tokens
+    )
+    
+    async def stream_backend() -> VisionCompletion:
+        pieces = []
+        response_model, usage = model, None
+        try:
+            async for chunk in backend.stream_many(**request):
+                response_model = chunk.model or response_model
+                usage = chunk.usage or usage
+                if chunk.text:
+                    pieces.append(chunk.text)
+                    on_text(chunk.text)
+        except Exception as e:
+            if pieces:
+                raise VisionStreamInterrupted(f"Stream failed after {len(pieces)} chunks: {e!r}") from e
+            raise
+        return VisionCompletion(text="".join(pieces), model=response_model, usage=usage)
+    
+    async def call_backend():
+        try:
+            if on_text is not None:
+                return await stream_backend()
+            return await backend.complete_many(**request)
+        except Exception as e:
+            VISION_ERRORS.labels(type(e).__name__).inc()
+            raise
     
     try:
-        client = OpenAI(api_key=api_key)
-        
-        # Call GPT-4o Vision API
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert industrial safety inspector. Always respond with valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": SAFETY_ANALYSIS_PROMPT
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1500
+        with stage("vision"), ANALYSES_IN_FLIGHT.track_inprogress():
+            response = await vision_governor.call(call_backend, estimated_tokens=estimated_tokens)
+    finally:
+        VISION_CONCURRENCY_LIMIT.set(vision_governor.concurrency.limit)
+    
+    if response.usage is not None:
+        TOKENS.labels("prompt").inc(response.usage.prompt_tokens)
+        TOKENS.labels("completion").inc(response.usage.completion_tokens)
+    return response
+
+def analysis_object(data) -> dict:
+    """The decoded answer if it is a JSON object; anything else counts as a parse failure"""
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError(f"Expected a JSON object, got {type(data).__name__}", str(data)[:200], 0)
+    return data
+
+def parse_analysis_json(response_text: str) -> dict:
+    """Parse the JSON object in the model's answer, ignoring code fences or prose around it"""
+    with stage("parse"):
+        return analysis_object(extract_json_object(response_text))
+
+def is_critical_violation(violation: dict) -> bool:
+    return bool(taxonomy.critical[taxonomy.type_id(violation)])
+
+def screen_escalation_reason(analysis_data: dict) -> Optional[str]:
+    """Why a screening result needs the full model, or None if it can stand"""
+    violations = analysis_data.get("violations", [])
+    if not isinstance(violations, list) or not all(isinstance(v, dict) for v in violations):
+        return "malformed"
+    if any(is_critical_violation(v) for v in violations):
+        return "critical"
+    if len(violations) > VISION_SCREEN_MAX_VIOLATIONS:
+        return "violations"
+    confidences = [confidence_value(analysis_data.get("confidence"))] + [
+        confidence_value(v.get("confidence")) for v in violations
+    ]
+    if min(confidences) < VISION_SCREEN_MIN_CONFIDENCE:
+        return "low_confidence"
+    return None
+
+async def screen_image(
+    image_base64: str,
+    mime_type: str,
+    image_size: Optional[Tuple[int, int]]
+) -> Optional[dict]:
+    """Ask the screening model; returns its analysis if it can stand, None to escalate"""
+    try:
+        response = await call_vision(
+            SCREEN_ANALYSIS_PROMPT,
+            [(image_base64, mime_type)],
+            VISION_SCREEN_MAX_TOKENS,
+            estimate_vision_tokens(image_size, VISION_SCREEN_DETAIL, VISION_SCREEN_MAX_TOKENS),
+            model=VISION_SCREEN_MODEL,
+            detail=VISION_SCREEN_DETAIL
         )
-        
-        processing_time = time.time() - start_time
-        
-        # Get response text
-        response_text = response.choices[0].message.content.strip()
-        
-        # Clean response - remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        analysis_data = json.loads(response_text)
-        
-        # Extract data
-        violations = analysis_data.get("violations", [])
-        risk_level = analysis_data.get("riskLevel", "Low")
-        safety_score = analysis_data.get("safetyScore", 100)
-        
-        # Validate and adjust safety score based on violations
-        num_violations = len(violations)
-        
-        # Count critical violations
-        critical_violations = sum(1 for v in violations if v.get("type", "").lower() in [
-            "missing hard hat", "exposed wiring", "fire hazard", "uncovered pit",
-            "blocked exit", "missing safety glasses", "exposed machinery"
-        ] or v.get("category", "") in ["PPE", "Environmental"])
-        
-        # Calculate expected max score based on violations
-        if num_violations >= 5 or critical_violations >= 2:
-            max_expected_score = 35
-        elif num_violations >= 3 or critical_violations >= 1:
-            max_expected_score = 55
-        elif num_violations >= 2:
-            max_expected_score = 70
-        elif num_violations >= 1:
-            max_expected_score = 85
-        else:
-            max_expected_score = 100
-        
-        # Adjust score if AI returned too high
-        if safety_score > max_expected_score:
-            safety_score = max_expected_score
-        
-        # Validate risk level matches score
-        if safety_score <= 49 or critical_violations >= 1:
-            risk_level = "High"
-        elif safety_score <= 74:
-            risk_level = "Medium"
-        else:
-            risk_level = "Low"
-        
+        analysis_data = parse_analysis_json(response.text)
+        reason = screen_escalation_reason(analysis_data)
+    except json.JSONDecodeError:
+        reason = "malformed"
+    except Exception as e:
+        logger.warning(f"Screening call failed, escalating: {e!r}")
+        reason = "error"
+    
+    if reason is not None:
+        CASCADE_DECISIONS.labels(f"escalated_{reason}").inc()
+        return None
+    CASCADE_DECISIONS.labels("screened").inc()
+    analysis = score_analysis(analysis_data)
+    analysis["analysisTier"] = "screen"
+    analysis["analysisModel"] = response.model
+    return analysis
+
+def score_analysis(analysis_data: dict) -> dict:
+    """Canonicalize the model's violations and score them from the deduction table.
+    
+    The model's own safetyScore and riskLevel are ignored, so a result
+    always matches the current taxonomy (see taxonomy.py).
+    """
+    with stage("score"):
+        violations = analysis_data.get("violations")
+        if not isinstance(violations, list):
+            violations = []
+        violations = [taxonomy.canonicalize(v) for v in violations if isinstance(v, dict)]
+        safety_score, risk_level = taxonomy.score(violations)
         return {
             "violations": violations,
             "riskLevel": risk_level,
             "safetyScore": safety_score,
-            "summary": analysis_data.get("summary", ""),
-            "processingTime": processing_time
+            "summary": analysis_data.get("summary", "")
         }
+
+async def analyze_image_with_vision(
+    image_base64: str,
+    mime_type: str = "image/jpeg",
+    image_size: Optional[Tuple[int, int]] = None,
+    on_violation: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """Analyze image using GPT-4o Vision, screening with the cheap model first if configured.
+    
+    With on_violation, the completion is streamed and each violation is
+    passed to it as soon as the model has written it out (before the
+    final scoring rules run).
+    """
+    start_time = time.time()
+    response = None
+    
+    if VISION_SCREEN_MODEL:
+        analysis = await screen_image(image_base64, mime_type, image_size)
+        if analysis is not None:
+            if on_violation is not None:
+                for violation in analysis["violations"]:
+                    on_violation(violation)
+            analysis["processingTime"] = time.time() - start_time
+            return analysis
+    
+    parser = on_text = None
+    if on_violation is not None:
+        parser = AnalysisStreamParser()
+        
+        def on_text(text: str) -> None:
+            for violation in parser.feed(text):
+                on_violation(violation)
+    
+    try:
+        # Call the vision model
+        response = await call_vision(
+            SAFETY_ANALYSIS_PROMPT,
+            [(image_base64, mime_type)],
+            VISION_MAX_TOKENS,
+            estimate_vision_tokens(image_size),
+            on_text=on_text
+        )
+        
+        processing_time = time.time() - start_time
+        
+        if parser is not None:
+            with stage("parse"):
+                analysis_data = analysis_object(parser.finish())
+        else:
+            analysis_data = parse_analysis_json(response.text)
+        analysis = score_analysis(analysis_data)
+        analysis["processingTime"] = processing_time
+        analysis["analysisTier"] = "full"
+        analysis["analysisModel"] = response.model
+        return analysis
         
     except json.JSONDecodeError as e:
-        logger.error(f"JSON parse error: {e}, response: {response[:500] if response else 'None'}")
+        PARSE_FAILURES.inc()
+        logger.error(f"JSON parse error: {e}, response: {response.text[:500] if response else 'None'}")
         # Return default response on parse error
         return {
             "violations": [],
             "riskLevel": "Low",
             "safetyScore": 100,
             "summary": "Unable to parse analysis results",
-            "processingTime": time.time() - start_time
+            "processingTime": time.time() - start_time,
+            "parseFailed": True
         }
     except Exception as e:
-        logger.error(f"Vision API error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Vision analysis failed: {str(e)}")
+        raise vision_failure(e)
+
+def vision_failure(e: Exception) -> HTTPException:
+    """HTTP error to answer with when a vision call failed after its retries"""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, openai.RateLimitError):
+        logger.error(f"Vision API rate limited after retries: {str(e)}")
+        retry_after = retry_after_seconds(e)
+        return HTTPException(
+            status_code=503,
+            detail="Vision provider rate limit exceeded, retry later",
+            headers={"Retry-After": str(int(retry_after or 30))}
+        )
+    if isinstance(e, openai.APITimeoutError):
+        logger.error(f"Vision API timeout after retries: {str(e)}")
+        return HTTPException(status_code=504, detail="Vision analysis timed out")
+    logger.error(f"Vision API error: {str(e)}")
+    return HTTPException(status_code=500, detail=f"Vision analysis failed: {str(e)}")
+
+async def analyze_tile(prepared: PreparedImage) -> Tuple[dict, str]:
+    """Model output (unscored) and model name for one tile of a tiled analysis (never screened)"""
+    if VISION_SCREEN_MODEL:
+        CASCADE_DECISIONS.labels("bypassed_tiled").inc()
+    response = await call_vision(
+        TILE_ANALYSIS_PROMPT,
+        [(base64.b64encode(prepared.data).decode('ascii'), prepared.mime_type)],
+        VISION_MAX_TOKENS,
+        estimate_vision_tokens((prepared.width, prepared.height), TILE_DETAIL),
+        detail=TILE_DETAIL
+    )
+    try:
+        analysis_data = parse_analysis_json(response.text)
+    except json.JSONDecodeError:
+        PARSE_FAILURES.inc()
+        raise
+    return analysis_data, response.model
+
+async def analyze_tiled(cache_key: str, image_bytes: bytes) -> dict:
+    """Analyze overlapping full-resolution tiles concurrently and merge them into one result.
+    
+    Tiles that fail are left out (and the result isn't cached); the
+    analysis fails only when every tile does.
+    """
+    start_time = time.time()
+    loop = asyncio.get_running_loop()
+    try:
+        with stage("preprocess"):
+            tiled = await loop.run_in_executor(
+                get_image_executor(), make_tiles, image_bytes, TILE_EDGE, TILE_OVERLAP, TILE_MAX_TILES,
+                IMAGE_JPEG_QUALITY, PRESCREEN_ENABLED
+            )
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Image tiled: {tiled.width}x{tiled.height} into {len(tiled.tiles)} tiles")
+    image_stats_tiled = {
+        "bytesIn": tiled.bytes_in,
+        "bytesOut": sum(prepared.bytes_out for _, prepared in tiled.tiles),
+        "width": tiled.width,
+        "height": tiled.height,
+        "mimeType": "image/jpeg",
+    }
+    retake = prescreen_retake(tiled.quality, calls=len(tiled.tiles))
+    if retake is not None:
+        retake["imageStats"] = image_stats_tiled
+        return retake
+    
+    outcomes = await asyncio.gather(
+        *(analyze_tile(prepared) for _, prepared in tiled.tiles), return_exceptions=True
+    )
+    violations, summaries, models, failures = [], [], [], []
+    for (tile, _), outcome in zip(tiled.tiles, outcomes):
+        if isinstance(outcome, Exception):
+            failures.append(outcome)
+            continue
+        analysis_data, model = outcome
+        models.append(model)
+        tile_violations = [
+            to_image(taxonomy.canonicalize(v), tile, tiled.width, tiled.height)
+            for v in analysis_data.get("violations", []) if isinstance(v, dict)
+        ]
+        violations.extend(tile_violations)
+        if tile_violations and analysis_data.get("summary"):
+            summaries.append(analysis_data["summary"])
+    TILES.labels("analyzed").inc(len(models))
+    TILES.labels("failed").inc(len(failures))
+    if not models:
+        raise vision_failure(failures[0])
+    if failures:
+        logger.warning(f"{len(failures)} of {len(tiled.tiles)} tiles failed ({failures[0]!r})")
+    
+    with stage("merge"):
+        violations = merge_violations(violations, lambda v: v["type"], TILE_MERGE_OVERLAP)
+    analysis = score_analysis({
+        "violations": violations,
+        "summary": " ".join(dict.fromkeys(summaries)) or "No safety violations detected"
+    })
+    analysis["processingTime"] = time.time() - start_time
+    analysis["analysisTier"] = "tiled"
+    analysis["analysisModel"] = models[0]
+    add_lighting_finding(analysis, tiled.quality)
+    if ANALYSIS_CACHE_ENABLED and not failures:
+        await analysis_cache.set(cache_key, analysis)
+    analysis["imageStats"] = image_stats_tiled
+    return with_image_quality(analysis, tiled.quality)
+
+def decode_image_base64(image_base64: str) -> bytes:
+    """Decode client-supplied base64 image data"""
+    try:
+        with stage("decode"):
+            return base64.b64decode(image_base64, validate=False)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid base64 image data")
+
+async def read_upload(upload: UploadFile) -> bytes:
+    """Read a spooled multipart file into memory"""
+    with stage("decode"):
+        return await upload.read()
+
+def analysis_cache_key(image_bytes: bytes) -> str:
+    return f"{hashlib.sha256(image_bytes).hexdigest()}:{ANALYSIS_VERSION}"
+
+def with_image_digest(cache_key: str, analysis: dict, previews: Optional[dict] = None) -> dict:
+    """Tag a result with the SHA-256 of its image (the cache key's first part) and its preview URLs"""
+    analysis["imageSha256"] = cache_key.split(":", 1)[0]
+    analysis.update(previews or {})
+    return analysis
+
+async def store_previews(cache_key: str, image_bytes: bytes) -> dict:
+    """Make the image's previews unless they exist; returns their URLs, or {} if they can't be made"""
+    if not PREVIEWS_ENABLED:
+        return {}
+    digest = cache_key.split(":", 1)[0]
+    if not preview_store.has_all(digest):
+        loop = asyncio.get_running_loop()
+        try:
+            with stage("preview"):
+                await inflight_previews.do(
+                    digest,
+                    lambda: loop.run_in_executor(get_image_executor(), preview_store.generate, image_bytes, digest)
+                )
+        except (ImageDecodeError, OSError) as e:
+            logger.warning(f"Previews for {digest[:12]} not stored: {e}")
+            return {}
+    urls = preview_store.urls(digest)
+    return {"thumbnailUrl": urls["thumb"], "previewUrl": urls["medium"]}
+
+def wants_tiles(image_bytes: bytes) -> bool:
+    try:
+        return should_tile(*image_size(image_bytes), TILE_EDGE, TILE_MIN_EDGE, TILE_MIN_ASPECT)
+    except ImageDecodeError:
+        return False  # left to the regular path to reject
+
+async def analyze_image_bytes(
+    image_bytes: bytes,
+    on_violation: Optional[Callable[[dict], None]] = None,
+    tiled: bool = False
+) -> dict:
+    """Analyze decoded image bytes and store the image's previews alongside.
+    
+    on_violation streams the analysis (see analyze_image_with_vision). With tiled,
+    images large or wide enough are analyzed tile by tile (see analyze_tiled).
+    """
+    cache_key = analysis_cache_key(image_bytes)
+    previews = asyncio.ensure_future(store_previews(cache_key, image_bytes))
+    try:
+        if tiled and wants_tiles(image_bytes):
+            analysis = await analyze_or_cached(
+                f"{cache_key}:tiled-{TILED_ANALYSIS_VERSION}", image_bytes, on_violation, tiled=True
+            )
+        else:
+            analysis = await analyze_or_cached(cache_key, image_bytes, on_violation)
+    except BaseException:
+        previews.cancel()
+        raise
+    return with_image_digest(cache_key, analysis, await previews)
+
+async def analyze_or_cached(
+    cache_key: str,
+    image_bytes: bytes,
+    on_violation: Optional[Callable[[dict], None]] = None,
+    tiled: bool = False
+) -> dict:
+    """Analysis of the image, answering repeats from the analysis cache"""
+    start_time = time.time()
+    
+    if ANALYSIS_CACHE_ENABLED:
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            cached.update(score_analysis(cached))
+            cached["processingTime"] = time.time() - start_time
+            if on_violation is not None:
+                for violation in cached["violations"]:
+                    on_violation(violation)
+            return cached
+    
+    async def run_analysis() -> dict:
+        if tiled:
+            return await analyze_tiled(cache_key, image_bytes)
+        return await analyze_prepared(cache_key, await prepare_image(image_bytes), on_violation)
+    
+    # A streaming caller that starts the analysis streams it; one that joins an analysis
+    # already in flight (and tiled analyses, merged before anything is known) gets its
+    # violations passed on at the end
+    streamed = on_violation is not None and not tiled and cache_key not in inflight_analyses
+    # Each caller gets its own copy of the shared result
+    analysis = dict(await inflight_analyses.do(cache_key, run_analysis))
+    if on_violation is not None and not streamed:
+        for violation in analysis["violations"]:
+            on_violation(violation)
+    return analysis
+
+async def analyze_prepared(
+    cache_key: str,
+    prepared: PreparedImage,
+    on_violation: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """Run a single-image vision analysis on a normalized image and cache the result"""
+    logger.info(
+        f"Image prepared: {prepared.bytes_in} -> {prepared.bytes_out} bytes "
+        f"({prepared.width}x{prepared.height})"
+    )
+    retake = prescreen_retake(prepared.quality)
+    if retake is not None:
+        retake["imageStats"] = image_stats(prepared)
+        return retake
+    analysis = await analyze_image_with_vision(
+        base64.b64encode(prepared.data).decode('ascii'),
+        prepared.mime_type,
+        (prepared.width, prepared.height),
+        on_violation
+    )
+    if not analysis.get("parseFailed"):
+        add_lighting_finding(analysis, prepared.quality)
+        if ANALYSIS_CACHE_ENABLED:
+            await analysis_cache.set(cache_key, analysis)
+    analysis["imageStats"] = image_stats(prepared)
+    return with_image_quality(analysis, prepared.quality)
+
+def prescreen_retake(quality: Optional[QualityMeasures], calls: int = 1) -> Optional[dict]:
+    """Retake result for an image the pre-screen finds unusable, or None to analyze it.
+    
+    Retakes are neither cached nor kept in the inspection history; calls
+    is the number of vision calls the image would have taken.
+    """
+    if quality is None:
+        return None
+    reason = retake_reason(quality, prescreen_thresholds)
+    if reason is None:
+        PRESCREEN_OUTCOMES.labels("passed").inc()
+        return None
+    PRESCREEN_OUTCOMES.labels(f"retake_{reason}").inc()
+    PRESCREEN_SAVED_CALLS.inc(calls)
+    logger.info(f"Pre-screen asked for a retake ({reason}): {quality.as_dict()}")
+    return {
+        "violations": [],
+        "riskLevel": None,
+        "safetyScore": None,
+        "summary": RETAKE_SUMMARIES[reason],
+        "processingTime": 0,
+        "analysisTier": "prescreen",
+        "retakeReason": reason,
+        "imageQuality": quality.as_dict(),
+    }
+
+def add_lighting_finding(analysis: dict, quality: Optional[QualityMeasures]) -> None:
+    """Add a measured Poor Lighting violation to a poorly lit image's result and re-score it"""
+    if quality is None or not is_poorly_lit(quality, prescreen_thresholds):
+        return
+    lighting = taxonomy.canonicalize({
+        "type": "Poor lighting conditions",
+        "location": "entire image",
+        "confidence": lighting_confidence(quality, prescreen_thresholds),
+        "category": "Environmental",
+    })
+    if any(v.get("type") == lighting["type"] for v in analysis["violations"]):
+        return
+    PRESCREEN_OUTCOMES.labels("poor_lighting").inc()
+    analysis["violations"] = analysis["violations"] + [lighting]
+    analysis.update(score_analysis(analysis))
+
+def with_image_quality(analysis: dict, quality: Optional[QualityMeasures]) -> dict:
+    if quality is not None:
+        analysis["imageQuality"] = quality.as_dict()
+    return analysis
+
+async def analyze_packed_group(group: List[Tuple[str, PreparedImage]]) -> Dict[str, dict]:
+    """Analyze several prepared images in one vision call.
+    
+    Returns analyses keyed by cache key; images whose result is missing or
+    malformed are left out so the caller can retry them one at a time.
+    Packed calls skip the screening model.
+    """
+    start_time = time.time()
+    if VISION_SCREEN_MODEL:
+        CASCADE_DECISIONS.labels("bypassed_packed").inc(len(group))
+    try:
+        response = await call_vision(
+            packed_prompt(SAFETY_ANALYSIS_PROMPT, len(group)),
+            [(base64.b64encode(prepared.data).decode('ascii'), prepared.mime_type) for _, prepared in group],
+            VISION_MAX_TOKENS * len(group),
+            sum(estimate_vision_tokens((prepared.width, prepared.height)) for _, prepared in group)
+        )
+        entries = split_packed_results(parse_analysis_json(response.text), len(group))
+    except (json.JSONDecodeError, PackedResponseMismatch) as e:
+        PARSE_FAILURES.inc()
+        logger.warning(f"Packed analysis of {len(group)} images unusable ({e}), falling back to single calls")
+        return {}
+    except Exception as e:
+        logger.warning(f"Packed analysis of {len(group)} images failed ({e!r}), falling back to single calls")
+        return {}
+    
+    processing_time = time.time() - start_time
+    analyses = {}
+    for (cache_key, prepared), entry in zip(group, entries):
+        if entry is None:
+            continue
+        analysis = score_analysis(entry)
+        analysis["processingTime"] = processing_time
+        analysis["analysisTier"] = "full"
+        analysis["analysisModel"] = response.model
+        add_lighting_finding(analysis, prepared.quality)
+        if ANALYSIS_CACHE_ENABLED:
+            await analysis_cache.set(cache_key, analysis)
+        analysis["imageStats"] = image_stats(prepared)
+        analyses[cache_key] = with_image_quality(analysis, prepared.quality)
+    return analyses
+
+async def analyze_images_packed(images: List[bytes]) -> List[Any]:
+    """Analyze decoded images, packing cache misses BATCH_PACK_SIZE to a vision call.
+    
+    Returns an analysis dict or an exception per image, in input order.
+    Duplicates within the batch are analyzed once; images that can't be
+    packed, or whose packed result doesn't line up, go through the
+    single-image path.
+    """
+    start_time = time.time()
+    keys = [analysis_cache_key(image_bytes) for image_bytes in images]
+    pending = dict(zip(keys, images))
+    pending_keys = list(pending)
+    previews = asyncio.ensure_future(asyncio.gather(
+        *(store_previews(cache_key, image_bytes) for cache_key, image_bytes in pending.items())
+    ))
+    analyses: Dict[str, Any] = {}
+    
+    if ANALYSIS_CACHE_ENABLED:
+        for cache_key in list(pending):
+            cached = await analysis_cache.get(cache_key)
+            if cached is not None:
+                cached.update(score_analysis(cached))
+                cached["processingTime"] = time.time() - start_time
+                analyses[cache_key] = cached
+                del pending[cache_key]
+    
+    prepared_outcomes = await run_bounded(
+        list(pending.values()), prepare_image, concurrency=BATCH_CONCURRENCY, item_timeout=BATCH_ITEM_TIMEOUT
+    )
+    prepared = {}
+    for cache_key, outcome in zip(list(pending), prepared_outcomes):
+        if isinstance(outcome, Exception):
+            analyses[cache_key] = outcome
+            del pending[cache_key]
+            continue
+        retake = prescreen_retake(outcome.quality)
+        if retake is not None:
+            retake["imageStats"] = image_stats(outcome)
+            analyses[cache_key] = retake
+            del pending[cache_key]
+        else:
+            prepared[cache_key] = outcome
+    
+    groups = [group for group in chunked(list(prepared.items()), BATCH_PACK_SIZE) if len(group) > 1]
+    group_outcomes = await run_bounded(
+        groups, analyze_packed_group, concurrency=BATCH_CONCURRENCY, item_timeout=BATCH_ITEM_TIMEOUT
+    )
+    for group, outcome in zip(groups, group_outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Packed analysis of {len(group)} images failed ({outcome!r})")
+            continue
+        analyses.update(outcome)
+        PACKED_IMAGES.labels("packed").inc(len(outcome))
+        PACKED_IMAGES.labels("fallback").inc(len(group) - len(outcome))
+    
+    async def analyze_single(cache_key: str) -> dict:
+        return dict(await inflight_analyses.do(cache_key, lambda: analyze_prepared(cache_key, prepared[cache_key])))
+    
+    remaining = [cache_key for cache_key in prepared if cache_key not in analyses]
+    single_outcomes = await run_bounded(
+        remaining, analyze_single, concurrency=BATCH_CONCURRENCY, item_timeout=BATCH_ITEM_TIMEOUT
+    )
+    analyses.update(zip(remaining, single_outcomes))
+    preview_urls = dict(zip(pending_keys, await previews))
+    
+    return [
+        analyses[cache_key] if isinstance(analyses[cache_key], Exception)
+        else with_image_digest(cache_key, dict(analyses[cache_key]), preview_urls[cache_key])
+        for cache_key in keys
+    ]
 
 # Routes
 @api_router.get("/")
@@ -266,66 +1187,711 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "NESR Safety Vision"}
 
+@api_router.get("/metrics")
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
+
+def build_photo_response(
+    file_name: str,
+    upload_time: str,
+    analysis: dict,
+    *,
+    source: str,
+    site: Optional[str] = None,
+    job_id: Optional[str] = None
+) -> PhotoAnalysisResponse:
+    """Wrap a vision analysis result in the API response model and record it in the history"""
+    # One validation pass over the whole result, violations included
+    response = PhotoAnalysisResponse.model_validate({
+        "photoId": str(uuid.uuid4()),
+        "fileName": file_name,
+        "uploadTime": upload_time,
+        "analysisResults": {
+            "violations": analysis["violations"],
+            "riskLevel": analysis["riskLevel"],
+            "safetyScore": analysis["safetyScore"]
+        },
+        "processingTime": analysis["processingTime"],
+        "imageStats": analysis.get("imageStats"),
+        "analysisTier": analysis.get("analysisTier"),
+        "analysisModel": analysis.get("analysisModel"),
+        "imageSha256": analysis.get("imageSha256"),
+        "thumbnailUrl": analysis.get("thumbnailUrl"),
+        "previewUrl": analysis.get("previewUrl"),
+        "imageQuality": analysis.get("imageQuality"),
+        "retakeReason": analysis.get("retakeReason")
+    })
+    if response.retakeReason is None:
+        inspection_history.record(inspection_record(response, analysis, source, site, job_id))
+    return response
+
+def inspection_record(
+    response: PhotoAnalysisResponse,
+    analysis: dict,
+    source: str,
+    site: Optional[str],
+    job_id: Optional[str]
+) -> dict:
+    """History document for one analysis; never includes the image itself"""
+    results = response.analysisResults
+    return {
+        "photoId": response.photoId,
+        "fileName": response.fileName,
+        "site": site,
+        "source": source,
+        "jobId": job_id,
+        "inspectedAt": datetime.fromisoformat(response.uploadTime),
+        "riskLevel": results.riskLevel,
+        "safetyScore": results.safetyScore,
+        "violationCount": len(results.violations),
+        "violationTypes": sorted({v.type for v in results.violations}),
+        "violations": [v.model_dump() for v in results.violations],
+        "summary": analysis.get("summary", ""),
+        "processingTime": response.processingTime,
+        "analysisTier": response.analysisTier,
+        "analysisModel": response.analysisModel,
+        "imageSha256": analysis.get("imageSha256"),
+        "imageStats": analysis.get("imageStats"),
+    }
+
+def build_error_response(file_name: str) -> PhotoAnalysisResponse:
+    """Placeholder result for a batch item whose analysis failed"""
+    return PhotoAnalysisResponse(
+        photoId=str(uuid.uuid4()),
+        fileName=file_name,
+        uploadTime=datetime.now(timezone.utc).isoformat(),
+        analysisResults=AnalysisResults(
+            violations=[],
+            riskLevel="Low",
+            safetyScore=0
+        ),
+        processingTime=0
+    )
+
 @api_router.post("/analyze", response_model=PhotoAnalysisResponse)
 async def analyze_photo(request: PhotoAnalysisRequest):
     """Analyze a single photo for safety violations"""
-    photo_id = str(uuid.uuid4())
     upload_time = datetime.now(timezone.utc).isoformat()
     
     # Analyze with Vision API
-    analysis = await analyze_image_with_vision(request.image_base64)
+    analysis = await analyze_image_bytes(decode_image_base64(request.image_base64), tiled=bool(request.tiled))
     
-    return PhotoAnalysisResponse(
-        photoId=photo_id,
-        fileName=request.file_name,
-        uploadTime=upload_time,
-        analysisResults=AnalysisResults(
-            violations=[Violation(**v) for v in analysis["violations"]],
-            riskLevel=analysis["riskLevel"],
-            safetyScore=analysis["safetyScore"]
-        ),
-        processingTime=analysis["processingTime"]
+    return FastJSONResponse(
+        build_photo_response(request.file_name, upload_time, analysis, source="analyze", site=request.site)
     )
 
+async def analyze_batch_item(image_req: PhotoAnalysisRequest) -> PhotoAnalysisResponse:
+    upload_time = datetime.now(timezone.utc).isoformat()
+    analysis = await analyze_image_bytes(decode_image_base64(image_req.image_base64), tiled=bool(image_req.tiled))
+    return build_photo_response(image_req.file_name, upload_time, analysis, source="batch", site=image_req.site)
+
+async def analyze_batch_packed(images: List[PhotoAnalysisRequest]) -> List[Any]:
+    """Batch analysis with multi-image packing; one response or exception per image"""
+    upload_time = datetime.now(timezone.utc).isoformat()
+    outcomes: List[Any] = [None] * len(images)
+    decoded = []
+    for position, image_req in enumerate(images):
+        try:
+            decoded.append((position, decode_image_base64(image_req.image_base64)))
+        except HTTPException as e:
+            outcomes[position] = e
+    
+    analyses = await analyze_images_packed([image_bytes for _, image_bytes in decoded])
+    for (position, _), analysis in zip(decoded, analyses):
+        if isinstance(analysis, Exception):
+            outcomes[position] = analysis
+        else:
+            outcomes[position] = build_photo_response(
+                images[position].file_name, upload_time, analysis, source="batch", site=images[position].site
+            )
+    return outcomes
+
 @api_router.post("/analyze-batch", response_model=List[PhotoAnalysisResponse])
 async def analyze_batch(request: BatchAnalysisRequest):
     """Analyze multiple photos for safety violations"""
+    # Tiled images need calls of their own, so such batches aren't packed
+    if BATCH_PACK_SIZE > 1 and not any(image_req.tiled for image_req in request.images):
+        outcomes = await analyze_batch_packed(request.images)
+    else:
+        outcomes = await run_bounded(
+            request.images,
+            analyze_batch_item,
+            concurrency=BATCH_CONCURRENCY,
+            item_timeout=BATCH_ITEM_TIMEOUT,
+        )
+    
     results = []
+    for image_req, outcome in zip(request.images, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error analyzing {image_req.file_name}: {outcome!r}")
+            # Add error result
+            results.append(build_error_response(image_req.file_name))
+        else:
+            results.append(outcome)
     
-    for image_req in request.images:
-        try:
-            photo_id = str(uuid.uuid4())
-            upload_time = datetime.now(timezone.utc).isoformat()
+    return FastJSONResponse(results)
+
+def format_stream_event(event: dict, sse: bool) -> str:
+    payload = dumps(event).decode()
+    if sse:
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+async def batch_event_stream(
+    request: Request,
+    items: Sequence,
+    worker: Callable[..., Awaitable[PhotoAnalysisResponse]],
+    file_names: List[str],
+    sse: bool,
+) -> AsyncIterator[str]:
+    """Yield each batch result as soon as it completes, tagged with its input index.
+
+    Heartbeats (with progress) are sent while nothing has completed for
+    STREAM_HEARTBEAT_INTERVAL seconds. Outstanding analyses are cancelled
+    when the client disconnects.
+    """
+    total = len(items)
+    completed = 0
+    results = iter_bounded(
+        items, worker, concurrency=BATCH_CONCURRENCY, item_timeout=BATCH_ITEM_TIMEOUT
+    )
+    next_result = asyncio.ensure_future(results.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_result}, timeout=STREAM_HEARTBEAT_INTERVAL)
+            if not done:
+                if await request.is_disconnected():
+                    logger.info(f"Client disconnected; cancelling {total - completed} analyses")
+                    return
+                yield format_stream_event(
+                    {"event": "heartbeat", "completed": completed, "total": total}, sse
+                )
+                continue
             
-            analysis = await analyze_image_with_vision(image_req.image_base64)
+            try:
+                index, outcome = next_result.result()
+            except StopAsyncIteration:
+                break
+            next_result = asyncio.ensure_future(results.__anext__())
+            completed += 1
             
-            results.append(PhotoAnalysisResponse(
-                photoId=photo_id,
-                fileName=image_req.file_name,
-                uploadTime=upload_time,
-                analysisResults=AnalysisResults(
-                    violations=[Violation(**v) for v in analysis["violations"]],
-                    riskLevel=analysis["riskLevel"],
-                    safetyScore=analysis["safetyScore"]
-                ),
-                processingTime=analysis["processingTime"]
-            ))
+            event = {"event": "result", "index": index}
+            if isinstance(outcome, Exception):
+                logger.error(f"Error analyzing {file_names[index]}: {outcome!r}")
+                event["result"] = build_error_response(file_names[index]).model_dump()
+                event["error"] = getattr(outcome, "detail", None) or repr(outcome)
+            else:
+                event["result"] = outcome.model_dump()
+            yield format_stream_event(event, sse)
+            yield format_stream_event(
+                {"event": "progress", "completed": completed, "total": total}, sse
+            )
+        
+        yield format_stream_event({"event": "done", "completed": completed, "total": total}, sse)
+    finally:
+        if not next_result.done():
+            next_result.cancel()
+            await asyncio.gather(next_result, return_exceptions=True)
+        await results.aclose()
+
+@api_router.post("/analyze-batch/stream")
+async def analyze_batch_stream(request: Request, batch: BatchAnalysisRequest):
+    """Analyze multiple photos, streaming each result as NDJSON (or SSE if requested)"""
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        batch_event_stream(
+            request,
+            batch.images,
+            analyze_batch_item,
+            [image_req.file_name for image_req in batch.images],
+            sse,
+        ),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def analysis_event_stream(
+    request: Request,
+    image_bytes: bytes,
+    file_name: str,
+    site: Optional[str],
+    sse: bool,
+    tiled: bool = False,
+) -> AsyncIterator[str]:
+    """Yield each violation as the model writes it, then the final scored result.
+    
+    Violation events carry the model's raw entries; the result event holds
+    the response after the scoring rules, which is the one to keep.
+    Heartbeats are sent while nothing new arrives for
+    STREAM_HEARTBEAT_INTERVAL seconds, and the analysis is cancelled when
+    the client disconnects.
+    """
+    upload_time = datetime.now(timezone.utc).isoformat()
+    events: asyncio.Queue = asyncio.Queue()
+    violations_sent = 0
+    
+    def on_violation(violation: dict) -> None:
+        nonlocal violations_sent
+        events.put_nowait({"event": "violation", "index": violations_sent, "violation": violation})
+        violations_sent += 1
+    
+    analysis = asyncio.ensure_future(analyze_image_bytes(image_bytes, on_violation, tiled))
+    analysis.add_done_callback(lambda _: events.put_nowait(None))
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=STREAM_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; cancelling analysis")
+                    return
+                yield format_stream_event({"event": "heartbeat"}, sse)
+                continue
+            if event is None:
+                break
+            yield format_stream_event(event, sse)
+        
+        try:
+            result = build_photo_response(file_name, upload_time, analysis.result(), source="stream", site=site)
         except Exception as e:
-            logger.error(f"Error analyzing {image_req.file_name}: {str(e)}")
-            # Add error result
-            results.append(PhotoAnalysisResponse(
-                photoId=str(uuid.uuid4()),
-                fileName=image_req.file_name,
-                uploadTime=datetime.now(timezone.utc).isoformat(),
-                analysisResults=AnalysisResults(
-                    violations=[],
-                    riskLevel="Low",
-                    safetyScore=0
-                ),
-                processingTime=0
-            ))
-    
-    return results
+            logger.error(f"Error analyzing {file_name}: {e!r}")
+            yield format_stream_event({
+                "event": "error",
+                "status": getattr(e, "status_code", 500),
+                "error": getattr(e, "detail", None) or repr(e),
+            }, sse)
+            return
+        yield format_stream_event({"event": "result", "result": result.model_dump()}, sse)
+    finally:
+        if not analysis.done():
+            analysis.cancel()
+            await asyncio.gather(analysis, return_exceptions=True)
+
+@api_router.post("/analyze/stream")
+async def analyze_photo_stream(request: Request, photo: PhotoAnalysisRequest):
+    """Analyze a photo, streaming violations as they are found as NDJSON (or SSE if requested)"""
+    image_bytes = decode_image_base64(photo.image_base64)
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    return StreamingResponse(
+        analysis_event_stream(request, image_bytes, photo.file_name, photo.site, sse, bool(photo.tiled)),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def read_upload_form(request: Request, field: str, max_files: int, required: bool = True) -> tuple:
+    """Parse a multipart body into spooled upload files and the optional site field.
+    
+    The size limits are enforced as the body streams in (see uploads.py),
+    so an oversized file is refused at its first byte over the limit. A
+    declared Content-Length over the request limit is refused up front.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > UPLOAD_MAX_REQUEST_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request exceeds {UPLOAD_MAX_REQUEST_BYTES} bytes"
+        )
+    
+    try:
+        with span("body"):
+            form = await parse_upload_form(
+                request,
+                max_files=max_files,
+                max_fields=10,
+                max_part_bytes=UPLOAD_MAX_FILE_BYTES,
+                max_request_bytes=UPLOAD_MAX_REQUEST_BYTES
+            )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    site = form.get("site")
+    uploads = [f for f in form.getlist(field) if isinstance(f, UploadFile)]
+    if required and not uploads:
+        await form.close()
+        raise HTTPException(status_code=422, detail=f"No files in form field '{field}'")
+    return form, uploads, site if isinstance(site, str) and site else None
+
+def form_flag(form, name: str) -> bool:
+    """A boolean form field such as tiled=true"""
+    value = form.get(name)
+    return isinstance(value, str) and value.lower() in ('1', 'true', 'yes', 'on')
+
+@api_router.post("/analyze/upload", response_model=PhotoAnalysisResponse)
+async def analyze_photo_upload(request: Request):
+    """Analyze a single photo sent as multipart/form-data (field: file)"""
+    form, uploads, site = await read_upload_form(request, "file", max_files=1)
+    try:
+        upload = uploads[0]
+        upload_time = datetime.now(timezone.utc).isoformat()
+        analysis = await analyze_image_bytes(await read_upload(upload), tiled=form_flag(form, "tiled"))
+        return FastJSONResponse(
+            build_photo_response(upload.filename or "upload", upload_time, analysis, source="upload", site=site)
+        )
+    finally:
+        await form.close()
+
+async def analyze_upload_item(upload: UploadFile, site: Optional[str], tiled: bool) -> PhotoAnalysisResponse:
+    # Read lazily so only the items currently in flight are held in memory
+    upload_time = datetime.now(timezone.utc).isoformat()
+    analysis = await analyze_image_bytes(await read_upload(upload), tiled=tiled)
+    return build_photo_response(upload.filename or "upload", upload_time, analysis, source="upload", site=site)
+
+@api_router.post("/analyze-batch/upload", response_model=List[PhotoAnalysisResponse])
+async def analyze_batch_upload(request: Request):
+    """Analyze multiple photos sent as multipart/form-data (repeated field: files)"""
+    form, uploads, site = await read_upload_form(request, "files", max_files=UPLOAD_MAX_FILES)
+    tiled = form_flag(form, "tiled")
+    try:
+        outcomes = await run_bounded(
+            uploads,
+            lambda upload: analyze_upload_item(upload, site, tiled),
+            concurrency=BATCH_CONCURRENCY,
+            item_timeout=BATCH_ITEM_TIMEOUT,
+        )
+    finally:
+        await form.close()
+    
+    results = []
+    for upload, outcome in zip(uploads, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error analyzing {upload.filename}: {outcome!r}")
+            results.append(build_error_response(upload.filename or "upload"))
+        else:
+            results.append(outcome)
+    
+    return FastJSONResponse(results)
+
+async def run_job_item(item: dict) -> dict:
+    """Analyze one job item and return the stored PhotoAnalysisResponse"""
+    upload_time = datetime.now(timezone.utc).isoformat()
+    try:
+        analysis = await analyze_image_bytes(item["image"])
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise PermanentJobError(e.detail)
+        raise
+    return build_photo_response(
+        item["fileName"], upload_time, analysis, source="job", site=item.get("site"), job_id=item["jobId"]
+    ).model_dump()
+
+def get_job_runner() -> JobRunner:
+    if job_runner is None:
+        raise HTTPException(status_code=503, detail="Job queue not available")
+    return job_runner
+
+async def submit_job(images: List[tuple], site: Optional[str] = None) -> JobStatusResponse:
+    for file_name, image_bytes in images:
+        if len(image_bytes) > JOB_MAX_ITEM_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{file_name} exceeds {JOB_MAX_ITEM_BYTES} bytes"
+            )
+    job = await get_job_runner().submit(images, site)
+    return JobStatusResponse(**job)
+
+@api_router.post("/jobs", response_model=JobStatusResponse, status_code=202)
+async def create_job(request: BatchAnalysisRequest):
+    """Queue a batch for background analysis and return its job ID"""
+    return await submit_job([
+        (image_req.file_name, decode_image_base64(image_req.image_base64))
+        for image_req in request.images
+    ], request.site)
+
+@api_router.post("/jobs/upload", response_model=JobStatusResponse, status_code=202)
+async def create_job_upload(request: Request):
+    """Queue multipart files (repeated field: files) for background analysis"""
+    form, uploads, site = await read_upload_form(request, "files", max_files=UPLOAD_MAX_FILES)
+    try:
+        images = [(upload.filename or "upload", await read_upload(upload)) for upload in uploads]
+    finally:
+        await form.close()
+    return await submit_job(images, site)
+
+@api_router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    job = await get_job_runner().store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job)
+
+@api_router.get("/jobs/{job_id}/results", response_model=JobResultsPage)
+async def get_job_results(job_id: str, cursor: Optional[str] = None, limit: int = 50):
+    """Page through per-item job results in input order"""
+    store = get_job_runner().store
+    if await store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        after_index = int(cursor) if cursor else -1
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    limit = max(1, min(limit, 200))
+    
+    items = await store.list_items(job_id, after_index, limit)
+    next_cursor = str(items[-1]["index"]) if len(items) == limit else None
+    return FastJSONResponse(JobResultsPage(
+        jobId=job_id,
+        items=[JobItemResult(**item) for item in items],
+        nextCursor=next_cursor
+    ))
+
+def get_inspection_history() -> InspectionHistory:
+    if not inspection_history.enabled:
+        raise HTTPException(status_code=503, detail="Inspection history not available")
+    return inspection_history
+
+@api_router.get("/inspections", response_model=InspectionPage)
+async def list_inspections(
+    site: Optional[str] = None,
+    riskLevel: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[str] = None
+):
+    """Page through recorded inspections, newest first.
+    
+    Filters use the compound indexes in history.py. Only summary fields are
+    returned unless fields= (comma separated) asks for others, such as
+    violations or imageStats.
+    """
+    history = get_inspection_history()
+    selected = LIST_FIELDS
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = sorted(set(selected) - set(SELECTABLE_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    try:
+        items, next_cursor = await history.list(
+            site=site,
+            risk_level=riskLevel,
+            since=since,
+            until=until,
+            cursor=cursor,
+            limit=max(1, min(limit, 200)),
+            fields=selected,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return InspectionPage(items=items, nextCursor=next_cursor)
+
+@api_router.get("/inspections/{photo_id}")
+async def get_inspection(photo_id: str):
+    """One recorded inspection with all its fields"""
+    record = await get_inspection_history().get(photo_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    return record
+
+def analytics_range(since: Optional[date], until: Optional[date]) -> Tuple[date, date]:
+    """Inclusive day range, defaulting to the last 30 days (UTC)"""
+    until = until or datetime.now(timezone.utc).date()
+    since = since or until - timedelta(days=29)
+    if since > until:
+        raise HTTPException(status_code=400, detail="since is after until")
+    if (until - since).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range exceeds {ANALYTICS_MAX_DAYS} days")
+    return since, until
+
+@api_router.get("/analytics", response_model=AnalyticsReport)
+async def get_analytics(
+    site: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    daily: bool = False
+):
+    """Risk counts, average score and category breakdown for a site (or all) over a day range.
+    
+    Answered from the rollups: one document per day, however many
+    inspections there were. daily=true adds the per-day series.
+    """
+    rollups = get_inspection_history().rollups
+    since, until = analytics_range(since, until)
+    days = await rollups.days(site or ALL_SITES, since, until)
+    return AnalyticsReport(
+        site=site,
+        since=since,
+        until=until,
+        summary=merge_rollups(days),
+        days=[DailyAnalytics(day=doc["day"], **merge_rollups([doc])) for doc in days] if daily else [],
+    )
+
+@api_router.get("/analytics/sites", response_model=AnalyticsReport)
+async def get_site_analytics(since: Optional[date] = None, until: Optional[date] = None):
+    """Per-site statistics over a day range, worst average score first"""
+    rollups = get_inspection_history().rollups
+    since, until = analytics_range(since, until)
+    by_site = await rollups.sites(since, until)
+    return AnalyticsReport(
+        since=since,
+        until=until,
+        summary=merge_rollups(await rollups.days(ALL_SITES, since, until)),
+        sites=sorted(
+            (SiteAnalytics(site=site, **summary) for site, summary in by_site.items()),
+            key=lambda entry: entry.averageSafetyScore if entry.averageSafetyScore is not None else 101
+        ),
+    )
+
+async def run_rollup_rebuild(history: InspectionHistory) -> None:
+    started = time.perf_counter()
+    try:
+        await history.rollups.rebuild(history.collection)
+    except Exception as e:
+        logger.error(f"Analytics rollup rebuild failed: {e!r}")
+    else:
+        logger.info(f"Analytics rollups rebuilt in {time.perf_counter() - started:.1f}s")
+
+@api_router.post("/analytics/rebuild", status_code=202)
+async def rebuild_analytics():
+    """Recompute the rollups from the inspection history in the background (backfill)"""
+    global rollup_rebuild
+    history = get_inspection_history()
+    if rollup_rebuild is not None and not rollup_rebuild.done():
+        raise HTTPException(status_code=409, detail="Rollup rebuild already running")
+    rollup_rebuild = asyncio.create_task(run_rollup_rebuild(history))
+    return {"status": "started"}
+
+async def make_report_thumbnail(image_bytes: bytes, file_name: str):
+    """Downscaled JPEG for a report page, or None if the photo can't be decoded"""
+    loop = asyncio.get_running_loop()
+    try:
+        with stage("thumbnail"):
+            return await loop.run_in_executor(
+                get_image_executor(), report_thumbnail, image_bytes, REPORT_THUMBNAIL_EDGE, REPORT_THUMBNAIL_QUALITY
+            )
+    except ImageDecodeError as e:
+        logger.warning(f"Report photo {file_name} skipped: {e}")
+        return None
+
+async def pdf_report_stream(
+    title: str,
+    subtitle: str,
+    summary: dict,
+    entries: AsyncIterator[Tuple[ReportEntry, Optional[bytes]]],
+    cleanup: Optional[Callable[[], Awaitable[None]]] = None
+) -> AsyncIterator[bytes]:
+    """Yield the PDF a page at a time: the summary cover, then each photo's pages.
+    
+    Only the current photo and its thumbnail are held in memory.
+    """
+    report = PdfReport(title, datetime.now(timezone.utc))
+    try:
+        yield report.cover(summary, subtitle)
+        index = 0
+        async for entry, image_bytes in entries:
+            index += 1
+            thumbnail = await make_report_thumbnail(image_bytes, entry.fileName) if image_bytes else None
+            yield report.photo(index, entry, thumbnail)
+        yield report.finish()
+    finally:
+        if cleanup is not None:
+            await cleanup()
+
+async def stored_preview(entry: ReportEntry) -> Optional[bytes]:
+    """The medium preview of the entry's image, if one was stored"""
+    if not PREVIEWS_ENABLED or not entry.imageSha256:
+        return None
+    return await asyncio.to_thread(preview_store.read, entry.imageSha256, "medium")
+
+def pdf_response(stream: AsyncIterator[bytes], file_name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"', "X-Accel-Buffering": "no"},
+    )
+
+@api_router.post("/reports/pdf")
+async def create_pdf_report(request: Request):
+    """Stream a PDF report for submitted results (multipart/form-data).
+    
+    Fields: results, a JSON array of analysis responses; files, the photos
+    in the same order (optional: without one, the stored preview of the
+    result's imageSha256 is used); title. Uploaded photos stay spooled on
+    disk and are thumbnailed one page at a time.
+    """
+    form, uploads, _ = await read_upload_form(request, "files", max_files=REPORT_MAX_PHOTOS, required=False)
+    try:
+        raw_results = form.get("results")
+        if not isinstance(raw_results, str):
+            raise HTTPException(status_code=422, detail="Form field 'results' is required")
+        try:
+            results = [PhotoAnalysisResponse.model_validate(r).model_dump() for r in json.loads(raw_results)]
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
+            raise HTTPException(status_code=422, detail=f"Invalid results: {e}")
+        if not results or len(results) > REPORT_MAX_PHOTOS:
+            raise HTTPException(status_code=422, detail=f"Reports hold 1 to {REPORT_MAX_PHOTOS} results")
+        title = form.get("title")
+        title = title if isinstance(title, str) and title else "AI SAFETY VISION - BATCH REPORT"
+    except HTTPException:
+        await form.close()
+        raise
+    
+    entries = [ReportEntry.from_response(result) for result in results]
+    tally = ReportTally()
+    for entry in entries:
+        tally.add(entry)
+    
+    async def photos() -> AsyncIterator[Tuple[ReportEntry, Optional[bytes]]]:
+        for position, entry in enumerate(entries):
+            image_bytes = await read_upload(uploads[position]) if position < len(uploads) else None
+            yield entry, image_bytes or await stored_preview(entry)
+    
+    generated_at = datetime.now(timezone.utc)
+    return pdf_response(
+        pdf_report_stream(title, "", tally.summary(), photos(), cleanup=form.close),
+        report_filename("AI_Safety_Vision_Report", generated_at),
+    )
+
+@api_router.get("/reports/pdf")
+async def stored_pdf_report(
+    site: Optional[str] = None,
+    riskLevel: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 500
+):
+    """Stream a PDF report of recorded inspections, newest first.
+    
+    The history is read twice through batched cursors, once for the
+    executive summary and once for the pages, so neither pass holds the
+    whole result set. Photos come from the stored previews.
+    """
+    history = get_inspection_history()
+    query = build_query(site, riskLevel, since, until)
+    limit = max(1, min(limit, REPORT_MAX_PHOTOS))
+    
+    tally = ReportTally()
+    async for record in history.find(
+        query, {"fileName": 1, "inspectedAt": 1, "riskLevel": 1, "safetyScore": 1, "violations.category": 1}, limit
+    ):
+        tally.add(ReportEntry.from_record(record))
+    if not tally.counters["inspections"]:
+        raise HTTPException(status_code=404, detail="No inspections match")
+    
+    async def photos() -> AsyncIterator[Tuple[ReportEntry, Optional[bytes]]]:
+        async for record in history.find(query, {"imageStats": 0}, limit):
+            entry = ReportEntry.from_record(record)
+            yield entry, await stored_preview(entry)
+    
+    subtitle = f" | Site: {site}" if site else ""
+    generated_at = datetime.now(timezone.utc)
+    return pdf_response(
+        pdf_report_stream("AI SAFETY VISION - INSPECTION REPORT", subtitle, tally.summary(), photos()),
+        report_filename("AI_Safety_Vision_Report", generated_at, [site or ""]),
+    )
+
+@api_router.get("/previews/{digest}/{variant_file}")
+async def get_preview(digest: str, variant_file: str):
+    """A stored preview (e.g. thumb-320.jpg): immutable, with ETag and range support"""
+    resolved = preview_store.resolve(digest, variant_file) if PREVIEWS_ENABLED else None
+    if resolved is None:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    path, variant = resolved
+    return ImmutableFileResponse(path, etag=f"{digest}-{variant}")
 
 # Include the router
 app.include_router(api_router)
@@ -336,22 +1902,143 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=RESPONSE_GZIP_LEVEL,
+    brotli_quality=RESPONSE_BROTLI_QUALITY,
 )
 
-# Serve React Frontend Static Files (for unified deployment)
+# Request IDs, Server-Timing and per-request JSON logs; optionally profile a
+# sample of requests (PROFILE_SAMPLE_RATE=0.01 profiles 1%) into PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+app.add_middleware(
+    TracingMiddleware,
+    profiler=SamplingProfiler(PROFILE_SAMPLE_RATE, PROFILE_DIR),
+    log_skip_paths={"/api/health", "/api/metrics"},
+)
+
+# Serve React Frontend Static Files (for unified deployment) from a manifest
+# built at startup: precompressed, ETagged, and nothing outside the build
 STATIC_DIR = ROOT_DIR / "static"
+static_manifest = StaticManifest(STATIC_DIR)
 if STATIC_DIR.exists():
-    app.mount("/static", StaticFiles(directory=str(STATIC_DIR / "static")), name="static")
-    
-    @app.get("/{full_path:path}")
-    async def serve_react(full_path: str):
+
+    @app.on_event("startup")
+    async def startup_static_manifest():
+        await asyncio.to_thread(static_manifest.build)
+
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+    async def serve_react(full_path: str, request: Request):
         """Serve React app for all non-API routes"""
-        # Check if it's a file request
-        file_path = STATIC_DIR / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        # Return index.html for all other routes (React Router)
-        return FileResponse(STATIC_DIR / "index.html")
+        if full_path.startswith("api/"):
+            raise HTTPException(status_code=404, detail="Not Found")
+        return static_manifest.response(full_path, request.headers)
+
+@app.on_event("startup")
+async def startup_analysis_cache():
+    if ANALYSIS_CACHE_ENABLED:
+        await analysis_cache.ensure_indexes()
+
+async def prune_previews_periodically() -> None:
+    while True:
+        try:
+            removed, freed = await asyncio.to_thread(preview_store.prune, PREVIEW_MAX_BYTES)
+            if removed:
+                logger.info(f"Pruned {removed} previews ({freed} bytes) to stay under {PREVIEW_MAX_BYTES} bytes")
+        except Exception as e:
+            logger.error(f"Preview pruning failed: {e!r}")
+        await asyncio.sleep(PREVIEW_PRUNE_INTERVAL)
+
+@app.on_event("startup")
+async def startup_preview_pruner():
+    global preview_pruner
+    if PREVIEWS_ENABLED and PREVIEW_MAX_BYTES > 0:
+        preview_pruner = asyncio.create_task(prune_previews_periodically())
+
+@app.on_event("startup")
+async def startup_inspection_history():
+    await inspection_history.ensure_indexes()
+    inspection_history.start()
+
+@app.on_event("startup")
+async def startup_job_runner():
+    global job_runner
+    store = MemoryJobStore() if JOB_STORE == 'memory' else MongoJobStore(db)
+    for attempt in range(1, max(JOB_STORE_CONNECT_ATTEMPTS, 1) + 1):
+        try:
+            await store.ensure_indexes()
+            break
+        except Exception as e:
+            if attempt >= JOB_STORE_CONNECT_ATTEMPTS:
+                raise RuntimeError(
+                    f"Job store ({JOB_STORE}) unreachable after {attempt} attempts: {e!r}. "
+                    "Set JOB_STORE=memory to run without persistent jobs."
+                ) from e
+            delay = min(2 ** (attempt - 1), 30)
+            logger.warning(f"Job store ({JOB_STORE}) unavailable, retrying in {delay}s ({e!r})")
+            await asyncio.sleep(delay)
+    JOB_STORE_KIND.labels(JOB_STORE).set(1)
+    logger.info(f"Job store: {JOB_STORE}")
+    job_runner = JobRunner(
+        store,
+        run_job_item,
+        workers=JOB_WORKERS,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        item_timeout=BATCH_ITEM_TIMEOUT,
+        poll_interval=JOB_POLL_INTERVAL,
+        retry_backoff=JOB_RETRY_BACKOFF,
+        retry_backoff_max=JOB_RETRY_BACKOFF_MAX,
+    )
+    job_runner.start()
+
+@app.on_event("startup")
+async def startup_vision_backend():
+    if VISION_BACKEND == 'stub' or os.environ.get('OPENAI_API_KEY'):
+        logger.info(f"Vision backend: {get_vision_backend().name}")
+    else:
+        logger.warning("OPENAI_API_KEY not configured; vision analysis will fail")
+
+@app.on_event("shutdown")
+async def shutdown_vision_backend():
+    global vision_backend
+    if vision_backend is not None:
+        await vision_backend.close()
+        vision_backend = None
+
+@app.on_event("shutdown")
+async def shutdown_job_runner():
+    global job_runner
+    if job_runner is not None:
+        await job_runner.stop()
+        job_runner = None
+
+@app.on_event("shutdown")
+async def shutdown_image_executor():
+    global image_executor
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
+        image_executor = None
+
+@app.on_event("shutdown")
+async def shutdown_inspection_history():
+    # After the job runner stops, so results of the last job items are kept
+    await inspection_history.stop()
+
+@app.on_event("shutdown")
+async def shutdown_preview_pruner():
+    global preview_pruner
+    if preview_pruner is not None:
+        preview_pruner.cancel()
+        preview_pruner = None
+
+@app.on_event("shutdown")
+async def shutdown_analysis_cache():
+    await analysis_cache.stop()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -0,0 +1,108 @@
+"""Static serving of the bundled React app from an in-memory manifest.
+
+At startup every file under the build directory is read once, hashed
+and, when compressible, precompressed with gzip (and brotli if the
+brotli package is installed). Requests are answered from the manifest
+only: nothing outside it is ever read from disk, so traversal such as
+"../" cannot match. Content-hashed bundles (main.3f9a1c2e.js) are cached
+for a year as immutable; everything else, index.html in particular, is
+revalidated with its ETag.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.responses import Response
+
+from compression import accepted_encodings, brotli, is_compressible
+from conditional import etag_matches
+
+logger = logging.getLogger(__name__)
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[a-z0-9]+$")
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+@dataclass
+class StaticAsset:
+    media_type: str
+    cache_control: str
+    etag: str
+    # Content by encoding: "identity", and "gzip"/"br" when smaller
+    variants: Dict[str, bytes] = field(default_factory=dict)
+
+
+class StaticManifest:
+    """Index of a static build directory with precompressed variants"""
+
+    def __init__(self, root: Path, index: str = "index.html"):
+        self.root = Path(root)
+        self.index = index
+        self.assets: Dict[str, StaticAsset] = {}
+
+    def build(self) -> None:
+        """Read, hash and compress every file; CPU-bound, run once at startup"""
+        assets = {}
+        for path in sorted(self.root.rglob("*")):
+            if not path.is_file() or path.suffix in (".gz", ".br"):
+                continue
+            key = path.relative_to(self.root).as_posix()
+            data = path.read_bytes()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            asset = StaticAsset(
+                media_type=media_type,
+                cache_control=IMMUTABLE if HASHED_NAME.search(path.name) else REVALIDATE,
+                etag=hashlib.sha256(data).hexdigest()[:20],
+                variants={"identity": data},
+            )
+            if len(data) >= MIN_COMPRESS_BYTES and is_compressible(media_type):
+                compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    compressed["br"] = brotli.compress(data, quality=11)
+                asset.variants.update(
+                    (encoding, body) for encoding, body in compressed.items() if len(body) < len(data)
+                )
+            assets[key] = asset
+        self.assets = assets
+        total = sum(len(a.variants["identity"]) for a in assets.values())
+        logger.info(f"Static manifest: {len(assets)} files, {total} bytes, brotli {'on' if brotli else 'off'}")
+
+    def resolve(self, path: str) -> Optional[StaticAsset]:
+        """Asset for a request path; extension-less paths are app routes and get index.html"""
+        asset = self.assets.get(path.lstrip("/") or self.index)
+        if asset is None and "." not in path.rsplit("/", 1)[-1]:
+            asset = self.assets.get(self.index)
+        return asset
+
+    def response(self, path: str, headers) -> Response:
+        asset = self.resolve(path)
+        if asset is None:
+            return Response(status_code=404)
+
+        encoding = "identity"
+        if len(asset.variants) > 1:
+            for candidate in accepted_encodings(headers.get("accept-encoding", "")):
+                if candidate in asset.variants:
+                    encoding = candidate
+                    break
+        etag = f'"{asset.etag}"' if encoding == "identity" else f'"{asset.etag}-{encoding}"'
+        response_headers = {"etag": etag, "cache-control": asset.cache_control}
+        if len(asset.variants) > 1:
+            response_headers["vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            response_headers["content-encoding"] = encoding
+
+        if etag_matches(headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=response_headers)
+
+        # The server drops the body of HEAD responses, keeping its length
+        return Response(content=asset.variants[encoding], headers=response_headers, media_type=asset.media_type)
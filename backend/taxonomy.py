@@ -0,0 +1,310 @@
+"""Violation taxonomy: canonical types, the deduction table and deterministic scoring.
+
+Free-text violation types from the model are mapped to canonical types
+through a synonym index built once at startup ("No hard hat", "helmet
+missing" and "Missing Hard Hat" all resolve to the same type). Scores are
+computed from the deduction table, never taken from the model, and the
+scorer works on whole arrays of analyses so stored inspections can be
+re-scored in bulk when a deduction changes.
+"""
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CATEGORIES = ("PPE", "Equipment", "Environmental", "Housekeeping")
+# Any violation in these categories forces a High risk level
+CRITICAL_CATEGORIES = ("PPE", "Environmental")
+
+# Applied to types the index doesn't recognise, by the category the model gave
+DEFAULT_CATEGORY_DEDUCTIONS = {"PPE": 15, "Equipment": 15, "Environmental": 20, "Housekeeping": 5}
+UNKNOWN_DEDUCTION = 10
+
+# Phrases meaning "not wearing / not present", combined with each PPE item's names
+NEGATIONS = ("missing", "no", "without", "lack of", "lacking", "not wearing", "not using", "absent")
+NEGATION_SUFFIXES = ("missing", "not worn", "not used", "absent")
+
+# Terms containing a violation word without naming that violation ("spill kit" is
+# equipment, not a spill); cut out of free text before synonyms are looked for
+NEUTRAL_PHRASES = (
+    "spill kit", "spill tray", "spill pallet", "spill containment", "spill response",
+    "debris net", "debris netting", "debris chute", "clutter free", "free of clutter", "free of debris",
+    "no spill", "no debris", "no clutter",
+)
+
+# (count of violations or critical violations, score cap); first match wins
+SCORE_CAPS = (
+    (5, 2, 35),
+    (3, 1, 55),
+    (2, None, 70),
+    (1, None, 85),
+)
+HIGH_RISK_MAX_SCORE = 49
+MEDIUM_RISK_MAX_SCORE = 74
+RISK_LEVELS = np.array(["High", "Medium", "Low"])
+
+
+@dataclass(frozen=True)
+class ViolationType:
+    name: str
+    category: str
+    deduction: int
+    critical: bool = False
+    synonyms: Tuple[str, ...] = ()
+    # For "Missing X" types: the names of X, expanded with every negation phrase
+    items: Tuple[str, ...] = ()
+
+
+# Mirrors the deduction table in the analysis prompt
+DEFAULT_TYPES = (
+    ViolationType("Missing Hard Hat", "PPE", 25, critical=True,
+                  items=("hard hat", "hardhat", "helmet", "safety helmet", "hard helmet", "head protection")),
+    ViolationType("Missing Safety Vest", "PPE", 20,
+                  items=("safety vest", "vest", "hi vis", "hi viz", "high visibility clothing",
+                         "high visibility vest", "high vis vest", "reflective vest")),
+    ViolationType("Missing Gloves", "PPE", 15,
+                  items=("gloves", "safety gloves", "work gloves", "hand protection")),
+    ViolationType("Missing Safety Glasses", "PPE", 20, critical=True,
+                  items=("safety glasses", "goggles", "safety goggles", "eye protection", "glasses")),
+    ViolationType("Missing Safety Boots", "PPE", 15,
+                  items=("safety boots", "safety shoes", "steel toe boots", "work boots", "foot protection")),
+    ViolationType("Improper PPE Usage", "PPE", 15,
+                  synonyms=("improper ppe", "ppe not worn correctly", "incorrect ppe", "ppe misuse",
+                            "improperly worn ppe")),
+    ViolationType("Exposed Machinery Parts", "Equipment", 20, critical=True,
+                  synonyms=("exposed machinery", "exposed moving parts", "unguarded moving parts",
+                            "exposed gears", "exposed rotating parts")),
+    ViolationType("Uncovered Pit", "Equipment", 25, critical=True,
+                  synonyms=("uncovered pits", "uncovered hole", "uncovered pits holes", "open pit", "open hole",
+                            "unprotected excavation", "uncovered excavation", "open trench")),
+    ViolationType("Improperly Stacked Materials", "Equipment", 15,
+                  synonyms=("improper stacking", "unstable stack", "unstable stacking", "poorly stacked materials",
+                            "materials stacked improperly")),
+    ViolationType("Unsecured Equipment", "Equipment", 20,
+                  synonyms=("unsecured tools", "loose equipment", "equipment not secured", "unsecured load")),
+    ViolationType("Missing Machine Guards", "Equipment", 20,
+                  synonyms=("missing guards on machinery", "missing guard", "missing machine guard",
+                            "unguarded machinery", "no machine guard", "machine guard missing")),
+    ViolationType("Spill Hazard", "Environmental", 20,
+                  synonyms=("spill", "spills", "oil spill", "chemical spill", "water spill", "liquid spill",
+                            "wet floor", "slippery floor")),
+    ViolationType("Exposed Wiring", "Environmental", 30, critical=True,
+                  synonyms=("exposed wires", "exposed electrical wiring", "exposed cables", "live wires",
+                            "damaged wiring", "frayed wiring", "electrical hazard")),
+    ViolationType("Fire Hazard", "Environmental", 30, critical=True,
+                  synonyms=("fire risk", "flammable materials", "combustible materials", "open flame")),
+    ViolationType("Blocked Exit", "Environmental", 25, critical=True,
+                  synonyms=("blocked exits", "blocked pathway", "blocked exits pathways", "obstructed exit",
+                            "blocked walkway", "obstructed pathway", "blocked emergency exit",
+                            "blocked fire exit")),
+    ViolationType("Poor Lighting", "Environmental", 15,
+                  synonyms=("poor lighting conditions", "inadequate lighting", "insufficient lighting",
+                            "low light", "dim lighting")),
+    ViolationType("Clutter and Debris", "Housekeeping", 10,
+                  synonyms=("clutter", "debris", "cluttered area", "cluttered workspace", "scattered debris")),
+    ViolationType("Disorganized Workspace", "Housekeeping", 5,
+                  synonyms=("disorganised workspace", "messy workspace", "untidy workspace", "disorganized work area")),
+    ViolationType("Unsanitary Conditions", "Housekeeping", 10,
+                  synonyms=("unsanitary", "unhygienic conditions", "dirty conditions")),
+    ViolationType("Improper Waste Disposal", "Housekeeping", 15,
+                  synonyms=("improper waste", "waste not disposed", "improperly disposed waste", "littering")),
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and plural "s", collapse whitespace"""
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    return " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+
+def confidence_value(value) -> int:
+    """The model's confidence as a whole percentage; 0 when missing or not a number ("90" reads as 90)"""
+    try:
+        return min(max(round(float(value)), 0), 100)
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+@dataclass
+class EncodedViolations:
+    """Violations of many analyses as flat arrays, ready for vectorized scoring.
+
+    type_ids index the taxonomy's id space (canonical types, then one
+    default per category, then unknown); owners give the analysis each
+    violation belongs to. The ids don't depend on deductions, so an
+    encoding can be re-scored under any edited table.
+    """
+    type_ids: np.ndarray
+    owners: np.ndarray
+    counts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+@dataclass(frozen=True)
+class ScoreResult:
+    scores: np.ndarray
+    risk_levels: np.ndarray
+    critical_counts: np.ndarray
+
+
+@dataclass
+class Taxonomy:
+    types: Tuple[ViolationType, ...] = DEFAULT_TYPES
+    category_deductions: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_CATEGORY_DEDUCTIONS))
+    unknown_deduction: int = UNKNOWN_DEDUCTION
+    neutral_phrases: Tuple[str, ...] = NEUTRAL_PHRASES
+
+    def __post_init__(self):
+        self._index: Dict[str, int] = {}
+        for type_id, violation_type in enumerate(self.types):
+            for phrase in self._phrases(violation_type):
+                self._index.setdefault(normalize(phrase), type_id)
+        # Longest first, so "missing safety glasses" wins over "glasses" in free text
+        self._phrases_by_length = sorted(self._index, key=len, reverse=True)
+        neutral = sorted({normalize(phrase) for phrase in self.neutral_phrases}, key=len, reverse=True)
+        self._neutral = re.compile(
+            r"(?<!\S)(?:" + "|".join(map(re.escape, neutral)) + r")(?!\S)" if neutral else r"(?!)"
+        )
+        self._category_ids = {
+            category: len(self.types) + offset for offset, category in enumerate(CATEGORIES)
+        }
+        self.unknown_id = len(self.types) + len(CATEGORIES)
+
+        self.deductions = np.array(
+            [t.deduction for t in self.types]
+            + [self.category_deductions.get(c, self.unknown_deduction) for c in CATEGORIES]
+            + [self.unknown_deduction],
+            dtype=np.int32,
+        )
+        self.critical = np.array(
+            [t.critical or t.category in CRITICAL_CATEGORIES for t in self.types]
+            + [c in CRITICAL_CATEGORIES for c in CATEGORIES]
+            + [False],
+            dtype=bool,
+        )
+        self.lookup = lru_cache(maxsize=4096)(self._lookup)
+
+    @staticmethod
+    def _phrases(violation_type: ViolationType) -> Iterable[str]:
+        yield violation_type.name
+        yield from violation_type.synonyms
+        for item in violation_type.items:
+            for negation in NEGATIONS:
+                yield f"{negation} {item}"
+            for suffix in NEGATION_SUFFIXES:
+                yield f"{item} {suffix}"
+
+    def _lookup(self, type_text: str) -> Optional[int]:
+        key = normalize(type_text)
+        type_id = self._index.get(key)
+        if type_id is not None:
+            return type_id
+        # Free text such as "Worker without a helmet near the scaffold". Phrases match
+        # whole words only, and neutral terms are cut out first, so "No spill kit
+        # present" leaves nothing for "spill" to match.
+        padded = f" {key.replace(' a ', ' ').replace(' an ', ' ')} "
+        padded = self._neutral.sub("|", padded)
+        for phrase in self._phrases_by_length:
+            if f" {phrase} " in padded:
+                return self._index[phrase]
+        return None
+
+    def type_id(self, violation: dict) -> int:
+        type_id = self.lookup(str(violation.get("type", "")))
+        if type_id is not None:
+            return type_id
+        return self._category_ids.get(violation.get("category"), self.unknown_id)
+
+    def canonicalize(self, violation: dict) -> dict:
+        """Copy of the violation with its canonical type and category, when recognised, and a numeric confidence"""
+        violation = {**violation, "confidence": confidence_value(violation.get("confidence"))}
+        type_id = self.lookup(str(violation.get("type", "")))
+        if type_id is None:
+            return violation
+        violation_type = self.types[type_id]
+        return {**violation, "type": violation_type.name, "category": violation_type.category}
+
+    def encode(self, violation_lists: Sequence[Sequence[dict]]) -> EncodedViolations:
+        counts = np.fromiter((len(v) for v in violation_lists), dtype=np.int64, count=len(violation_lists))
+        type_ids = np.fromiter(
+            (self.type_id(v) for violations in violation_lists for v in violations),
+            dtype=np.int32,
+            count=int(counts.sum()),
+        )
+        owners = np.repeat(np.arange(len(violation_lists)), counts)
+        return EncodedViolations(type_ids=type_ids, owners=owners, counts=counts)
+
+    def score_encoded(self, encoded: EncodedViolations) -> ScoreResult:
+        """Score and risk level for every analysis in the encoding"""
+        size = len(encoded)
+        deducted = np.bincount(encoded.owners, weights=self.deductions[encoded.type_ids], minlength=size)
+        critical_counts = np.bincount(encoded.owners, weights=self.critical[encoded.type_ids], minlength=size)
+        base = np.clip(100 - deducted, 0, 100)
+
+        conditions, caps = [], []
+        for min_count, min_critical, cap in SCORE_CAPS:
+            condition = encoded.counts >= min_count
+            if min_critical is not None:
+                condition |= critical_counts >= min_critical
+            conditions.append(condition)
+            caps.append(cap)
+        scores = np.minimum(base, np.select(conditions, caps, default=100)).astype(np.int32)
+
+        risk = np.where(
+            (scores <= HIGH_RISK_MAX_SCORE) | (critical_counts >= 1), 0,
+            np.where(scores <= MEDIUM_RISK_MAX_SCORE, 1, 2),
+        )
+        return ScoreResult(
+            scores=scores,
+            risk_levels=RISK_LEVELS[risk],
+            critical_counts=critical_counts.astype(np.int32),
+        )
+
+    def score_many(self, violation_lists: Sequence[Sequence[dict]]) -> ScoreResult:
+        return self.score_encoded(self.encode(violation_lists))
+
+    def score(self, violations: Sequence[dict]) -> Tuple[int, str]:
+        """Safety score and risk level for one analysis"""
+        result = self.score_many([violations])
+        return int(result.scores[0]), str(result.risk_levels[0])
+
+    def with_deductions(
+        self,
+        deductions: Optional[Dict[str, int]] = None,
+        category_deductions: Optional[Dict[str, int]] = None,
+    ) -> "Taxonomy":
+        """A copy with some deductions changed; type ids (and encodings) stay compatible"""
+        deductions = deductions or {}
+        unknown = set(deductions) - {t.name for t in self.types}
+        if unknown:
+            raise ValueError(f"Unknown violation types: {', '.join(sorted(unknown))}")
+        return Taxonomy(
+            types=tuple(replace(t, deduction=int(deductions.get(t.name, t.deduction))) for t in self.types),
+            category_deductions={**self.category_deductions, **(category_deductions or {})},
+            unknown_deduction=self.unknown_deduction,
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        table = [(t.name, t.deduction) for t in self.types] + sorted(self.category_deductions.items())
+        return hashlib.sha256(json.dumps(table).encode()).hexdigest()[:12]
+
+
+def load_taxonomy(path: Optional[str] = None) -> Taxonomy:
+    """Default taxonomy, with deductions overridden from a JSON file if given.
+
+    The file looks like {"deductions": {"Missing Hard Hat": 30},
+    "categoryDeductions": {"Housekeeping": 10}}.
+    """
+    taxonomy = Taxonomy()
+    if not path:
+        return taxonomy
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    return taxonomy.with_deductions(overrides.get("deductions"), overrides.get("categoryDeductions"))
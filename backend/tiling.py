@@ -0,0 +1,199 @@
+"""Tiled analysis of large and panoramic photos.
+
+A wide drone or panorama shot downscaled to one vision call loses the
+detail needed to spot a missing glove or hard hat. In tiled mode the
+image is cut at full resolution into overlapping tiles, each tile is
+analyzed on its own, and the tiles' violations are mapped back onto the
+whole image:
+
+    violation box in tile (fractions) -> pixels in the image -> fractions of the image
+
+Objects in an overlap are reported by both tiles, so violations of the
+same type whose boxes mostly cover each other are merged into one.
+Violations the model gave no box for can't be told apart by position and
+are kept once per type.
+"""
+import io
+import math
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from imaging import ImageDecodeError, PreparedImage, to_rgb
+from prescreen import QualityMeasures, measure
+
+Box = Tuple[float, float, float, float]  # left, top, right, bottom as fractions
+
+
+@dataclass(frozen=True)
+class Tile:
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+@dataclass
+class TiledImage:
+    width: int
+    height: int
+    bytes_in: int
+    tiles: List[Tuple[Tile, PreparedImage]]
+    quality: Optional[QualityMeasures] = None  # of the whole image, see prescreen.py
+
+
+def image_size(image_bytes: bytes) -> Tuple[int, int]:
+    """Width and height from the image header, without decoding the pixels"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            return img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError(f"Unsupported or corrupt image: {e}") from e
+
+
+def should_tile(width: int, height: int, tile_edge: int, min_edge: int, min_aspect: float) -> bool:
+    """Whether an image is big or wide enough for tiles to add detail"""
+    long_edge, short_edge = max(width, height), max(min(width, height), 1)
+    return long_edge > tile_edge and (long_edge >= min_edge or long_edge / short_edge >= min_aspect)
+
+
+def _axis(length: int, edge: int, overlap: float) -> List[Tuple[int, int]]:
+    """(start, size) of evenly spaced windows covering length, overlapping by at least overlap"""
+    if length <= edge:
+        return [(0, length)]
+    count = math.ceil((length - edge) / (edge * (1 - overlap))) + 1
+    return [(round(i * (length - edge) / (count - 1)), edge) for i in range(count)]
+
+
+def tile_grid(width: int, height: int, tile_edge: int, overlap: float, max_tiles: int) -> List[Tile]:
+    """Overlapping tiles covering the image, row by row.
+
+    When covering the image at tile_edge would take more than max_tiles,
+    the tiles are made larger (and later downscaled to tile_edge) instead.
+    """
+    edge = tile_edge
+    while True:
+        columns, rows = _axis(width, edge, overlap), _axis(height, edge, overlap)
+        if len(columns) * len(rows) <= max_tiles:
+            break
+        edge = math.ceil(edge * 1.25)
+    return [Tile(left, top, tile_width, tile_height) for top, tile_height in rows for left, tile_width in columns]
+
+
+def make_tiles(
+    image_bytes: bytes, tile_edge: int, overlap: float, max_tiles: int, quality: int, measure_quality: bool = False
+) -> TiledImage:
+    """Decode once at full resolution and encode each tile as a JPEG; CPU-bound, call from a worker pool"""
+    try:
+        img = Image.open(io.BytesIO(image_bytes))
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError(f"Unsupported or corrupt image: {e}") from e
+    img = to_rgb(ImageOps.exif_transpose(img))
+
+    tiles = []
+    for tile in tile_grid(img.width, img.height, tile_edge, overlap, max_tiles):
+        crop = img.crop((tile.left, tile.top, tile.left + tile.width, tile.top + tile.height))
+        if max(crop.size) > tile_edge:
+            crop.thumbnail((tile_edge, tile_edge), Image.LANCZOS)
+        out = io.BytesIO()
+        crop.save(out, format="JPEG", quality=quality, optimize=True)
+        data = out.getvalue()
+        tiles.append((tile, PreparedImage(
+            data=data,
+            mime_type="image/jpeg",
+            width=crop.width,
+            height=crop.height,
+            bytes_in=len(image_bytes),
+            bytes_out=len(data),
+        )))
+    return TiledImage(
+        width=img.width,
+        height=img.height,
+        bytes_in=len(image_bytes),
+        tiles=tiles,
+        quality=measure(img) if measure_quality else None,
+    )
+
+
+def parse_box(value) -> Optional[Box]:
+    """A [left, top, right, bottom] box of fractions from model output, or None if unusable"""
+    try:
+        left, top, right, bottom = (min(max(float(v), 0.0), 1.0) for v in value)
+    except (TypeError, ValueError):
+        return None
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right, bottom
+
+
+def location_label(box: Box) -> str:
+    """Coarse position of a box's centre, in the words the prompt's location field uses"""
+    x, y = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+    column = "left" if x < 1 / 3 else "right" if x > 2 / 3 else "center"
+    row = "top" if y < 1 / 3 else "bottom" if y > 2 / 3 else "center"
+    if row == "center":
+        return "center" if column == "center" else f"{column}-center"
+    return f"{row}-{column}"
+
+
+def to_image(violation: dict, tile: Tile, width: int, height: int) -> dict:
+    """Copy of a tile's violation with its box and location on the whole image.
+
+    Violations without a usable box get box None and the tile's location.
+    """
+    box = parse_box(violation.get("box"))
+    if box is None:
+        tile_box = (tile.left / width, tile.top / height,
+                    (tile.left + tile.width) / width, (tile.top + tile.height) / height)
+        return {**violation, "box": None, "location": location_label(tile_box)}
+    image_box = (
+        (tile.left + box[0] * tile.width) / width,
+        (tile.top + box[1] * tile.height) / height,
+        (tile.left + box[2] * tile.width) / width,
+        (tile.top + box[3] * tile.height) / height,
+    )
+    image_box = tuple(round(v, 4) for v in image_box)
+    return {**violation, "box": list(image_box), "location": location_label(image_box)}
+
+
+def overlap_ratio(a: Sequence[float], b: Sequence[float]) -> float:
+    """Intersection over the smaller box's area: 1.0 when one box lies inside the other"""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height / smaller if smaller > 0 else 0.0
+
+
+def merge_violations(violations: List[dict], key: Callable[[dict], object], threshold: float) -> List[dict]:
+    """Merge violations of the same key whose boxes overlap by at least threshold.
+
+    Most confident first; a duplicate widens the kept violation's box to
+    cover both, since an object cut by a tile edge is only partly in each.
+    Boxless violations (box None) are kept once per key.
+    """
+    kept: Dict[object, List[dict]] = {}
+    boxless = set()
+    merged = []
+    for violation in sorted(violations, key=lambda v: -(v.get("confidence") or 0)):
+        box = violation.get("box")
+        if box is None:
+            if key(violation) not in boxless:
+                boxless.add(key(violation))
+                merged.append(dict(violation))
+            continue
+        same_kind = kept.setdefault(key(violation), [])
+        for other in same_kind:
+            if overlap_ratio(box, other["box"]) >= threshold:
+                other["box"] = [min(box[0], other["box"][0]), min(box[1], other["box"][1]),
+                                max(box[2], other["box"][2]), max(box[3], other["box"][3])]
+                other["location"] = location_label(other["box"])
+                break
+        else:
+            violation = dict(violation)
+            same_kind.append(violation)
+            merged.append(violation)
+    return merged
@@ -0,0 +1,296 @@
+"""Per-request tracing: request IDs, stage spans, Server-Timing and sampled profiles"""
+import asyncio
+import contextvars
+import functools
+import importlib.util
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Client-supplied IDs are echoed back in headers and logs, so keep them tame
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class Trace:
+    """Spans recorded while serving one request.
+
+    Spans with the same name are summed, so a batch reports the total
+    time spent in each stage across its items (which can exceed the
+    wall-clock time when items run concurrently).
+    """
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self.endpoint_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        span = self.spans.setdefault(name, [0.0, 0])
+        span[0] += seconds
+        span[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        entries = []
+        for name, (seconds, count) in self.spans.items():
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="x{count}"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def as_dict(self) -> dict:
+        return {
+            name: {"ms": round(seconds * 1000, 2), "count": count}
+            for name, (seconds, count) in self.spans.items()
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> str:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else "-"
+
+
+@contextmanager
+def span(name: str):
+    """Record a span on the current request's trace, if any"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, time.perf_counter() - started)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into the latency histogram and the current request's trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, elapsed)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp every log record with the ID of the request being served"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id()
+        return True
+
+
+def _mark_endpoint(endpoint):
+    if getattr(endpoint, "__traced__", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def traced_endpoint(*args, **kwargs):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.endpoint_started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if trace is not None:
+                trace.endpoint_finished = time.perf_counter()
+
+    traced_endpoint.__traced__ = True
+    return traced_endpoint
+
+
+class TracedRoute(APIRoute):
+    """API route that splits the time FastAPI spends around the endpoint into spans.
+
+    "body" covers reading and validating the request body, "serialize"
+    covers validating and encoding the response model.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _mark_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def traced_handler(request):
+            trace = _current_trace.get()
+            if trace is None:
+                return await handler(request)
+            started = time.perf_counter()
+            response = await handler(request)
+            if trace.endpoint_started is not None and trace.endpoint_finished is not None:
+                trace.add("body", trace.endpoint_started - started)
+                trace.add("serialize", time.perf_counter() - trace.endpoint_finished)
+            return response
+
+        return traced_handler
+
+
+class SamplingProfiler:
+    """Profile a random fraction of requests and write each profile to disk.
+
+    Uses pyinstrument (a statistical profiler) when it is installed and
+    falls back to cProfile otherwise, which also records any other
+    coroutines running on the loop meanwhile. Both hook the thread's
+    profile function, so only one request is profiled at a time.
+    """
+
+    def __init__(self, rate: float, directory: Path):
+        self.rate = rate
+        self.directory = directory
+        self.use_pyinstrument = importlib.util.find_spec("pyinstrument") is not None
+        self.active = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def maybe_start(self):
+        if not self.enabled or self.active or random.random() >= self.rate:
+            return None
+        self.active = True
+        try:
+            if self.use_pyinstrument:
+                from pyinstrument import Profiler
+
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+            else:
+                import cProfile
+
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except Exception as e:
+            self.active = False
+            logger.warning(f"Profiler failed to start: {e}")
+            return None
+        return profiler
+
+    async def finish(self, profiler, request_id: str, method: str, path: str) -> Optional[str]:
+        try:
+            if self.use_pyinstrument:
+                profiler.stop()
+            else:
+                profiler.disable()
+        finally:
+            self.active = False
+
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+        stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{method.lower()}-{slug[:60]}-{request_id[:32]}"
+        target = self.directory / (stem + (".html" if self.use_pyinstrument else ".prof"))
+
+        def write():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if self.use_pyinstrument:
+                target.write_text(profiler.output_html(), encoding="utf-8")
+            else:
+                profiler.dump_stats(str(target))
+
+        try:
+            await asyncio.to_thread(write)
+        except Exception as e:
+            logger.error(f"Failed to write profile {target}: {e}")
+            return None
+        return str(target)
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces every HTTP request.
+
+    Assigns a request ID (reusing a well-formed incoming X-Request-ID),
+    returns it together with a Server-Timing header of the recorded
+    spans, and logs one JSON line per request. Streaming responses send
+    their headers before the work happens, so their spans only appear in
+    the log line.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        profiler: Optional[SamplingProfiler] = None,
+        log_skip_paths: Iterable[str] = (),
+        log_prefix: str = "/api/",
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.log_skip_paths = frozenset(log_skip_paths)
+        self.log_prefix = log_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        request_id = incoming if incoming and REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        trace = Trace(request_id)
+        token = _current_trace.set(trace)
+        profiler = self.profiler.maybe_start() if self.profiler is not None else None
+        status_code = 500
+
+        async def send_with_trace(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(REQUEST_ID_HEADER, request_id)
+                headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            profile_path = None
+            if profiler is not None:
+                profile_path = await self.profiler.finish(profiler, request_id, scope["method"], scope["path"])
+            self.log_request(scope, status_code, trace, profile_path)
+            _current_trace.reset(token)
+
+    def log_request(self, scope, status_code: int, trace: Trace, profile_path: Optional[str]) -> None:
+        path = scope["path"]
+        if not path.startswith(self.log_prefix) or path in self.log_skip_paths:
+            return
+        record = {
+            "event": "request",
+            "requestId": trace.request_id,
+            "method": scope["method"],
+            "path": path,
+            "status": status_code,
+            "durationMs": round(trace.elapsed() * 1000, 2),
+            "spans": trace.as_dict(),
+        }
+        if profile_path is not None:
+            record["profile"] = profile_path
+        logger.info(json.dumps(record))
@@ -0,0 +1,77 @@
+"""Multipart upload parsing with size limits enforced while the body streams.
+
+Starlette's request.form() spools the whole body before anything can be
+checked, so an oversized file was received and written to disk in full
+before it was refused. parse_upload_form counts bytes as they arrive:
+per part in the multipart parser callbacks, and for the whole request
+around request.stream(), so chunked uploads without a Content-Length are
+capped too. UploadTooLarge is raised at the first byte over a limit, and
+the files spooled so far are closed.
+"""
+from typing import AsyncIterator
+
+from starlette.datastructures import FormData, Headers
+from starlette.formparsers import MultiPartParser
+from starlette.requests import Request
+
+
+class UploadTooLarge(Exception):
+    """A part or the whole request went over its byte limit"""
+
+
+async def limited_stream(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Pass the chunks of stream through, raising UploadTooLarge past max_bytes in total"""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise UploadTooLarge(f"Request exceeds {max_bytes} bytes")
+        yield chunk
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """MultiPartParser refusing any part (file or field) larger than max_part_bytes"""
+
+    def __init__(self, headers: Headers, stream: AsyncIterator[bytes], *, max_part_bytes: int, **kwargs):
+        super().__init__(headers, stream, **kwargs)
+        self.max_part_bytes = max_part_bytes
+        self._part_bytes = 0
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._part_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._part_bytes += end - start
+        if self._part_bytes > self.max_part_bytes:
+            name = self._current_part.file.filename if self._current_part.file else self._current_part.field_name
+            raise UploadTooLarge(f"{name} exceeds {self.max_part_bytes} bytes")
+        super().on_part_data(data, start, end)
+
+    async def parse(self) -> FormData:
+        try:
+            return await super().parse()
+        except UploadTooLarge:
+            for file in self._files_to_close_on_error:
+                file.close()
+            raise
+
+
+async def parse_upload_form(
+    request: Request, *, max_files: int, max_fields: int, max_part_bytes: int, max_request_bytes: int
+) -> FormData:
+    """Parse a multipart/form-data body; raises UploadTooLarge or MultiPartException.
+
+    Any other content type carries no files and yields an empty form,
+    without reading the body.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return FormData()
+    parser = LimitedMultiPartParser(
+        request.headers,
+        limited_stream(request.stream(), max_request_bytes),
+        max_part_bytes=max_part_bytes,
+        max_files=max_files,
+        max_fields=max_fields,
+    )
+    return await parser.parse()
@@ -0,0 +1,305 @@
+"""Vision model backends: OpenAI, plus a deterministic offline stub for load tests"""
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VisionUsage:
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class VisionCompletion:
+    text: str
+    model: str
+    usage: Optional[VisionUsage] = None
+
+
+@dataclass
+class VisionChunk:
+    """One piece of a streamed completion; usage arrives on the last chunk if at all"""
+    text: str
+    model: Optional[str] = None
+    usage: Optional[VisionUsage] = None
+
+
+class VisionStreamInterrupted(Exception):
+    """A streamed completion failed after part of it was delivered, so it can't be retried"""
+
+
+class VisionBackend(ABC):
+    """A chat-completion style vision model: prompts plus one or more images in, text out.
+
+    Subclasses set name and implement complete_many; streaming falls back
+    to one chunk holding the whole completion.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def complete_many(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        images: Sequence[Tuple[str, str]],
+        detail: str,
+        max_tokens: int,
+    ) -> VisionCompletion:
+        """Send (base64, mime type) images in order; several images are labelled "Image 1" and so on"""
+
+    async def stream_many(
+        self,
+        *,
+        model: str,
+        system_prompt: str,
+        prompt: str,
+        images: Sequence[Tuple[str, str]],
+        detail: str,
+        max_tokens: int,
+    ) -> AsyncIterator[VisionChunk]:
+        """Like complete_many, but yield the answer as it is generated"""
+        completion = await self.complete_many(
+            model=model,
+            system_prompt=system_prompt,
+            prompt=prompt,
+            images=images,
+            detail=detail,
+            max_tokens=max_tokens,
+        )
+        yield VisionChunk(text=completion.text, model=completion.model, usage=completion.usage)
+
+    async def close(self) -> None:
+        return None
+
+
+class OpenAIVisionBackend(VisionBackend):
+    """OpenAI chat completions over a pooled keep-alive HTTP client"""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        http2: bool,
+    ):
+        # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 without it
+        http2 = http2 and importlib.util.find_spec("h2") is not None
+        http_client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        # Retries are left to the caller's governor, which also adapts to throttling
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, timeout=timeout, max_retries=0)
+        logger.info(
+            f"OpenAI vision backend ready (http2={http2}, max_connections={max_connections}, "
+            f"keepalive={max_keepalive})"
+        )
+
+    @staticmethod
+    def messages(system_prompt: str, prompt: str, images: Sequence[Tuple[str, str]], detail: str) -> List[dict]:
+        content: List[dict] = [{"type": "text", "text": prompt}]
+        for number, (image_base64, mime_type) in enumerate(images, start=1):
+            if len(images) > 1:
+                content.append({"type": "text", "text": f"Image {number}:"})
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{mime_type};base64,{image_base64}", "detail": detail},
+            })
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": content},
+        ]
+
+    async def complete_many(self, *, model, system_prompt, prompt, images, detail, max_tokens):
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=self.messages(system_prompt, prompt, images, detail),
+            max_tokens=max_tokens,
+        )
+        usage = None
+        if response.usage is not None:
+            usage = VisionUsage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return VisionCompletion(text=response.choices[0].message.content or "", model=response.model, usage=usage)
+
+    async def stream_many(self, *, model, system_prompt, prompt, images, detail, max_tokens):
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=self.messages(system_prompt, prompt, images, detail),
+            max_tokens=max_tokens,
+            stream=True,
+            # Passed through the body so older SDKs without the parameter still ask for usage
+            extra_body={"stream_options": {"include_usage": True}},
+        )
+        async for chunk in stream:
+            usage = None
+            if getattr(chunk, "usage", None) is not None:
+                usage = VisionUsage(chunk.usage.prompt_tokens, chunk.usage.completion_tokens)
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            yield VisionChunk(text=text or "", model=chunk.model, usage=usage)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# (type, category, deduction) drawn from the scoring table in the analysis prompt
+STUB_VIOLATIONS = [
+    ("Missing Hard Hat", "PPE", 25),
+    ("Missing Safety Vest", "PPE", 20),
+    ("Missing Gloves", "PPE", 15),
+    ("Missing Safety Glasses", "PPE", 20),
+    ("Exposed Machinery Parts", "Equipment", 20),
+    ("Improperly Stacked Materials", "Equipment", 15),
+    ("Unsecured Equipment", "Equipment", 20),
+    ("Spill Hazard", "Environmental", 20),
+    ("Exposed Wiring", "Environmental", 30),
+    ("Blocked Exit", "Environmental", 25),
+    ("Clutter and Debris", "Housekeeping", 10),
+    ("Improper Waste Disposal", "Housekeeping", 15),
+]
+STUB_LOCATIONS = [
+    "top-left", "top-center", "top-right", "left-center", "center",
+    "right-center", "bottom-left", "bottom-center", "bottom-right",
+]
+STUB_REQUEST = httpx.Request("POST", "http://vision-stub/v1/chat/completions")
+
+
+class StubVisionBackend(VisionBackend):
+    """Offline backend returning deterministic violations derived from the image hash.
+
+    Latency, jitter and failure injection are configurable, and injected
+    failures use the real OpenAI exception types so retry and error
+    handling paths are exercised exactly as in production.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        *,
+        latency: float,
+        jitter: float,
+        error_rate: float,
+        throttle_rate: float,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+
+    def analysis_for(self, image_base64: str, boxes: bool = False) -> dict:
+        digest = hashlib.sha256(image_base64.encode("ascii")).digest()
+        rng = random.Random(digest)
+        picked = rng.sample(STUB_VIOLATIONS, k=rng.choice([0, 0, 1, 1, 2, 3, 5]))
+        violations = [
+            {
+                "type": violation_type,
+                "location": rng.choice(STUB_LOCATIONS),
+                "confidence": rng.randint(60, 99),
+                "category": category,
+            }
+            for violation_type, category, _ in picked
+        ]
+        if boxes:  # asked for by the tile prompt
+            for violation in violations:
+                left, top = rng.uniform(0, 0.8), rng.uniform(0, 0.8)
+                violation["box"] = [round(left, 3), round(top, 3),
+                                    round(left + rng.uniform(0.05, 0.2), 3), round(top + rng.uniform(0.05, 0.2), 3)]
+        score = max(0, 100 - sum(deduction for _, _, deduction in picked))
+        return {
+            "violations": violations,
+            "riskLevel": "High" if score < 50 else "Medium" if score < 75 else "Low",
+            "safetyScore": score,
+            "summary": f"Stub analysis: {len(violations)} violation(s)",
+            "confidence": rng.randint(60, 99),
+        }
+
+    def packed_analysis_for(self, images: Sequence[Tuple[str, str]]) -> dict:
+        return {
+            "results": [
+                {"image": number, **self.analysis_for(image_base64)}
+                for number, (image_base64, _) in enumerate(images, start=1)
+            ]
+        }
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def _inject_failure(self) -> None:
+        roll = self.random.random()
+        if roll < self.throttle_rate:
+            raise openai.RateLimitError(
+                "Stub rate limit",
+                response=httpx.Response(429, headers={"retry-after": "1"}, request=STUB_REQUEST),
+                body=None,
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            raise openai.InternalServerError(
+                "Stub server error",
+                response=httpx.Response(500, request=STUB_REQUEST),
+                body=None,
+            )
+
+    def _answer(self, system_prompt: str, prompt: str, images: Sequence[Tuple[str, str]]) -> Tuple[str, VisionUsage]:
+        if len(images) == 1:
+            text = json.dumps(self.analysis_for(images[0][0], boxes='"box"' in prompt))
+        else:
+            text = json.dumps(self.packed_analysis_for(images))
+        usage = VisionUsage(
+            prompt_tokens=(len(system_prompt) + len(prompt)) // 4 + 85 * len(images),
+            completion_tokens=len(text) // 4,
+        )
+        return text, usage
+
+    async def complete_many(self, *, model, system_prompt, prompt, images, detail, max_tokens):
+        await asyncio.sleep(self._delay())
+        self._inject_failure()
+        text, usage = self._answer(system_prompt, prompt, images)
+        return VisionCompletion(text=text, model=f"{model}-stub", usage=usage)
+
+    async def stream_many(self, *, model, system_prompt, prompt, images, detail, max_tokens):
+        # A quarter of the latency before the first token, the rest spread over the answer
+        delay = self._delay()
+        await asyncio.sleep(delay / 4)
+        self._inject_failure()
+        text, usage = self._answer(system_prompt, prompt, images)
+        pieces = [text[start:start + 16] for start in range(0, len(text), 16)]
+        for number, piece in enumerate(pieces, start=1):
+            if number > 1:
+                await asyncio.sleep(delay * 3 / 4 / (len(pieces) - 1))
+            yield VisionChunk(
+                text=piece,
+                model=f"{model}-stub",
+                usage=usage if number == len(pieces) else None,
+            )
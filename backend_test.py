@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import requests
+import os
 import sys
 import base64
 import json
@@ -422,6 +423,83 @@ class NESRSafetyAPITester:
             self.log_test("Analyze Endpoint - Clean Site", False, f"Request failed: {str(e)}")
         return False
 
+    def test_analyze_upload_endpoint(self):
+        """Test multipart upload variant of the analyze endpoint"""
+        try:
+            image_bytes = base64.b64decode(self.create_test_image("safety_scene"))
+            
+            print("🔍 Uploading image as multipart/form-data...")
+            start_time = time.time()
+            
+            response = requests.post(
+                f"{self.api_url}/analyze/upload",
+                files={"file": ("test_upload.jpg", image_bytes, "image/jpeg")},
+                timeout=30
+            )
+            
+            processing_time = time.time() - start_time
+            print(f"⏱️  Analysis completed in {processing_time:.2f} seconds")
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('fileName') == "test_upload.jpg" and 'analysisResults' in data:
+                    analysis = data['analysisResults']
+                    self.log_test("Analyze Upload Endpoint", True, f"Violations: {len(analysis['violations'])}, Risk: {analysis['riskLevel']}, Score: {analysis['safetyScore']}%", data)
+                    return True
+                else:
+                    self.log_test("Analyze Upload Endpoint", False, "Invalid response format", data)
+            else:
+                self.log_test("Analyze Upload Endpoint", False, f"Status code: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_test("Analyze Upload Endpoint", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_job_queue(self):
+        """Test background job submission, status polling and paged results"""
+        try:
+            payload = {
+                "images": [
+                    {"image_base64": self.create_test_image("safety_scene"), "file_name": "job_scene.jpg"},
+                    {"image_base64": self.create_test_image("clean_site"), "file_name": "job_clean.jpg"}
+                ]
+            }
+            
+            response = requests.post(f"{self.api_url}/jobs", json=payload, timeout=30)
+            if response.status_code != 202:
+                self.log_test("Job Queue - Submit", False, f"Status code: {response.status_code}, Response: {response.text}")
+                return False
+            job_id = response.json()['jobId']
+            
+            print(f"🔍 Waiting for job {job_id}...")
+            status = {}
+            for _ in range(60):
+                status = requests.get(f"{self.api_url}/jobs/{job_id}", timeout=10).json()
+                if status.get('status') == 'completed':
+                    break
+                time.sleep(2)
+            else:
+                self.log_test("Job Queue - Completion", False, "Job did not complete in time", status)
+                return False
+            
+            page = requests.get(f"{self.api_url}/jobs/{job_id}/results", params={"limit": 1}, timeout=10).json()
+            next_page = requests.get(
+                f"{self.api_url}/jobs/{job_id}/results",
+                params={"limit": 1, "cursor": page.get('nextCursor')},
+                timeout=10
+            ).json()
+            file_names = [item['fileName'] for item in page['items'] + next_page['items']]
+            
+            if file_names == ["job_scene.jpg", "job_clean.jpg"]:
+                self.log_test("Job Queue", True, f"Completed: {status['completed']}, Failed: {status['failed']}", status)
+                return True
+            else:
+                self.log_test("Job Queue", False, f"Unexpected paged results: {file_names}")
+                
+        except Exception as e:
+            self.log_test("Job Queue", False, f"Request failed: {str(e)}")
+        return False
+
     def test_analyze_endpoint_invalid_data(self):
         """Test analyze endpoint with invalid data"""
         try:
@@ -490,6 +568,10 @@ class NESRSafetyAPITester:
         self.test_analyze_endpoint_with_violations()
         time.sleep(2)  # Brief pause between AI calls
         self.test_analyze_endpoint_clean_site()
+        time.sleep(2)
+        self.test_analyze_upload_endpoint()
+        time.sleep(2)
+        self.test_job_queue()
         
         # Safety score consistency tests (NEW)
         print("\n🎯 Testing Safety Score Consistency (Bug Fix Validation)...")
@@ -524,7 +606,9 @@ class NESRSafetyAPITester:
         }
 
 def main():
-    tester = NESRSafetyAPITester()
+    # Target a local server with: python backend_test.py http://localhost:8000
+    base_url = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("BACKEND_URL")
+    tester = NESRSafetyAPITester(base_url) if base_url else NESRSafetyAPITester()
     exit_code = tester.run_all_tests()
     
     # Save detailed results
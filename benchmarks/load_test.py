@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""Local load test and benchmark for the Safety Vision API.
+
+Runs server:app in-process (ASGI transport) or under uvicorn, against
+either the offline stub backend or the OpenAI backend pointed at a local
+mock endpoint (benchmarks/mock_vision_server.py). Replays single-image,
+multipart, batch or streaming workloads at a fixed concurrency and prints
+a JSON report with throughput, latency percentiles, event-loop lag, health
+probe latency and peak RSS.
+
+Examples:
+    python benchmarks/load_test.py --workload single --requests 200 --concurrency 32
+    python benchmarks/load_test.py --server uvicorn --vision mock-http --workload batch \\
+        --batch-size 20 --requests 10 --image-size 3000x2000 --output after.json
+    python benchmarks/load_test.py --baseline before.json --max-regression 0.10
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "p50": rank(0.50),
+        "p95": rank(0.95),
+        "p99": rank(0.99),
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_images(count: int, size: tuple, fmt: str, seed: int) -> List[bytes]:
+    """Distinct noisy photos: a random gradient plus noise, so every image hashes differently"""
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        base = Image.linear_gradient("L").resize(size).convert("RGB")
+        tint = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+        noise = Image.effect_noise(size, rng.uniform(20, 60)).convert("RGB")
+        img = Image.blend(Image.blend(base, tint, 0.5), noise, 0.3)
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+        images.append(buffer.getvalue())
+    return images
+
+
+def server_env(args) -> Dict[str, str]:
+    env = {
+        "MONGO_TIMEOUT_MS": "200",
+        "JOB_STORE": "memory",
+        "ANALYSIS_CACHE_ENABLED": "true" if args.cache else "false",
+        "BATCH_CONCURRENCY": str(args.batch_concurrency),
+    }
+    if args.vision == "stub":
+        env.update({
+            "VISION_BACKEND": "stub",
+            "VISION_STUB_LATENCY": str(args.vision_latency),
+            "VISION_STUB_JITTER": str(args.vision_jitter),
+        })
+    else:
+        env.update({
+            "VISION_BACKEND": "openai",
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        })
+    return env
+
+
+def start_process(argv: List[str], env: Dict[str, str], cwd: Path) -> subprocess.Popen:
+    return subprocess.Popen(
+        argv, cwd=str(cwd), env={**os.environ, **env},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as probe:
+        while time.monotonic() < deadline:
+            try:
+                await probe.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def peak_rss_mb(pid: Optional[int]) -> Optional[float]:
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# Workloads answered as NDJSON events; for single-stream the first event may be a violation
+STREAMING_WORKLOADS = ("stream", "single-stream")
+
+
+def build_request(args, images: List[bytes], n: int) -> dict:
+    """httpx request kwargs for the n-th request of the workload"""
+    def pick(i: int) -> bytes:
+        return images[i % len(images)]
+
+    if args.workload in ("single", "single-stream"):
+        image = pick(n)
+        url = "/api/analyze/stream" if args.workload == "single-stream" else "/api/analyze"
+        return {"method": "POST", "url": url, "json": {
+            "image_base64": base64.b64encode(image).decode(), "file_name": f"bench-{n}.jpg"}}
+    if args.workload == "upload":
+        return {"method": "POST", "url": "/api/analyze/upload",
+                "files": {"file": (f"bench-{n}.jpg", pick(n), "image/jpeg")}}
+    batch = [
+        {"image_base64": base64.b64encode(pick(n * args.batch_size + i)).decode(),
+         "file_name": f"bench-{n}-{i}.jpg"}
+        for i in range(args.batch_size)
+    ]
+    url = "/api/analyze-batch/stream" if args.workload == "stream" else "/api/analyze-batch"
+    return {"method": "POST", "url": url, "json": {"images": batch}}
+
+
+async def run_load(args, http: httpx.AsyncClient, images: List[bytes]) -> dict:
+    latencies: List[float] = []
+    first_result: List[float] = []
+    errors: Dict[str, int] = {}
+    next_request = 0
+
+    async def one(n: int) -> None:
+        request = build_request(args, images, n)
+        start = time.perf_counter()
+        try:
+            if args.workload in STREAMING_WORKLOADS:
+                seen_result = False
+                async with http.stream(**request) as response:
+                    async for line in response.aiter_lines():
+                        if not seen_result and ('"event": "result"' in line or '"event": "violation"' in line):
+                            seen_result = True
+                            first_result.append(time.perf_counter() - start)
+                    status = response.status_code
+            else:
+                response = await http.request(**request)
+                status = response.status_code
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            return
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    async def worker() -> None:
+        nonlocal next_request
+        while next_request < args.requests:
+            n = next_request
+            next_request += 1
+            await one(n)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - start
+
+    images_per_request = 1 if args.workload in ("single", "single-stream", "upload") else args.batch_size
+    return {
+        "durationSeconds": duration,
+        "completed": len(latencies),
+        "errors": errors,
+        "throughputRps": len(latencies) / duration,
+        "imagesPerSecond": len(latencies) * images_per_request / duration,
+        "latency": percentiles(latencies),
+        "timeToFirstResult": percentiles(first_result) if args.workload in STREAMING_WORKLOADS else None,
+    }
+
+
+async def probe_health(http: httpx.AsyncClient, samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await http.get("/api/health", timeout=30)
+            samples.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.1)
+
+
+async def probe_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def measure(args, http: httpx.AsyncClient, images: List[bytes], in_process: bool) -> dict:
+    stop = asyncio.Event()
+    health: List[float] = []
+    lag: List[float] = []
+    probes = [asyncio.create_task(probe_health(http, health, stop))]
+    # Loop lag is only observable when the server shares this process's event loop
+    if in_process:
+        probes.append(asyncio.create_task(probe_loop_lag(lag, stop)))
+    try:
+        report = await run_load(args, http, images)
+    finally:
+        stop.set()
+        await asyncio.gather(*probes)
+    report["healthLatency"] = percentiles(health)
+    report["eventLoopLag"] = percentiles(lag) if in_process else None
+    return report
+
+
+async def run_in_process(args, images: List[bytes]) -> dict:
+    os.environ.update(server_env(args))
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server  # noqa: E402  (configuration is read at import time)
+
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as http:
+            report = await measure(args, http, images, in_process=True)
+    report["peakRssMb"] = peak_rss_mb(None)
+    return report
+
+
+async def run_uvicorn(args) -> dict:
+    images = make_images(args.distinct_images, args.image_size, args.image_format, args.seed)
+    port = free_port()
+    server_proc = start_process(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        server_env(args), BACKEND_DIR,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_until_up(f"{base_url}/api/health")
+        async with httpx.AsyncClient(base_url=base_url, timeout=600,
+                                     limits=httpx.Limits(max_connections=args.concurrency + 4)) as http:
+            report = await measure(args, http, images, in_process=False)
+        report["peakRssMb"] = peak_rss_mb(server_proc.pid)
+    finally:
+        server_proc.terminate()
+        server_proc.wait(timeout=10)
+    return report
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, max_regression: Optional[float]) -> int:
+    """Print deltas against a baseline report; non-zero exit if p95 regressed too far"""
+    def delta(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    new_p95, old_p95 = report["latency"]["p95"], baseline["latency"]["p95"]
+    print(f"throughput: {report['imagesPerSecond']:.2f} img/s "
+          f"({delta(report['imagesPerSecond'], baseline['imagesPerSecond'])} vs {baseline.get('commit')})",
+          file=sys.stderr)
+    print(f"p95 latency: {new_p95:.3f}s ({delta(new_p95, old_p95)})", file=sys.stderr)
+    if max_regression is not None and old_p95 and (new_p95 - old_p95) / old_p95 > max_regression:
+        print(f"p95 regression exceeds {max_regression:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_size(value: str) -> tuple:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--vision", choices=["stub", "mock-http"], default="stub",
+                        help="in-process stub backend, or the OpenAI backend against a local mock endpoint")
+    parser.add_argument(
+        "--workload", choices=["single", "single-stream", "upload", "batch", "stream"], default="single"
+    )
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--batch-concurrency", type=int, default=8, help="server-side BATCH_CONCURRENCY")
+    parser.add_argument("--image-size", type=parse_size, default=(1600, 1200), help="WIDTHxHEIGHT")
+    parser.add_argument("--image-format", choices=["JPEG", "PNG", "WEBP"], default="JPEG")
+    parser.add_argument("--distinct-images", type=int, default=50,
+                        help="images are reused round-robin; combine with --cache to measure hits")
+    parser.add_argument("--cache", action="store_true", help="enable the analysis cache")
+    parser.add_argument("--vision-latency", type=float, default=1.0)
+    parser.add_argument("--vision-jitter", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, help="fail if p95 latency grows by more than this fraction")
+    args = parser.parse_args()
+
+    mock_proc = None
+    if args.vision == "mock-http":
+        args.mock_port = free_port()
+        mock_proc = start_process(
+            [sys.executable, "-m", "uvicorn", "benchmarks.mock_vision_server:app",
+             "--port", str(args.mock_port), "--log-level", "warning"],
+            {"PYTHONPATH": str(BACKEND_DIR), "MOCK_VISION_LATENCY": str(args.vision_latency),
+             "MOCK_VISION_JITTER": str(args.vision_jitter)},
+            ROOT,
+        )
+    try:
+        if mock_proc is not None:
+            asyncio.run(wait_until_up(f"http://127.0.0.1:{args.mock_port}/"))
+        if args.server == "uvicorn":
+            report = asyncio.run(run_uvicorn(args))
+        else:
+            images = make_images(args.distinct_images, args.image_size, args.image_format, args.seed)
+            report = asyncio.run(run_in_process(args, images))
+    finally:
+        if mock_proc is not None:
+            mock_proc.terminate()
+            mock_proc.wait(timeout=10)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "max_regression")}
+    report = {"commit": git_commit(), "config": config, **report}
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    if args.baseline:
+        return compare(report, json.loads(Path(args.baseline).read_text()), args.max_regression)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""OpenAI-compatible mock of /v1/chat/completions for local benchmarks.
+
+Returns the same deterministic analyses as the stub backend, after a
+configurable delay, so the real OpenAI backend (HTTP pool, retries,
+JSON parsing) can be load-tested without network access or spend.
+
+    MOCK_VISION_LATENCY=1.0 MOCK_VISION_JITTER=0.3 \\
+        PYTHONPATH=backend uvicorn benchmarks.mock_vision_server:app --port 9100
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from vision_backends import StubVisionBackend
+
+LATENCY = float(os.environ.get('MOCK_VISION_LATENCY', '1.0'))
+JITTER = float(os.environ.get('MOCK_VISION_JITTER', '0.3'))
+THROTTLE_RATE = float(os.environ.get('MOCK_VISION_THROTTLE_RATE', '0'))
+STREAM_CHUNK_DELAY = float(os.environ.get('MOCK_VISION_STREAM_CHUNK_DELAY', '0.01'))
+
+stub = StubVisionBackend(latency=0, jitter=0, error_rate=0, throttle_rate=0)
+
+
+def image_payloads(body: dict) -> list:
+    payloads = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            for part in content:
+                if part.get("type") == "image_url":
+                    url = part["image_url"]["url"]
+                    payloads.append((url.split(",", 1)[-1], url[5:].split(";", 1)[0]))
+    return payloads
+
+
+def prompt_text_chars(body: dict) -> int:
+    chars = 0
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if part.get("type") == "text")
+    return chars
+
+
+async def stream_chunks(body: dict, text: str, prompt_tokens: int):
+    """Replay the answer as chat.completion.chunk events, 16 characters at a time"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    def chunk(delta: dict, finish_reason=None, usage=None) -> str:
+        return "data: " + json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body.get("model", "gpt-4o"),
+            "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            "usage": usage,
+        }) + "\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for start in range(0, len(text), 16):
+        yield chunk({"content": text[start:start + 16]})
+        await asyncio.sleep(STREAM_CHUNK_DELAY)
+    yield chunk({}, finish_reason="stop")
+    if body.get("stream_options", {}).get("include_usage"):
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": prompt_tokens + len(text) // 4,
+        }
+        yield chunk({}, usage=usage)
+    yield "data: [DONE]\n\n"
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(max(0.0, LATENCY + random.uniform(-JITTER, JITTER)))
+
+    if random.random() < THROTTLE_RATE:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": "1"},
+        )
+
+    images = image_payloads(body) or [("", "image/jpeg")]
+    if len(images) == 1:
+        text = json.dumps(stub.analysis_for(images[0][0]))
+    else:
+        text = json.dumps(stub.packed_analysis_for(images))
+    prompt_tokens = prompt_text_chars(body) // 4 + 765 * len(images)  # high-detail images
+    if body.get("stream"):
+        return StreamingResponse(stream_chunks(body, text, prompt_tokens), media_type="text/event-stream")
+    return JSONResponse({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": prompt_tokens + len(text) // 4,
+        },
+    })
+
+
+app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
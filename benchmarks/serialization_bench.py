@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of building and serializing /api/analyze-batch responses.
+
+Times, per batch of synthetic analysis results, the previous response
+path (a Violation/AnalysisResults/PhotoAnalysisResponse constructor per
+field, then FastAPI's response_model validation and json.dumps) against
+the current one (one model_validate per result, then orjson through
+FastJSONResponse), and the cost and size of compressing the body with
+each encoding the server can offer. No vision calls or I/O are involved.
+
+Examples:
+    python benchmarks/serialization_bench.py
+    python benchmarks/serialization_bench.py --batch-size 100 --violations 8 --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+
+VIOLATION_TYPES = (
+    ("Missing Hard Hat", "PPE"), ("Missing Safety Vest", "PPE"), ("Missing Gloves", "PPE"),
+    ("Exposed Machinery Parts", "Equipment"), ("Uncovered Pit", "Equipment"),
+    ("Oil Spill", "Environmental"), ("Improper Waste Disposal", "Housekeeping"),
+)
+LOCATIONS = ("top-left", "top-right", "center", "bottom-left", "bottom-right")
+
+
+def make_analyses(count: int, max_violations: int, seed: int) -> List[dict]:
+    """Analysis dicts shaped like the ones score_analysis and the cache produce"""
+    rng = random.Random(seed)
+    analyses = []
+    for _ in range(count):
+        violations = [
+            {"type": name, "category": category, "location": rng.choice(LOCATIONS),
+             "confidence": rng.randint(50, 99)}
+            for name, category in rng.sample(VIOLATION_TYPES, rng.randint(0, min(max_violations, len(VIOLATION_TYPES))))
+        ]
+        analyses.append({
+            "violations": violations,
+            "riskLevel": rng.choice(("High", "Medium", "Low")),
+            "safetyScore": rng.randint(0, 100),
+            "summary": "Workers near the excavation without full PPE.",
+            "processingTime": rng.uniform(1, 4),
+            "imageStats": {"bytesIn": 2_400_000, "bytesOut": 310_000, "width": 2048, "height": 1536,
+                           "mimeType": "image/jpeg"},
+            "analysisTier": "full",
+            "analysisModel": "gpt-4o",
+            "imageSha256": "%064x" % rng.getrandbits(256),
+            "thumbnailUrl": "/api/previews/abc/thumb-320.jpg",
+            "previewUrl": "/api/previews/abc/medium-1280.jpg",
+        })
+    return analyses
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    """Median wall time of fn in milliseconds"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--violations", type=int, default=5, help="maximum violations per image")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault("VISION_BACKEND", "stub")
+    os.environ.setdefault("JOB_STORE", "memory")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import server  # noqa: E402  (configuration is read at import time)
+    from compression import compress
+    from compression import brotli as brotli_module
+    from fastjson import FastJSONResponse
+
+    analyses = make_analyses(args.batch_size, args.violations, args.seed)
+    upload_time = datetime.now(timezone.utc).isoformat()
+    response_field = create_response_field("Response_analyze_batch", List[server.PhotoAnalysisResponse])
+
+    def build_legacy():
+        return [
+            server.PhotoAnalysisResponse(
+                photoId=str(uuid.uuid4()),
+                fileName="photo.jpg",
+                uploadTime=upload_time,
+                analysisResults=server.AnalysisResults(
+                    violations=[server.Violation(**v) for v in analysis["violations"]],
+                    riskLevel=analysis["riskLevel"],
+                    safetyScore=analysis["safetyScore"],
+                ),
+                processingTime=analysis["processingTime"],
+                imageStats=analysis.get("imageStats"),
+                analysisTier=analysis.get("analysisTier"),
+                analysisModel=analysis.get("analysisModel"),
+                imageSha256=analysis.get("imageSha256"),
+                thumbnailUrl=analysis.get("thumbnailUrl"),
+                previewUrl=analysis.get("previewUrl"),
+            )
+            for analysis in analyses
+        ]
+
+    def build_current():
+        return [
+            server.PhotoAnalysisResponse.model_validate({
+                "photoId": str(uuid.uuid4()),
+                "fileName": "photo.jpg",
+                "uploadTime": upload_time,
+                "analysisResults": {
+                    "violations": analysis["violations"],
+                    "riskLevel": analysis["riskLevel"],
+                    "safetyScore": analysis["safetyScore"],
+                },
+                "processingTime": analysis["processingTime"],
+                **{key: analysis.get(key) for key in (
+                    "imageStats", "analysisTier", "analysisModel", "imageSha256", "thumbnailUrl", "previewUrl",
+                )},
+            })
+            for analysis in analyses
+        ]
+
+    loop = asyncio.new_event_loop()
+
+    def serialize_legacy(results) -> bytes:
+        content = loop.run_until_complete(serialize_response(field=response_field, response_content=results))
+        return JSONResponse(content).body
+
+    def serialize_current(results) -> bytes:
+        return FastJSONResponse(results).body
+
+    legacy_results, current_results = build_legacy(), build_current()
+    legacy_body, current_body = serialize_legacy(legacy_results), serialize_current(current_results)
+    if json.loads(legacy_body)[0].keys() != json.loads(current_body)[0].keys():
+        raise SystemExit("response shapes differ")
+
+    legacy = {
+        "buildMs": timed(build_legacy, args.repeat),
+        "serializeMs": timed(lambda: serialize_legacy(legacy_results), args.repeat),
+    }
+    current = {
+        "buildMs": timed(build_current, args.repeat),
+        "serializeMs": timed(lambda: serialize_current(current_results), args.repeat),
+    }
+    for report in (legacy, current):
+        report["totalMs"] = report["buildMs"] + report["serializeMs"]
+
+    compression = {}
+    encodings = ["gzip"] + (["br"] if brotli_module is not None else [])
+    for encoding in encodings:
+        compressed = compress(current_body, encoding, server.RESPONSE_GZIP_LEVEL, server.RESPONSE_BROTLI_QUALITY)
+        compression[encoding] = {
+            "ms": round(timed(lambda: compress(current_body, encoding, server.RESPONSE_GZIP_LEVEL,
+                                               server.RESPONSE_BROTLI_QUALITY), args.repeat), 3),
+            "bytes": len(compressed),
+            "ratio": round(len(compressed) / len(current_body), 3),
+        }
+
+    report = {
+        "batchSize": args.batch_size,
+        "violations": sum(len(a["violations"]) for a in analyses),
+        "bodyBytes": len(current_body),
+        "legacy": {k: round(v, 3) for k, v in legacy.items()},
+        "current": {k: round(v, 3) for k, v in current.items()},
+        "speedup": round(legacy["totalMs"] / current["totalMs"], 2),
+        "compression": compression,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,6 +18,6 @@ cp -r frontend/build backend/static
 
 echo "📦 Installing backend dependencies..."
 cd backend
-pip install -r requirements.txt
+pip install -r requirements.txt -r requirements-optional.txt
 
 echo "✅ Build complete!"
@@ -19,7 +19,7 @@ const getRiskBadgeClass = (riskLevel) => {
 };
 
 const PhotoCard = ({ photo, onSelect, onToggleFlag }) => {
-  const { analysisResults, previewUrl, fileName, flaggedForFollowUp } = photo;
+  const { analysisResults, previewUrl, thumbnailUrl, fileName, flaggedForFollowUp, retakeReason } = photo;
   const { riskLevel, safetyScore, violations } = analysisResults;
   
   const topViolations = violations.slice(0, 2);
@@ -47,7 +47,7 @@ const PhotoCard = ({ photo, onSelect, onToggleFlag }) => {
       {/* Image Container */}
       <div className="relative aspect-[4/3] sm:aspect-video bg-slate-900 overflow-hidden">
         <img 
-          src={previewUrl} 
+          src={thumbnailUrl || previewUrl} 
           alt={fileName}
           className="w-full h-full object-cover"
           loading="lazy"
@@ -66,9 +66,9 @@ const PhotoCard = ({ photo, onSelect, onToggleFlag }) => {
         
         {/* Risk Badge */}
         <Badge 
-          className={`absolute top-2 right-2 sm:top-3 sm:right-3 rounded-none px-1.5 sm:px-2 py-0.5 sm:py-1 text-[10px] sm:text-xs font-bold uppercase tracking-wider ${getRiskBadgeClass(riskLevel)} ${riskLevel === 'High' ? 'animate-pulse' : ''}`}
+          className={`absolute top-2 right-2 sm:top-3 sm:right-3 rounded-none px-1.5 sm:px-2 py-0.5 sm:py-1 text-[10px] sm:text-xs font-bold uppercase tracking-wider ${retakeReason ? 'bg-zinc-600 text-white border-zinc-700' : getRiskBadgeClass(riskLevel)} ${riskLevel === 'High' ? 'animate-pulse' : ''}`}
         >
-          {riskLevel}
+          {retakeReason ? 'Retake' : riskLevel}
         </Badge>
 
         {/* Flag Button */}
@@ -90,10 +90,11 @@ const PhotoCard = ({ photo, onSelect, onToggleFlag }) => {
           <div className="flex items-center gap-1 sm:gap-2">
             <Shield className="w-3 h-3 sm:w-4 sm:h-4 text-cyan-400" />
             <span className={`text-sm sm:text-lg font-mono font-bold ${
+              retakeReason ? 'text-zinc-400' :
               safetyScore >= 70 ? 'text-emerald-400' : 
               safetyScore >= 40 ? 'text-amber-400' : 'text-red-400'
             }`}>
-              {safetyScore}%
+              {retakeReason ? '—' : `${safetyScore}%`}
             </span>
           </div>
         </div>
@@ -18,18 +18,6 @@ export const InspectionTool = () => {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [uploadProgress, setUploadProgress] = useState({});
 
-  const convertToBase64 = (file) => {
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-      reader.readAsDataURL(file);
-      reader.onload = () => {
-        const base64 = reader.result.split(',')[1];
-        resolve(base64);
-      };
-      reader.onerror = (error) => reject(error);
-    });
-  };
-
   const handleFilesSelected = useCallback(async (files) => {
     if (files.length === 0) return;
     
@@ -46,42 +34,43 @@ export const InspectionTool = () => {
       const file = files[i];
       
       try {
-        setUploadProgress(prev => ({
-          ...prev,
-          [file.name]: { status: 'converting', progress: 25 }
-        }));
-
-        const base64 = await convertToBase64(file);
-        const previewUrl = URL.createObjectURL(file);
-        
         setUploadProgress(prev => ({
           ...prev,
           [file.name]: { status: 'analyzing', progress: 50 }
         }));
 
-        const response = await axios.post(`${API}/analyze`, {
-          image_base64: base64,
-          file_name: file.name
-        });
+        // Send the raw file; the server answers with URLs of cached previews
+        const formData = new FormData();
+        formData.append('file', file, file.name);
+        const response = await axios.post(`${API}/analyze/upload`, formData);
 
         setUploadProgress(prev => ({
           ...prev,
           [file.name]: { status: 'complete', progress: 100 }
         }));
 
+        // Without server previews, fall back to the local file (also used by the PDF report)
+        const { previewUrl, thumbnailUrl } = response.data;
         const photoData = {
           ...response.data,
-          previewUrl,
-          base64,
+          ...(previewUrl
+            ? { previewUrl: `${BACKEND_URL}${previewUrl}`, thumbnailUrl: `${BACKEND_URL}${thumbnailUrl}` }
+            : { previewUrl: URL.createObjectURL(file), file }),
           userNotes: '',
           flaggedForFollowUp: response.data.analysisResults.riskLevel === 'High'
         };
 
         newPhotos.push(photoData);
         
-        toast.success(`Analyzed: ${file.name}`, {
-          description: `Risk Level: ${response.data.analysisResults.riskLevel}`
-        });
+        if (response.data.retakeReason) {
+          toast.warning(`Retake needed: ${file.name}`, {
+            description: `Reason: ${response.data.retakeReason.replace('_', ' ')}`
+          });
+        } else {
+          toast.success(`Analyzed: ${file.name}`, {
+            description: `Risk Level: ${response.data.analysisResults.riskLevel}`
+          });
+        }
 
       } catch (error) {
         console.error(`Error analyzing ${file.name}:`, error);
@@ -119,14 +108,16 @@ export const InspectionTool = () => {
     toast.success('Photo removed from analysis');
   }, []);
 
+  // Photos sent back for a retake were never inspected, so they don't count towards the risk figures
+  const inspected = photos.filter(p => !p.retakeReason);
   const stats = {
     total: photos.length,
-    highRisk: photos.filter(p => p.analysisResults.riskLevel === 'High').length,
-    mediumRisk: photos.filter(p => p.analysisResults.riskLevel === 'Medium').length,
-    lowRisk: photos.filter(p => p.analysisResults.riskLevel === 'Low').length,
-    totalViolations: photos.reduce((acc, p) => acc + p.analysisResults.violations.length, 0),
-    avgSafetyScore: photos.length > 0 
-      ? Math.round(photos.reduce((acc, p) => acc + p.analysisResults.safetyScore, 0) / photos.length)
+    highRisk: inspected.filter(p => p.analysisResults.riskLevel === 'High').length,
+    mediumRisk: inspected.filter(p => p.analysisResults.riskLevel === 'Medium').length,
+    lowRisk: inspected.filter(p => p.analysisResults.riskLevel === 'Low').length,
+    totalViolations: inspected.reduce((acc, p) => acc + p.analysisResults.violations.length, 0),
+    avgSafetyScore: inspected.length > 0 
+      ? Math.round(inspected.reduce((acc, p) => acc + p.analysisResults.safetyScore, 0) / inspected.length)
       : 0
   };
 
@@ -226,7 +217,7 @@ export const InspectionTool = () => {
               <h2 className="text-xl sm:text-2xl font-heading font-bold uppercase tracking-tight">
                 Analysis Results
               </h2>
-              <ReportGenerator photos={photos} stats={stats} />
+              <ReportGenerator photos={photos} />
             </div>
             
             <AnalysisGallery 
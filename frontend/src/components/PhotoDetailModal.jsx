@@ -70,7 +70,7 @@ export const PhotoDetailModal = ({
 
   if (!photo) return null;
 
-  const { analysisResults, previewUrl, fileName, uploadTime, flaggedForFollowUp, processingTime } = photo;
+  const { analysisResults, previewUrl, fileName, uploadTime, flaggedForFollowUp, processingTime, retakeReason } = photo;
   const { riskLevel, safetyScore, violations } = analysisResults;
 
   const handleNotesChange = (value) => {
@@ -131,19 +131,20 @@ export const PhotoDetailModal = ({
 
               {/* Risk Badge */}
               <Badge 
-                className={`absolute top-3 right-12 rounded-none px-2 py-1 text-xs font-bold uppercase tracking-widest ${getRiskBadgeClass(riskLevel)}`}
+                className={`absolute top-3 right-12 rounded-none px-2 py-1 text-xs font-bold uppercase tracking-widest ${retakeReason ? 'bg-zinc-600 text-white border-zinc-700' : getRiskBadgeClass(riskLevel)}`}
               >
-                {riskLevel} RISK
+                {retakeReason ? 'RETAKE REQUIRED' : `${riskLevel} RISK`}
               </Badge>
 
               {/* Safety Score */}
               <div className="absolute bottom-3 left-3 bg-black/80 backdrop-blur-sm px-3 py-2 rounded-sm border border-cyan-500/30">
                 <p className="text-[10px] font-mono text-cyan-400 uppercase tracking-widest">Safety Score</p>
                 <p className={`text-xl font-heading font-bold ${
+                  retakeReason ? 'text-zinc-400' :
                   safetyScore >= 70 ? 'text-emerald-400' : 
                   safetyScore >= 40 ? 'text-amber-400' : 'text-red-400'
                 }`}>
-                  {safetyScore}%
+                  {retakeReason ? '—' : `${safetyScore}%`}
                 </p>
               </div>
 
@@ -195,7 +196,12 @@ export const PhotoDetailModal = ({
                   Violations Detected ({violations.length})
                 </p>
                 
-                {violations.length === 0 ? (
+                {retakeReason ? (
+                  <div className="text-center py-6 bg-zinc-500/10 rounded-sm">
+                    <p className="text-sm text-zinc-400 font-medium">Not inspected</p>
+                    <p className="text-xs text-muted-foreground capitalize">Retake required: {retakeReason.replace('_', ' ')}</p>
+                  </div>
+                ) : violations.length === 0 ? (
                   <div className="text-center py-6 bg-emerald-500/10 rounded-sm">
                     <Shield className="w-10 h-10 text-emerald-500 mx-auto mb-2" />
                     <p className="text-sm text-emerald-500 font-medium">No violations detected</p>
@@ -4,7 +4,7 @@ import { FileText, Loader2 } from "lucide-react";
 import { generateBatchPDF } from "@/utils/pdfGenerator";
 import { toast } from "sonner";
 
-export const ReportGenerator = ({ photos, stats }) => {
+export const ReportGenerator = ({ photos }) => {
   const [isGenerating, setIsGenerating] = useState(false);
 
   const handleGenerateBatchPDF = async () => {
@@ -16,7 +16,7 @@ export const ReportGenerator = ({ photos, stats }) => {
     setIsGenerating(true);
 
     try {
-      const fileName = generateBatchPDF(photos, stats);
+      const fileName = await generateBatchPDF(photos);
       toast.success("Batch Report Generated", {
         description: `Downloaded: ${fileName}`
       });
@@ -1,5 +1,9 @@
 import { jsPDF } from "jspdf";
 import autoTable from "jspdf-autotable";
+import axios from "axios";
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || '';
+const API = `${BACKEND_URL}/api`;
 
 // Generate PDF for a single photo
 export const generateSinglePhotoPDF = (photo) => {
@@ -15,7 +19,7 @@ export const generateSinglePhotoPDF = (photo) => {
   const textColor = [30, 41, 59];
   const mutedColor = [100, 116, 139];
 
-  const { analysisResults, fileName, uploadTime, processingTime } = photo;
+  const { analysisResults, fileName, uploadTime, processingTime, retakeReason } = photo;
   const { violations, riskLevel, safetyScore } = analysisResults;
 
   // Header
@@ -65,8 +69,9 @@ export const generateSinglePhotoPDF = (photo) => {
   // Risk Level and Safety Score boxes
   const boxWidth = (pageWidth - (margin * 2) - 10) / 2;
   
-  // Risk Level Box
-  const riskColor = riskLevel === "High" ? [239, 68, 68] : 
+  // Risk Level Box (grey for a retake: the photo was not inspected)
+  const riskColor = retakeReason ? mutedColor :
+                    riskLevel === "High" ? [239, 68, 68] : 
                     riskLevel === "Medium" ? [245, 158, 11] : [34, 197, 94];
   doc.setFillColor(...riskColor);
   doc.rect(margin, yPos, boxWidth, 30, 'F');
@@ -75,10 +80,11 @@ export const generateSinglePhotoPDF = (photo) => {
   doc.setFont("helvetica", "bold");
   doc.text("RISK LEVEL", margin + 5, yPos + 10);
   doc.setFontSize(16);
-  doc.text(riskLevel.toUpperCase(), margin + 5, yPos + 24);
+  doc.text(retakeReason ? "RETAKE REQUIRED" : riskLevel.toUpperCase(), margin + 5, yPos + 24);
 
   // Safety Score Box
-  const scoreColor = safetyScore >= 70 ? [34, 197, 94] : 
+  const scoreColor = retakeReason ? mutedColor :
+                     safetyScore >= 70 ? [34, 197, 94] : 
                      safetyScore >= 40 ? [245, 158, 11] : [239, 68, 68];
   doc.setFillColor(...scoreColor);
   doc.rect(margin + boxWidth + 10, yPos, boxWidth, 30, 'F');
@@ -87,7 +93,7 @@ export const generateSinglePhotoPDF = (photo) => {
   doc.setFont("helvetica", "bold");
   doc.text("SAFETY SCORE", margin + boxWidth + 15, yPos + 10);
   doc.setFontSize(16);
-  doc.text(`${safetyScore}%`, margin + boxWidth + 15, yPos + 24);
+  doc.text(retakeReason ? "-" : `${safetyScore}%`, margin + boxWidth + 15, yPos + 24);
 
   yPos += 45;
 
@@ -98,7 +104,17 @@ export const generateSinglePhotoPDF = (photo) => {
   doc.text(`VIOLATIONS FOUND (${violations.length})`, margin, yPos);
   yPos += 8;
 
-  if (violations.length === 0) {
+  if (retakeReason) {
+    doc.setFillColor(...mutedColor);
+    doc.rect(margin, yPos, pageWidth - (margin * 2), 25, 'F');
+    doc.setTextColor(255, 255, 255);
+    doc.setFontSize(12);
+    doc.setFont("helvetica", "bold");
+    doc.text(`RETAKE REQUIRED: ${retakeReason.replace('_', ' ').toUpperCase()}`, margin + 10, yPos + 16);
+    doc.setFont("helvetica", "normal");
+    doc.setFontSize(9);
+    yPos += 35;
+  } else if (violations.length === 0) {
     doc.setFillColor(34, 197, 94);
     doc.rect(margin, yPos, pageWidth - (margin * 2), 25, 'F');
     doc.setTextColor(255, 255, 255);
@@ -249,139 +265,27 @@ export const generateSinglePhotoPDF = (photo) => {
   return pdfFileName;
 };
 
-// Generate batch PDF for multiple photos
-export const generateBatchPDF = (photos, stats) => {
-  const doc = new jsPDF();
-  const pageWidth = doc.internal.pageSize.width;
-  const pageHeight = doc.internal.pageSize.height;
-  const margin = 20;
-  let yPos = margin;
-
-  const primaryColor = [15, 23, 42];
-  const accentColor = [249, 115, 22];
-  const textColor = [30, 41, 59];
-  const mutedColor = [100, 116, 139];
-
-  // Header
-  doc.setFillColor(...primaryColor);
-  doc.rect(0, 0, pageWidth, 40, 'F');
-  
-  doc.setTextColor(255, 255, 255);
-  doc.setFontSize(24);
-  doc.setFont("helvetica", "bold");
-  doc.text("AI SAFETY VISION - BATCH REPORT", margin, 25);
-  
-  doc.setFontSize(10);
-  doc.setFont("helvetica", "normal");
-  doc.text(`Generated: ${new Date().toLocaleString()} | ${photos.length} Photos Analyzed`, margin, 35);
-
-  yPos = 55;
-
-  // Executive Summary
-  doc.setTextColor(...textColor);
-  doc.setFontSize(14);
-  doc.setFont("helvetica", "bold");
-  doc.text("EXECUTIVE SUMMARY", margin, yPos);
-  yPos += 10;
-
-  const summaryData = [
-    ["Total Photos Analyzed", stats.total.toString()],
-    ["High Risk Items", stats.highRisk.toString()],
-    ["Medium Risk Items", stats.mediumRisk.toString()],
-    ["Low Risk Items", stats.lowRisk.toString()],
-    ["Total Violations Found", stats.totalViolations.toString()],
-    ["Average Safety Score", `${stats.avgSafetyScore}%`],
-  ];
-
-  autoTable(doc, {
-    startY: yPos,
-    head: [],
-    body: summaryData,
-    theme: 'plain',
-    styles: { fontSize: 10, cellPadding: 4 },
-    columnStyles: {
-      0: { fontStyle: 'bold', cellWidth: 60 },
-      1: { halign: 'right' }
-    },
-    margin: { left: margin, right: margin },
-  });
-
-  yPos = doc.lastAutoTable.finalY + 15;
-
-  // Individual Photo Results
-  doc.setFontSize(14);
-  doc.setFont("helvetica", "bold");
-  doc.text("INDIVIDUAL INSPECTION RESULTS", margin, yPos);
-  yPos += 10;
-
-  photos.forEach((photo, index) => {
-    // Check if we need a new page
-    if (yPos > pageHeight - 60) {
-      doc.addPage();
-      yPos = margin;
-    }
-
-    const { analysisResults, fileName } = photo;
-    const { violations, riskLevel, safetyScore } = analysisResults;
-
-    // Photo header bar
-    const riskColor = riskLevel === "High" ? [239, 68, 68] : 
-                      riskLevel === "Medium" ? [245, 158, 11] : [34, 197, 94];
-    
-    doc.setFillColor(248, 250, 252);
-    doc.rect(margin, yPos, pageWidth - (margin * 2), 25, 'F');
-    doc.setDrawColor(...riskColor);
-    doc.setLineWidth(0.5);
-    doc.line(margin, yPos, margin, yPos + 25);
-    
-    doc.setTextColor(...textColor);
-    doc.setFontSize(10);
-    doc.setFont("helvetica", "bold");
-    doc.text(`${index + 1}. ${fileName.substring(0, 40)}${fileName.length > 40 ? '...' : ''}`, margin + 5, yPos + 10);
-    
-    doc.setFont("helvetica", "normal");
-    doc.setFontSize(9);
-    doc.text(`Violations: ${violations.length}`, margin + 5, yPos + 18);
-    
-    // Risk badge
-    doc.setFillColor(...riskColor);
-    doc.rect(pageWidth - margin - 45, yPos + 5, 40, 15, 'F');
-    doc.setTextColor(255, 255, 255);
-    doc.setFontSize(8);
-    doc.setFont("helvetica", "bold");
-    doc.text(`${riskLevel.toUpperCase()} | ${safetyScore}%`, pageWidth - margin - 43, yPos + 15);
-
-    yPos += 30;
-
-    // Top violations for this photo
-    if (violations.length > 0) {
-      const topViolations = violations.slice(0, 3);
-      topViolations.forEach(v => {
-        doc.setTextColor(...mutedColor);
-        doc.setFontSize(8);
-        doc.text(`• ${v.type} (${v.category}) - ${v.confidence}%`, margin + 10, yPos);
-        yPos += 6;
-      });
-      if (violations.length > 3) {
-        doc.text(`  + ${violations.length - 3} more violations`, margin + 10, yPos);
-        yPos += 6;
-      }
-    }
-    yPos += 5;
+// Generate batch PDF for multiple photos on the server. The report is
+// streamed back page by page with thumbnails made server-side from the
+// stored previews, so the browser never holds the photos in memory.
+export const generateBatchPDF = async (photos) => {
+  const formData = new FormData();
+  const results = photos.map(({ file, userNotes, flaggedForFollowUp, ...result }) => result);
+  formData.append('results', JSON.stringify(results));
+  photos.forEach((photo) => {
+    // Keep files aligned with results; an empty part means "use the stored preview"
+    formData.append('files', photo.file || new Blob([]), photo.fileName);
   });
 
-  // Footer
-  const footerY = pageHeight - 15;
-  doc.setDrawColor(...mutedColor);
-  doc.line(margin, footerY - 5, pageWidth - margin, footerY - 5);
-  
-  doc.setFontSize(8);
-  doc.setTextColor(...mutedColor);
-  doc.text("AI Safety Vision - AI-Powered Inspection Tool", margin, footerY);
-  doc.text("Confidential", pageWidth - margin - 25, footerY);
+  const response = await axios.post(`${API}/reports/pdf`, formData, { responseType: 'blob' });
 
   const fileName = `AI_Safety_Vision_Batch_Report_${new Date().toISOString().split('T')[0]}.pdf`;
-  doc.save(fileName);
-  
+  const url = URL.createObjectURL(response.data);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = fileName;
+  link.click();
+  URL.revokeObjectURL(url);
+
   return fileName;
 };
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from analytics import ALL_SITES, OTHER_CATEGORY, merge_rollups, rollup_deltas
+
+
+def record(site, *categories, risk="High", score=40):
+    return {
+        "site": site,
+        "inspectedAt": datetime(2026, 3, 2, 10, tzinfo=timezone.utc),
+        "safetyScore": score,
+        "riskLevel": risk,
+        "violationCount": len(categories),
+        "violations": [{"category": category} for category in categories],
+    }
+
+
+def test_rollup_deltas_count_each_record_for_its_site_and_all_sites():
+    deltas = rollup_deltas([record("north", "PPE", "PPE"), record("south", "Equipment", risk="Low", score=90)])
+    assert deltas[("north", "2026-03-02")] == {
+        "inspections": 1, "scoreSum": 40, "violations": 2, "risk.High": 1, "categories.PPE": 2,
+    }
+    assert deltas[(ALL_SITES, "2026-03-02")]["inspections"] == 2
+    assert deltas[(ALL_SITES, "2026-03-02")]["risk.Low"] == 1
+
+
+@pytest.mark.parametrize("category", ["Fire.Safety", "$where", "", None, "ppe"])
+def test_unknown_categories_roll_up_as_other(category):
+    violation = {} if category is None else {"category": category}
+    deltas = rollup_deltas([{**record("north"), "violations": [violation], "violationCount": 1}])
+    fields = [name for name in deltas[("north", "2026-03-02")] if name.startswith("categories.")]
+    assert fields == [f"categories.{OTHER_CATEGORY}"]
+
+
+def test_merge_rollups_averages_scores():
+    summary = merge_rollups([
+        {"inspections": 2, "scoreSum": 130, "violations": 3, "risk": {"High": 1, "Low": 1}, "categories": {"PPE": 3}},
+        {"inspections": 1, "scoreSum": 50, "violations": 1, "risk": {"Medium": 1}, "categories": {"Other": 1}},
+    ])
+    assert summary["averageSafetyScore"] == 60
+    assert summary["riskCounts"] == {"High": 1, "Medium": 1, "Low": 1}
+    assert summary["categoryCounts"] == {"PPE": 3, "Other": 1}
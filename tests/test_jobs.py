@@ -0,0 +1,202 @@
+import asyncio
+import base64
+import json
+from datetime import timedelta
+
+from jobs import JobRunner, MemoryJobStore, PermanentJobError, new_job, utcnow
+from vision_backends import StubVisionBackend
+
+LEASE = timedelta(seconds=60)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def submitted(store, count=1):
+    job, items = new_job("job-1", [(f"{n}.jpg", b"image %d" % n) for n in range(count)])
+    await store.create_job(job, items)
+    return job
+
+
+def test_claim_takes_pending_items_in_order_and_leases_them():
+    async def scenario():
+        store = MemoryJobStore()
+        await submitted(store, 2)
+        first = await store.claim_item(LEASE)
+        second = await store.claim_item(LEASE)
+        assert (first["index"], second["index"]) == (0, 1)
+        assert first["status"] == "running" and first["attempts"] == 1
+        assert await store.claim_item(LEASE) is None
+
+    run(scenario())
+
+
+def test_expired_lease_is_reclaimed_and_old_holder_cannot_finish():
+    async def scenario():
+        store = MemoryJobStore()
+        await submitted(store)
+        stale = await store.claim_item(timedelta(seconds=-1))
+        fresh = await store.claim_item(LEASE)
+        assert fresh["attempts"] == 2
+
+        assert await store.finish_item(stale, "done", {"from": "stale"}, None) is None
+        job = await store.finish_item(fresh, "done", {"from": "fresh"}, None)
+        assert job["completed"] == 1 and job["status"] == "completed"
+        [item] = await store.list_items("job-1", -1, 10)
+        assert item["result"] == {"from": "fresh"}
+
+    run(scenario())
+
+
+def test_release_with_delay_holds_the_item_back():
+    async def scenario():
+        store = MemoryJobStore()
+        await submitted(store)
+        item = await store.claim_item(LEASE)
+        await store.release_item(item, "boom", delay=60)
+        assert await store.claim_item(LEASE) is None
+
+        store.items["job-1"][0]["notBefore"] = utcnow() - timedelta(seconds=1)
+        retried = await store.claim_item(LEASE)
+        assert retried["attempts"] == 2 and retried["error"] == "boom"
+
+    run(scenario())
+
+
+def test_refunded_release_keeps_the_attempt_count():
+    async def scenario():
+        store = MemoryJobStore()
+        await submitted(store)
+        item = await store.claim_item(LEASE)
+        await store.release_item(item, None, refund_attempt=True)
+        assert (await store.claim_item(LEASE))["attempts"] == 1
+
+    run(scenario())
+
+
+def runner(store, analyze, **overrides):
+    options = dict(workers=1, max_attempts=3, item_timeout=5, poll_interval=0.01, retry_backoff=0.01)
+    options.update(overrides)
+    return JobRunner(store, analyze, **options)
+
+
+async def until_finished(store, job_id, timeout=5.0):
+    async def poll():
+        while (await store.get_job(job_id))["status"] != "completed":
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+    return await store.get_job(job_id)
+
+
+def test_runner_analyzes_items_with_the_stub_backend():
+    backend = StubVisionBackend(latency=0, jitter=0, error_rate=0, throttle_rate=0, seed=1)
+
+    async def analyze(item):
+        image_base64 = base64.b64encode(item["image"]).decode("ascii")
+        completion = await backend.complete_many(
+            model="stub", system_prompt="", prompt="", images=[(image_base64, "image/jpeg")],
+            detail="low", max_tokens=100,
+        )
+        return json.loads(completion.text)
+
+    async def scenario():
+        store = MemoryJobStore()
+        jobs = runner(store, analyze, workers=2)
+        jobs.start()
+        try:
+            job = await jobs.submit([(f"{n}.jpg", b"image %d" % n) for n in range(4)])
+            finished = await until_finished(store, job["jobId"])
+        finally:
+            await jobs.stop()
+        assert finished["completed"] == 4 and finished["failed"] == 0
+        items = await store.list_items(job["jobId"], -1, 10)
+        expected = backend.analysis_for(base64.b64encode(b"image 2").decode("ascii"))
+        assert items[2]["result"] == expected
+
+    run(scenario())
+
+
+def test_runner_retries_transient_failures_then_gives_up():
+    calls = []
+
+    async def analyze(item):
+        calls.append(item["attempts"])
+        raise RuntimeError("vision unavailable")
+
+    async def scenario():
+        store = MemoryJobStore()
+        jobs = runner(store, analyze, max_attempts=3)
+        jobs.start()
+        try:
+            job = await jobs.submit([("a.jpg", b"a")])
+            finished = await until_finished(store, job["jobId"])
+        finally:
+            await jobs.stop()
+        assert calls == [1, 2, 3]
+        assert finished["failed"] == 1
+        [item] = await store.list_items(job["jobId"], -1, 10)
+        assert item["status"] == "failed" and item["error"] == "vision unavailable"
+
+    run(scenario())
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    async def analyze(item):
+        calls.append(item["attempts"])
+        raise PermanentJobError("undecodable image")
+
+    async def scenario():
+        store = MemoryJobStore()
+        jobs = runner(store, analyze)
+        jobs.start()
+        try:
+            job = await jobs.submit([("a.jpg", b"a")])
+            await until_finished(store, job["jobId"])
+        finally:
+            await jobs.stop()
+        assert calls == [1]
+
+    run(scenario())
+
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    jobs = runner(MemoryJobStore(), None, retry_backoff=5, retry_backoff_max=30)
+    assert [jobs.retry_delay(n) for n in range(1, 6)] == [5, 10, 20, 30, 30]
+
+
+class FlakyStore(MemoryJobStore):
+    """Fails to record the first outcome, like a brief MongoDB outage"""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    async def finish_item(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("store unavailable")
+        return await super().finish_item(*args, **kwargs)
+
+
+def test_worker_survives_store_errors():
+    async def analyze(item):
+        return {"ok": True}
+
+    async def scenario():
+        store = FlakyStore()
+        jobs = runner(store, analyze)
+        # A short lease so the unrecorded item is handed out again quickly
+        jobs.lease = timedelta(seconds=0.1)
+        jobs.start()
+        try:
+            job = await jobs.submit([("a.jpg", b"a")])
+            finished = await until_finished(store, job["jobId"])
+            assert not jobs._tasks[0].done()
+        finally:
+            await jobs.stop()
+        assert finished["completed"] == 1
+
+    run(scenario())
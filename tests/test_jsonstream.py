@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from jsonstream import AnalysisStreamParser, extract_json_object
+from vision_backends import StubVisionBackend
+
+ANSWER = {
+    "violations": [
+        {"type": "Missing Hard Hat", "location": "top-left", "confidence": 90, "category": "PPE"},
+        {"type": "Spill {\"quoted\"} [x]", "location": "center", "confidence": 70, "category": "Environmental"},
+    ],
+    "summary": "Two findings, one with } and ] inside a string",
+}
+
+
+def feed_in_pieces(parser, text, size):
+    violations = []
+    for start in range(0, len(text), size):
+        violations.extend(parser.feed(text[start:start + size]))
+    return violations
+
+
+@pytest.mark.parametrize("size", [1, 3, 16, 10_000])
+def test_violations_surface_as_each_one_closes(size):
+    text = "```json\n" + json.dumps(ANSWER, indent=2) + "\n```\nHope this helps."
+    parser = AnalysisStreamParser()
+    assert feed_in_pieces(parser, text, size) == ANSWER["violations"]
+    assert parser.complete
+    assert parser.finish() == ANSWER
+
+
+def test_violations_are_not_emitted_before_they_close():
+    text = json.dumps(ANSWER)
+    cut = text.index("Spill")
+    parser = AnalysisStreamParser()
+    assert parser.feed(text[:cut]) == ANSWER["violations"][:1]
+    assert parser.feed(text[cut:]) == ANSWER["violations"][1:]
+
+
+def test_nested_arrays_under_other_keys_are_not_violations():
+    text = json.dumps({"notes": [{"a": 1}], "violations": [{"type": "x", "box": [0, 0, 1, 1]}]})
+    assert AnalysisStreamParser().feed(text) == [{"type": "x", "box": [0, 0, 1, 1]}]
+
+
+@pytest.mark.parametrize("text", ["no json here", '{"violations": [', "[1, 2]"])
+def test_incomplete_or_missing_objects_fail_to_finish(text):
+    parser = AnalysisStreamParser()
+    parser.feed(text)
+    with pytest.raises(json.JSONDecodeError):
+        parser.finish()
+
+
+def test_extract_json_object_ignores_prose():
+    assert extract_json_object('Sure! {"violations": []} Done.') == {"violations": []}
+
+
+def test_parses_the_stub_backend_stream():
+    stub = StubVisionBackend(latency=0, jitter=0, error_rate=0, throttle_rate=0)
+    image = "c3R1YiBpbWFnZSA1"  # five violations
+
+    async def streamed():
+        parser, violations = AnalysisStreamParser(), []
+        async for chunk in stub.stream_many(model="m", system_prompt="", prompt="", images=[(image, "image/jpeg")],
+                                            detail="low", max_tokens=100):
+            violations.extend(parser.feed(chunk.text))
+        return violations, parser.finish()
+
+    violations, analysis = asyncio.run(streamed())
+    assert analysis == stub.analysis_for(image)
+    assert len(violations) == 5 and violations == analysis["violations"]
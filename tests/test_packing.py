@@ -0,0 +1,65 @@
+import pytest
+
+from packing import PackedResponseMismatch, chunked, packed_prompt, split_packed_results, validate_analysis
+from vision_backends import StubVisionBackend
+
+
+def analysis(score=80, **overrides):
+    entry = {
+        "violations": [{"type": "Missing Gloves", "location": "center", "category": "PPE", "confidence": 87.6}],
+        "riskLevel": "Low",
+        "safetyScore": score,
+        "summary": "",
+    }
+    entry.update(overrides)
+    return entry
+
+
+def test_chunked_keeps_order_and_remainder():
+    assert chunked([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+
+def test_packed_prompt_states_the_count():
+    assert "3" in packed_prompt("Analyze.", 3).replace("Analyze.", "")
+
+
+def test_validate_analysis_rounds_confidence_and_rejects_bad_shapes():
+    assert validate_analysis(analysis())["violations"][0]["confidence"] == 88
+    assert validate_analysis(analysis(score=120)) is None
+    assert validate_analysis(analysis(riskLevel="Severe")) is None
+    assert validate_analysis(analysis(violations=[{"type": "Missing Gloves"}])) is None
+    assert validate_analysis("not an object") is None
+
+
+def test_numbered_results_are_put_in_image_order():
+    results = split_packed_results({"results": [analysis(10, image=2), analysis(20, image=1)]}, 2)
+    assert [r["safetyScore"] for r in results] == [20, 10]
+
+
+def test_unnumbered_results_are_taken_in_order():
+    results = split_packed_results({"results": [analysis(10), analysis(20)]}, 2)
+    assert [r["safetyScore"] for r in results] == [10, 20]
+
+
+@pytest.mark.parametrize("data", [
+    {"results": [analysis()]},
+    {"results": [analysis(image=1), analysis(image=1)]},
+    {"results": [analysis(image=1), analysis(image=3)]},
+    {"analysis": []},
+    [analysis(), analysis()],
+])
+def test_mismatched_answers_fail_the_whole_group(data):
+    with pytest.raises(PackedResponseMismatch):
+        split_packed_results(data, 2)
+
+
+def test_a_malformed_entry_only_fails_its_image():
+    results = split_packed_results({"results": [analysis(10, image=1), {"image": 2, "violations": "none"}]}, 2)
+    assert results[0]["safetyScore"] == 10 and results[1] is None
+
+
+def test_stub_packed_answer_splits_per_image():
+    stub = StubVisionBackend(latency=0, jitter=0, error_rate=0, throttle_rate=0)
+    images = [("aW1hZ2UgMQ==", "image/jpeg"), ("aW1hZ2UgMg==", "image/jpeg")]
+    results = split_packed_results(stub.packed_analysis_for(images), 2)
+    assert [r["safetyScore"] for r in results] == [stub.analysis_for(b)["safetyScore"] for b, _ in images]
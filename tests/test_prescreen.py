@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from prescreen import (
+    PrescreenThresholds, QualityMeasures, is_poorly_lit, lighting_confidence, measure, retake_reason,
+)
+
+THRESHOLDS = PrescreenThresholds(
+    min_sharpness=20, min_brightness=15, max_brightness=245, min_contrast=5,
+    low_light_brightness=60, low_light_dark_fraction=0.4,
+)
+
+
+def scene(width=1600, height=1200, brightness=1.0):
+    """A synthetic site photo (gradient, hard-edged blocks, sensor noise) drawn at 800x600 and resized"""
+    rng = np.random.default_rng(3)
+    y, x = np.mgrid[0:600, 0:800]
+    pixels = 60 + 120 * x / 800 + 20 * np.sin(y / 20)
+    for _ in range(60):
+        left, top, size = rng.integers(0, 760), rng.integers(0, 560), rng.integers(10, 60)
+        pixels[top:top + size, left:left + size] = rng.integers(0, 255)
+    pixels += rng.normal(0, 6, pixels.shape)
+    pixels = np.clip(pixels * brightness, 0, 255).astype(np.uint8)
+    return Image.fromarray(np.stack([pixels] * 3, axis=-1)).resize((width, height), Image.BICUBIC)
+
+
+def flat(value, size=(800, 600)):
+    return Image.new("RGB", size, (value, value, value))
+
+
+def test_sharp_scene_passes():
+    measures = measure(scene())
+    assert retake_reason(measures, THRESHOLDS) is None
+    assert not is_poorly_lit(measures, THRESHOLDS)
+
+
+def test_blur_lowers_sharpness_until_a_retake():
+    sharp = measure(scene()).sharpness
+    blurred = measure(scene().filter(ImageFilter.GaussianBlur(12)))
+    assert blurred.sharpness < sharp / 10
+    assert retake_reason(blurred, THRESHOLDS) == "blurred"
+
+
+@pytest.mark.parametrize("image, reason", [
+    (flat(3), "too_dark"),
+    (flat(252), "overexposed"),
+    (flat(128), "featureless"),
+])
+def test_unusable_exposures(image, reason):
+    assert retake_reason(measure(image), THRESHOLDS) == reason
+
+
+def test_dim_scene_is_usable_but_poorly_lit():
+    measures = measure(scene(brightness=0.45))
+    assert retake_reason(measures, THRESHOLDS) is None
+    assert is_poorly_lit(measures, THRESHOLDS)
+    assert 50 <= lighting_confidence(measures, THRESHOLDS) <= 99
+
+
+def test_histogram_fractions():
+    half = np.zeros((100, 200, 3), dtype=np.uint8)
+    half[:, 100:] = 255
+    measures = measure(Image.fromarray(half))
+    assert measures.dark_fraction == pytest.approx(0.5, abs=0.02)
+    assert measures.bright_fraction == pytest.approx(0.5, abs=0.02)
+
+
+def test_measures_do_not_depend_much_on_resolution():
+    large, small = measure(scene(3200, 2400)), measure(scene(1024, 768))
+    assert large.brightness == pytest.approx(small.brightness, rel=0.05)
+    assert large.contrast == pytest.approx(small.contrast, rel=0.05)
+    assert retake_reason(large, THRESHOLDS) is retake_reason(small, THRESHOLDS) is None
+
+
+def test_tiny_images_have_no_sharpness():
+    assert measure(flat(100, (2, 2))).sharpness == 0.0
+
+
+def test_lighting_confidence_grows_with_darkness():
+    def lit(brightness):
+        return QualityMeasures(sharpness=100, brightness=brightness, contrast=20, dark_fraction=0, bright_fraction=0)
+
+    assert lighting_confidence(lit(55), THRESHOLDS) < lighting_confidence(lit(20), THRESHOLDS)
+    assert lighting_confidence(lit(0), THRESHOLDS) == 99
+
+
+def test_as_dict_uses_api_field_names():
+    assert set(measure(scene()).as_dict()) == {"sharpness", "brightness", "contrast", "darkFraction", "brightFraction"}
@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from ratelimit import (
+    AdaptiveConcurrency, TokenBucket, VisionGovernor, classify_error, estimate_image_tokens, retry_after_seconds,
+)
+
+REQUEST = httpx.Request("POST", "http://vision/v1/chat/completions")
+
+
+def rate_limit_error(headers=None, code=None):
+    error = openai.RateLimitError(
+        "rate limited", response=httpx.Response(429, headers=headers or {}, request=REQUEST), body=None
+    )
+    error.code = code
+    return error
+
+
+def test_token_bucket_spends_and_refunds():
+    async def scenario():
+        bucket = TokenBucket(per_minute=600)
+        await bucket.acquire(500)
+        assert bucket.tokens == pytest.approx(100, abs=1)
+        bucket.adjust(-150)  # the call cost more than estimated
+        assert bucket.tokens < 0
+        bucket.adjust(1000)
+        assert bucket.tokens == bucket.capacity
+
+    asyncio.run(scenario())
+
+
+def test_disabled_token_bucket_never_waits():
+    async def scenario():
+        bucket = TokenBucket(per_minute=0)
+        await asyncio.wait_for(bucket.acquire(10 ** 9), timeout=0.1)
+
+    asyncio.run(scenario())
+
+
+def test_adaptive_concurrency_grows_additively_and_halves_once_per_burst():
+    limiter = AdaptiveConcurrency(initial=4, minimum=1, maximum=8, cooldown=60)
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == pytest.approx(5, abs=0.1)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.limit == pytest.approx(2.5, abs=0.1)
+
+
+def test_retry_after_header_forms():
+    assert retry_after_seconds(rate_limit_error({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(rate_limit_error({"retry-after": "7"})) == 7
+    assert retry_after_seconds(rate_limit_error()) is None
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_error_classification():
+    assert classify_error(rate_limit_error()) == "throttle"
+    assert classify_error(rate_limit_error(code="insufficient_quota")) is None
+    assert classify_error(openai.APITimeoutError(REQUEST)) == "transient"
+    assert classify_error(ValueError()) is None
+
+
+def governor(**overrides):
+    options = dict(requests_per_minute=0, tokens_per_minute=0, initial_concurrency=2, max_concurrency=4,
+                   max_retries=2, backoff_base=0.001, backoff_max=0.01)
+    options.update(overrides)
+    return VisionGovernor(**options)
+
+
+def test_governor_retries_throttles_then_succeeds():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error({"retry-after-ms": "1"})
+        return "ok"
+
+    gate = governor()
+    assert asyncio.run(gate.call(flaky, estimated_tokens=10)) == "ok"
+    assert gate.stats == {"calls": 3, "retries": 2, "throttled": 2, "failures": 0}
+    assert gate.concurrency.in_flight == 0
+
+
+def test_governor_does_not_retry_permanent_errors():
+    async def broken():
+        raise ValueError("bad request")
+
+    gate = governor()
+    with pytest.raises(ValueError):
+        asyncio.run(gate.call(broken, estimated_tokens=10))
+    assert gate.stats["calls"] == 1 and gate.stats["failures"] == 1
+
+
+def test_image_token_estimate():
+    assert estimate_image_tokens(4000, 3000, "low") == 85
+    # 2048x1536 is scaled to 1024x768: 2x2 tiles of 512
+    assert estimate_image_tokens(2048, 1536, "high") == 85 + 4 * 170
@@ -0,0 +1,57 @@
+import re
+import zlib
+from datetime import datetime, timezone
+
+from reports import PdfReport, ReportEntry, ReportTally
+
+
+def response(risk_level="Medium", score=62, violations=(), retake_reason=None):
+    return {
+        "fileName": "site.jpg",
+        "uploadTime": "2026-03-02T10:15:00+00:00",
+        "analysisResults": {"violations": list(violations), "riskLevel": risk_level, "safetyScore": score},
+        "processingTime": 1.5,
+        "retakeReason": retake_reason,
+    }
+
+
+def page_text(pdf: bytes) -> str:
+    streams = re.findall(rb"stream\r?\n(.*?)\r?\nendstream", pdf, re.S)
+    text = []
+    for data in streams:
+        try:
+            text.append(zlib.decompress(data).decode("latin-1"))
+        except zlib.error:
+            pass  # thumbnails
+    return "\n".join(text)
+
+
+def test_entry_carries_the_retake_reason():
+    entry = ReportEntry.from_response(response(None, None, retake_reason="too_dark"))
+    assert entry.retakeReason == "too_dark"
+    assert entry.riskLevel is None and entry.safetyScore is None
+    assert "too dark" in entry.summary
+
+
+def test_tally_leaves_retakes_out_of_the_figures():
+    tally = ReportTally()
+    tally.add(ReportEntry.from_response(response(
+        "High", 40, [{"type": "No hard hat", "category": "PPE", "location": "center", "confidence": 90}],
+    )))
+    tally.add(ReportEntry.from_response(response(None, None, retake_reason="blurred")))
+    summary = tally.summary()
+    assert summary["inspections"] == 1
+    assert summary["averageSafetyScore"] == 40
+    assert summary["riskCounts"]["Low"] == 0
+    assert summary["retakes"] == 1
+
+
+def test_retake_page_asks_for_a_retake_instead_of_a_clean_result():
+    report = PdfReport("TEST", datetime(2026, 3, 2, tzinfo=timezone.utc))
+    text = page_text(report.photo(1, ReportEntry.from_response(response(None, None, retake_reason="too_dark")), None))
+    assert "RETAKE REQUIRED: TOO DARK" in text
+    assert "NO VIOLATIONS DETECTED" not in text
+    assert "SAFETY SCORE" not in text
+
+    text = page_text(report.photo(2, ReportEntry.from_response(response("Low", 100)), None))
+    assert "NO VIOLATIONS DETECTED" in text
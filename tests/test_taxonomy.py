@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from taxonomy import Taxonomy, load_taxonomy, normalize
+
+taxonomy = Taxonomy()
+
+
+def v(violation_type, category=None):
+    violation = {"type": violation_type}
+    if category is not None:
+        violation["category"] = category
+    return violation
+
+
+@pytest.mark.parametrize("text", [
+    "Missing Hard Hat", "No hard hat", "helmet missing", "NO HARD-HATS", "Worker without a helmet near the scaffold",
+])
+def test_synonyms_and_free_text_resolve_to_the_canonical_type(text):
+    assert taxonomy.canonicalize(v(text, "Other")) == {"type": "Missing Hard Hat", "category": "PPE", "confidence": 0}
+
+
+@pytest.mark.parametrize("text", [
+    "No spill kit present", "Spill kit not stocked", "Debris netting missing on scaffold", "Clutter-free walkway",
+    "No spills observed",
+])
+def test_violation_words_inside_other_terms_do_not_match(text):
+    assert taxonomy.lookup(text) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Oil spill next to the spill kit", "Spill Hazard"),
+    ("Scattered debris below the debris chute", "Clutter and Debris"),
+    ("Missing safety glasses while cleaning a spill", "Missing Safety Glasses"),
+])
+def test_free_text_matches_whole_words_and_prefers_the_longest_phrase(text, expected):
+    assert taxonomy.types[taxonomy.lookup(text)].name == expected
+
+
+def test_unrecognised_types_are_kept_as_given():
+    assert taxonomy.canonicalize(v("Wobbly ladder", "Equipment")) == {
+        "type": "Wobbly ladder", "category": "Equipment", "confidence": 0,
+    }
+
+
+@pytest.mark.parametrize("value, expected", [
+    (87, 87), ("90", 90), (72.6, 73), (None, 0), ("high", 0), ("nan", 0), (140, 100), (-5, 0),
+])
+def test_canonicalize_makes_confidence_a_percentage(value, expected):
+    assert taxonomy.canonicalize({"type": "No hard hat", "confidence": value})["confidence"] == expected
+
+
+def test_normalize_drops_punctuation_and_plurals():
+    assert normalize("  Exposed, WIRES! ") == "exposed wire"
+    assert normalize("glass") == "glass"
+
+
+@pytest.mark.parametrize("violations, expected", [
+    ([], (100, "Low")),
+    # Critical category: capped at 55 and High whatever the deduction
+    ([v("Missing Gloves")], (55, "High")),
+    # One minor finding: 100 - 10, capped at 85
+    ([v("Clutter and Debris")], (85, "Low")),
+    ([v("Clutter and Debris"), v("Disorganized Workspace")], (70, "Medium")),
+    ([v("Clutter and Debris")] * 6, (35, "High")),
+    # Deductions past 100 clip at 0
+    ([v("Fire Hazard")] * 4, (0, "High")),
+    # Unknown types: the category default (Equipment 15), or the unknown deduction (10)
+    ([v("Wobbly ladder", "Equipment")], (85, "Low")),
+    ([v("Something odd", "Nonsense")], (85, "Low")),
+])
+def test_score(violations, expected):
+    assert taxonomy.score(violations) == expected
+
+
+def reference_score(violations):
+    """Straight-line version of the scoring rules, one analysis at a time"""
+    ids = [taxonomy.type_id(violation) for violation in violations]
+    base = min(max(100 - sum(int(taxonomy.deductions[i]) for i in ids), 0), 100)
+    critical = sum(bool(taxonomy.critical[i]) for i in ids)
+    count = len(ids)
+    cap = 35 if count >= 5 or critical >= 2 else 55 if count >= 3 or critical >= 1 else \
+        70 if count >= 2 else 85 if count >= 1 else 100
+    score = min(base, cap)
+    risk = "High" if score <= 49 or critical else "Medium" if score <= 74 else "Low"
+    return score, risk
+
+
+def test_vectorized_scoring_matches_the_reference_on_random_batches():
+    rng = np.random.default_rng(7)
+    names = [t.name for t in taxonomy.types] + ["Unlisted hazard"]
+    categories = ["PPE", "Equipment", "Environmental", "Housekeeping", "Other"]
+    batch = [
+        [v(names[rng.integers(len(names))], categories[rng.integers(len(categories))])
+         for _ in range(rng.integers(0, 8))]
+        for _ in range(500)
+    ]
+    result = taxonomy.score_many(batch)
+    assert [(int(s), str(r)) for s, r in zip(result.scores, result.risk_levels)] == \
+        [reference_score(violations) for violations in batch]
+
+
+def test_encoding_keeps_empty_analyses_in_place():
+    encoded = taxonomy.encode([[], [v("Missing Gloves")], [], [v("Fire Hazard"), v("Spill Hazard")]])
+    assert len(encoded) == 4
+    assert encoded.owners.tolist() == [1, 3, 3]
+    assert taxonomy.score_encoded(encoded).critical_counts.tolist() == [0, 1, 0, 2]
+
+
+def test_encodings_can_be_rescored_under_edited_deductions():
+    encoded = taxonomy.encode([[v("Clutter and Debris"), v("Disorganized Workspace")]])
+    edited = taxonomy.with_deductions({"Clutter and Debris": 40})
+    assert int(taxonomy.score_encoded(encoded).scores[0]) == 70
+    assert int(edited.score_encoded(encoded).scores[0]) == 55
+    assert edited.fingerprint != taxonomy.fingerprint
+
+
+def test_with_deductions_rejects_unknown_types():
+    with pytest.raises(ValueError):
+        taxonomy.with_deductions({"Missing Jetpack": 10})
+
+
+def test_load_taxonomy_applies_overrides(tmp_path):
+    path = tmp_path / "taxonomy.json"
+    path.write_text('{"deductions": {"Missing Gloves": 30}, "categoryDeductions": {"Housekeeping": 50}}')
+    loaded = load_taxonomy(str(path))
+    assert loaded.score([v("Untidy corner", "Housekeeping")]) == (50, "Medium")
+    assert load_taxonomy(None).fingerprint == taxonomy.fingerprint
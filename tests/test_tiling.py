@@ -0,0 +1,151 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from imaging import ImageDecodeError
+from taxonomy import Taxonomy
+from tiling import (
+    Tile, image_size, location_label, make_tiles, merge_violations, overlap_ratio, parse_box, should_tile,
+    tile_grid, to_image,
+)
+
+
+def jpeg(width, height):
+    pixels = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG")
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("size, expected", [
+    ((1000, 800), False),   # fits in one tile
+    ((2000, 1500), False),  # bigger than a tile, but neither huge nor wide
+    ((3000, 2000), True),   # long edge past the minimum
+    ((2400, 1000), True),   # panorama
+])
+def test_should_tile(size, expected):
+    assert should_tile(*size, tile_edge=1024, min_edge=2500, min_aspect=2.0) is expected
+
+
+@pytest.mark.parametrize("width, height", [(8000, 2000), (3000, 3000), (1024, 5000), (2500, 1100)])
+def test_tile_grid_covers_the_image_with_overlap(width, height):
+    tiles = tile_grid(width, height, tile_edge=1024, overlap=0.2, max_tiles=8)
+    assert 1 <= len(tiles) <= 8
+    covered = np.zeros((height, width), dtype=bool)
+    for tile in tiles:
+        assert tile.left >= 0 and tile.top >= 0
+        assert tile.left + tile.width <= width and tile.top + tile.height <= height
+        covered[tile.top:tile.top + tile.height, tile.left:tile.left + tile.width] = True
+    assert covered.all()
+    rows = sorted({(t.top, t.height) for t in tiles})
+    columns = sorted({(t.left, t.width) for t in tiles})
+    for axis in (rows, columns):
+        for (start, size), (next_start, _) in zip(axis, axis[1:]):
+            assert start + size - next_start >= 0.2 * size - 1
+
+
+def test_make_tiles_encodes_each_tile_at_most_tile_edge():
+    data = jpeg(3000, 1000)
+    tiled = make_tiles(data, tile_edge=512, overlap=0.2, max_tiles=4, quality=80, measure_quality=True)
+    assert (tiled.width, tiled.height) == (3000, 1000) == image_size(data)
+    assert 1 < len(tiled.tiles) <= 4
+    for tile, prepared in tiled.tiles:
+        assert max(prepared.width, prepared.height) <= 512
+        assert Image.open(io.BytesIO(prepared.data)).size == (prepared.width, prepared.height)
+    assert tiled.quality is not None
+
+
+def test_make_tiles_rejects_garbage():
+    with pytest.raises(ImageDecodeError):
+        make_tiles(b"not an image", tile_edge=512, overlap=0.2, max_tiles=4, quality=80)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ([0.1, 0.2, 0.3, 0.4], (0.1, 0.2, 0.3, 0.4)),
+    (["0", "0", "2", "1"], (0.0, 0.0, 1.0, 1.0)),  # clamped to the image
+    ([0.5, 0.5, 0.4, 0.9], None),                  # inverted
+    ([0.1, 0.2], None),
+    ("box", None),
+    (None, None),
+])
+def test_parse_box(value, expected):
+    assert parse_box(value) == expected
+
+
+@pytest.mark.parametrize("box, label", [
+    ((0.0, 0.0, 0.2, 0.2), "top-left"),
+    ((0.4, 0.4, 0.6, 0.6), "center"),
+    ((0.0, 0.4, 0.2, 0.6), "left-center"),
+    ((0.8, 0.8, 1.0, 1.0), "bottom-right"),
+])
+def test_location_label(box, label):
+    assert location_label(box) == label
+
+
+def test_to_image_maps_tile_fractions_onto_the_whole_image():
+    tile = Tile(left=1500, top=0, width=1000, height=1000)
+    violation = {"type": "Missing Gloves", "box": [0.5, 0.5, 1.0, 1.0], "location": "bottom-right"}
+    mapped = to_image(violation, tile, width=4000, height=1000)
+    assert mapped["box"] == [0.5, 0.5, 0.625, 1.0]
+    assert mapped["location"] == "bottom-center"
+    assert violation["box"] == [0.5, 0.5, 1.0, 1.0]  # the tile's violation is left alone
+
+
+def test_to_image_leaves_boxless_violations_without_a_box():
+    mapped = to_image({"type": "Spill Hazard", "box": "somewhere"}, Tile(0, 0, 1000, 1000), width=3000, height=1000)
+    assert mapped["box"] is None
+    assert mapped["location"] == "left-center"
+
+
+def test_overlap_ratio_is_relative_to_the_smaller_box():
+    assert overlap_ratio((0, 0, 1, 1), (0.2, 0.2, 0.4, 0.4)) == pytest.approx(1.0)
+    assert overlap_ratio((0, 0, 0.5, 1), (0.25, 0, 0.75, 1)) == pytest.approx(0.5)
+    assert overlap_ratio((0, 0, 0.1, 0.1), (0.5, 0.5, 1, 1)) == 0.0
+
+
+def test_merge_violations_collapses_duplicates_from_overlapping_tiles():
+    violations = [
+        {"type": "Missing Gloves", "confidence": 70, "box": [0.40, 0.4, 0.50, 0.6]},
+        {"type": "Missing Gloves", "confidence": 90, "box": [0.42, 0.4, 0.55, 0.6]},
+        {"type": "Missing Gloves", "confidence": 80, "box": [0.90, 0.0, 1.00, 0.1]},  # elsewhere
+        {"type": "Spill Hazard", "confidence": 60, "box": [0.40, 0.4, 0.50, 0.6]},    # another type
+    ]
+    merged = merge_violations(violations, key=lambda v: v["type"], threshold=0.5)
+    assert [(v["type"], v["confidence"]) for v in merged] == [
+        ("Missing Gloves", 90), ("Missing Gloves", 80), ("Spill Hazard", 60),
+    ]
+    # The kept violation grows to cover the duplicate it absorbed
+    assert merged[0]["box"] == [0.40, 0.4, 0.55, 0.6]
+    assert merged[0]["location"] == "center"
+    assert violations[1]["box"] == [0.42, 0.4, 0.55, 0.6]
+
+
+def test_merge_after_canonicalize_takes_string_and_missing_confidences():
+    taxonomy = Taxonomy()
+    tiles = (Tile(0, 0, 1000, 1000), Tile(800, 0, 1000, 1000))
+    raw = [
+        ({"type": "No gloves", "confidence": "90", "box": [0.85, 0.4, 0.95, 0.6]}, tiles[0]),
+        ({"type": "Missing Gloves", "box": [0.05, 0.4, 0.15, 0.6]}, tiles[1]),
+        ({"type": "Exposed wires", "confidence": "very high", "box": [0.1, 0.1, 0.2, 0.2]}, tiles[0]),
+    ]
+    violations = [to_image(taxonomy.canonicalize(v), tile, width=1800, height=1000) for v, tile in raw]
+    merged = merge_violations(violations, key=lambda v: v["type"], threshold=0.5)
+    assert [(v["type"], v["confidence"]) for v in merged] == [("Missing Gloves", 90), ("Exposed Wiring", 0)]
+
+
+def test_boxless_duplicates_from_several_tiles_merge_once_per_type():
+    tiles = tile_grid(4000, 1000, tile_edge=1000, overlap=0.2, max_tiles=8)
+    violations = [
+        to_image({"type": "Poor Lighting", "confidence": 60 + n}, tile, width=4000, height=1000)
+        for n, tile in enumerate(tiles)
+    ]
+    violations.append(to_image({"type": "Spill Hazard", "confidence": 70}, tiles[0], width=4000, height=1000))
+    violations.append(to_image(
+        {"type": "Spill Hazard", "confidence": 80, "box": [0.2, 0.2, 0.4, 0.4]}, tiles[0], width=4000, height=1000,
+    ))
+    merged = merge_violations(violations, key=lambda v: v["type"], threshold=0.5)
+    assert [(v["type"], v["confidence"], v["box"] is None) for v in merged] == [
+        ("Spill Hazard", 80, False), ("Spill Hazard", 70, True), ("Poor Lighting", 60 + len(tiles) - 1, True),
+    ]
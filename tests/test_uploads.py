@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.formparsers import MultiPartException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from uploads import UploadTooLarge, parse_upload_form
+
+MAX_PART_BYTES = 1000
+MAX_REQUEST_BYTES = 4000
+
+
+async def upload(request: Request):
+    """Mirrors server.read_upload_form: over a limit is 413, a malformed body 400"""
+    try:
+        form = await parse_upload_form(
+            request, max_files=10, max_fields=10, max_part_bytes=MAX_PART_BYTES, max_request_bytes=MAX_REQUEST_BYTES
+        )
+    except UploadTooLarge as e:
+        return JSONResponse({"detail": str(e)}, status_code=413)
+    except MultiPartException as e:
+        return JSONResponse({"detail": e.message}, status_code=400)
+    files = [value for _, value in form.multi_items() if not isinstance(value, str)]
+    sizes = [[file.filename, len(await file.read())] for file in files]
+    await form.close()
+    return JSONResponse(sizes)
+
+
+app = Starlette(routes=[Route("/upload", upload, methods=["POST"])])
+
+
+def post(files=None, data=None, chunked=False):
+    async def scenario():
+        request = httpx.Request("POST", "http://test/upload", files=files, data=data)
+        body = request.read()
+        headers = dict(request.headers)
+        if chunked:
+            # No Content-Length: only the streaming count can stop the body
+            del headers["content-length"]
+
+            async def chunks():
+                for start in range(0, len(body), 512):
+                    yield body[start:start + 512]
+            content = chunks()
+        else:
+            content = body
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/upload", content=content, headers=headers)
+    return asyncio.run(scenario())
+
+
+def test_parts_within_the_limits_are_parsed():
+    response = post(files=[("files", ("a.jpg", b"a" * MAX_PART_BYTES)), ("files", ("b.jpg", b"b" * 10))])
+    assert response.status_code == 200
+    assert response.json() == [["a.jpg", MAX_PART_BYTES], ["b.jpg", 10]]
+    assert post(files={"files": ("a.jpg", b"a" * 500)}, chunked=True).status_code == 200
+
+
+def test_a_file_over_the_part_limit_is_refused():
+    response = post(files={"files": ("big.jpg", b"x" * (MAX_PART_BYTES + 1))})
+    assert response.status_code == 413
+    assert "big.jpg" in response.json()["detail"]
+
+
+def test_a_field_over_the_part_limit_is_refused():
+    response = post(data={"site": "n" * (MAX_PART_BYTES + 1)}, files={"files": ("a.jpg", b"a")})
+    assert response.status_code == 413
+    assert "site" in response.json()["detail"]
+
+
+def test_a_chunked_body_over_the_request_limit_is_refused():
+    files = [("files", (f"{n}.jpg", b"x" * 900)) for n in range(6)]  # every part fits, the total doesn't
+    response = post(files=files, chunked=True)
+    assert response.status_code == 413
+    assert str(MAX_REQUEST_BYTES) in response.json()["detail"]